@@ -0,0 +1,335 @@
+"""
+Headless bulk ingestion of loan documents
+
+Walks a directory of scans, runs OCR/extraction, validation and prediction
+for every document across a process pool, and streams one result per
+document to a JSONL or CSV file as soon as it finishes. Completed documents
+are appended to a checkpoint file, so an interrupted run started again with
+the same arguments skips them. With --ner-fallback, documents with fields
+the regexes missed are collected in the parent and run through spaCy NER
+in batches before they are validated, scored and written.
+
+    python app/batch_ingest.py [INPUT_DIR] --output results.jsonl --workers 8
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from src.config import (RAW_DOCS_DIR, OCR_WORKERS, PDF_DPI, LOAN_FIELD_PATTERNS,
+                        NER_BATCH_SIZE, NER_PROCESSES)
+from src.ocr_processing import extract_document
+from src.ner_fallback import DEFAULT_FALLBACK
+from src.data_validation import validate_batch, validate_extracted_data
+from src import ocr_engine, tracing
+
+DOCUMENT_EXTENSIONS = ('.pdf', '.png', '.jpg', '.jpeg')
+
+CSV_COLUMNS = (['document', 'pages', 'seconds', 'status', 'approval_probability',
+                'validation_errors', 'error'] + list(LOAN_FIELD_PATTERNS))
+
+_UNSET = object()
+
+# Per-worker predictor, created by the pool initializer
+_predictor = None
+
+def _init_worker(predict: bool, trace_log: str = None):
+    global _predictor
+    # Each worker is long-lived already: OCR in-process instead of a nested pool
+    ocr_engine.configure('api' if ocr_engine.tesserocr is not None else 'cli')
+    if trace_log:
+        tracing.enable([tracing.JsonLinesExporter(trace_log)])
+    if predict:
+        from loan_prediction import LoanPredictor
+        _predictor = LoanPredictor()
+
+def document_key(path: str, root: str) -> str:
+    """Checkpoint key: relative path plus size and mtime, so edited files are redone"""
+    stat = os.stat(path)
+    return f"{os.path.relpath(path, root)}\t{stat.st_size}\t{stat.st_mtime_ns}"
+
+def find_documents(root: str):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith(DOCUMENT_EXTENSIONS):
+                yield os.path.join(dirpath, filename)
+
+def load_checkpoint(path: str) -> set:
+    if not os.path.exists(path):
+        return set()
+    with open(path, 'r', encoding='utf-8') as f:
+        return {line.rstrip('\n') for line in f if line.strip()}
+
+def drop_results(path: str, fmt: str, documents: set) -> int:
+    """
+    Remove the rows of `documents` from an earlier run's output
+
+    Failed (or since edited) documents are not in the checkpoint and are
+    processed again, so their old rows would otherwise be duplicated. An
+    unreadable last line from an interrupted write is dropped too. Returns
+    the number of rows removed.
+    """
+    if not documents or not os.path.exists(path):
+        return 0
+    dropped = 0
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(path, 'r', encoding='utf-8', newline='') as src, \
+            open(tmp_path, 'w', encoding='utf-8', newline='') as dst:
+        if fmt == 'csv':
+            writer = csv.DictWriter(dst, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+            writer.writeheader()
+            for row in csv.DictReader(src):
+                if row.get('document') in documents:
+                    dropped += 1
+                else:
+                    writer.writerow(row)
+        else:
+            for line in src:
+                try:
+                    document = json.loads(line).get('document')
+                except ValueError:
+                    document = None
+                if document is None or document in documents:
+                    dropped += 1
+                else:
+                    dst.write(line)
+    os.replace(tmp_path, path)
+    return dropped
+
+def score_record(record: dict, predictor=None, validation_errors=_UNSET):
+    """Validate the record's fields (unless already validated in a batch) and add
+    the loan decision if a predictor is given"""
+    fields = record['fields']
+    if validation_errors is _UNSET:
+        validation_errors = validate_extracted_data(fields)
+    record['validation_errors'] = validation_errors
+    if predictor is not None:
+        prediction = predictor.predict(fields)
+        record['status'] = prediction['status']
+        record['approval_probability'] = prediction['approval_probability']
+        if 'error' in prediction:
+            record['prediction_error'] = prediction['error']
+
+def process_one(path: str, root: str, dpi: int, early_exit: bool = False,
+                adaptive: bool = False, ner_fallback: bool = False) -> dict:
+    """Run the full pipeline for one document (executed in a worker process)
+
+    With ner_fallback, a document with fields NER could fill comes back
+    unscored with its OCR text under 'text', for the parent's NER batch.
+    """
+    start = time.perf_counter()
+    record = {'document': os.path.relpath(path, root), 'pages': 1}
+    try:
+        stats = {}
+        with tracing.span('document', document=record['document']) as span:
+            text, fields = extract_document(path, dpi=dpi, stats=stats, early_exit=early_exit,
+                                            adaptive=adaptive)
+            span.add('pages', stats.get('pages', 1))
+        record['pages'] = stats.get('pages', 1)
+        if 'skipped_pages' in stats:
+            record['skipped_pages'] = stats['skipped_pages']
+        if 'preprocess_tier' in stats:
+            record['preprocess_tier'] = stats['preprocess_tier']
+        record['fields'] = fields
+        if ner_fallback and text and DEFAULT_FALLBACK.missing(fields):
+            record['text'] = text
+        else:
+            score_record(record, _predictor)
+    except Exception as e:
+        record['error'] = f"{type(e).__name__}: {e}"
+    record['seconds'] = round(time.perf_counter() - start, 3)
+    return record
+
+class ResultWriter:
+    """Append results to JSONL or CSV, flushing after every record"""
+
+    def __init__(self, path: str, fmt: str):
+        self.fmt = fmt
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, 'a', encoding='utf-8', newline='')
+        self.csv = None
+        if fmt == 'csv':
+            self.csv = csv.DictWriter(self.file, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+            if is_new:
+                self.csv.writeheader()
+
+    def write(self, record: dict):
+        if self.csv is not None:
+            row = dict(record.get('fields', {}))
+            row.update({k: v for k, v in record.items() if k != 'fields'})
+            if row.get('validation_errors'):
+                row['validation_errors'] = json.dumps(row['validation_errors'])
+            self.csv.writerow(row)
+        else:
+            self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+def run(input_dir: str, output: str, checkpoint: str, workers: int,
+        dpi: int = PDF_DPI, predict: bool = True, fmt: str = 'jsonl',
+        report_every: int = 50, trace_log: str = None, early_exit: bool = False,
+        adaptive: bool = False, ner_fallback: bool = False) -> dict:
+    """Process every new document under input_dir; returns throughput totals"""
+    done = load_checkpoint(checkpoint)
+    todo = []
+    for path in find_documents(input_dir):
+        key = document_key(path, input_dir)
+        if key not in done:
+            todo.append((path, key))
+    print(f"{len(todo)} documents to process ({len(done)} already done)", flush=True)
+    # Failed documents are retried on resume, replacing their earlier rows
+    dropped = drop_results(output, fmt, {os.path.relpath(path, input_dir) for path, _ in todo})
+    if dropped:
+        print(f"{dropped} earlier results of documents to redo removed from {output}", flush=True)
+
+    totals = {'documents': 0, 'pages': 0, 'failed': 0, 'skipped': len(done)}
+    writer = ResultWriter(output, fmt)
+    start = time.perf_counter()
+    pending = {}
+    queue = iter(todo)
+    # Documents waiting for NER: enough to give every NER process full batches
+    ner_pending = []
+    ner_batch = NER_BATCH_SIZE * NER_PROCESSES
+    ner_predictor = None
+    try:
+        with open(checkpoint, 'a', encoding='utf-8') as ckpt, \
+                ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                    initargs=(predict, trace_log)) as executor:
+
+            def submit_next():
+                for path, key in queue:
+                    pending[executor.submit(process_one, path, input_dir, dpi,
+                                            early_exit, adaptive, ner_fallback)] = key
+                    return
+
+            def finish(record, key):
+                writer.write(record)
+                totals['documents'] += 1
+                totals['pages'] += record['pages']
+                if 'error' in record:
+                    # Not checkpointed: failed documents are retried on resume
+                    totals['failed'] += 1
+                else:
+                    ckpt.write(key + '\n')
+                    ckpt.flush()
+                    os.fsync(ckpt.fileno())
+                if totals['documents'] % report_every == 0:
+                    print(format_throughput(totals, time.perf_counter() - start), flush=True)
+
+            def flush_ner():
+                nonlocal ner_predictor
+                if not ner_pending:
+                    return
+                if predict and ner_predictor is None:
+                    from loan_prediction import LoanPredictor
+                    ner_predictor = LoanPredictor()
+                records = [record for record, _ in ner_pending]
+                texts = [record.pop('text') for record in records]
+                ner_error = None
+                try:
+                    filled = DEFAULT_FALLBACK.fill(texts, [record['fields'] for record in records])
+                except Exception as e:
+                    # Score the batch on its regex fields; the error keeps it out
+                    # of the checkpoint, so a resumed run retries NER
+                    ner_error = f"NER fallback failed: {type(e).__name__}: {e}"
+                    filled = [record['fields'] for record in records]
+                # The whole flush arrives at once: validate it column-wise
+                validation = validate_batch(filled)
+                for i, ((record, key), fields) in enumerate(zip(ner_pending, filled)):
+                    record['ner_fields'] = sorted(fields.keys() - record['fields'].keys())
+                    record['fields'] = fields
+                    try:
+                        score_record(record, ner_predictor, validation.errors(i))
+                    except Exception as e:
+                        record['error'] = f"{type(e).__name__}: {e}"
+                    if ner_error is not None:
+                        record.setdefault('error', ner_error)
+                    finish(record, key)
+                ner_pending.clear()
+
+            # Keep a bounded number of documents in flight
+            for _ in range(workers * 2):
+                submit_next()
+
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    key = pending.pop(future)
+                    record = future.result()
+                    submit_next()
+                    if 'text' in record:
+                        ner_pending.append((record, key))
+                        if len(ner_pending) >= ner_batch:
+                            flush_ner()
+                    else:
+                        finish(record, key)
+            flush_ner()
+    finally:
+        writer.close()
+
+    totals['seconds'] = time.perf_counter() - start
+    print(format_throughput(totals, totals['seconds']), flush=True)
+    if ner_fallback:
+        totals['ner'] = DEFAULT_FALLBACK.summary()
+        print(format_ner(totals['ner']), flush=True)
+    return totals
+
+def format_throughput(totals: dict, seconds: float) -> str:
+    minutes = max(seconds, 1e-9) / 60
+    return (f"{totals['documents']} docs, {totals['pages']} pages, "
+            f"{totals['failed']} failed in {seconds:.1f}s | "
+            f"{totals['documents'] / minutes:.1f} docs/min, "
+            f"{totals['pages'] / minutes:.1f} pages/min")
+
+def format_ner(summary: dict) -> str:
+    """NER fallback throughput, measured apart from OCR"""
+    if not summary['documents_ner']:
+        return "NER fallback: no documents needed it"
+    filled = ", ".join(f"{field} {count}" for field, count in sorted(summary['fields_filled'].items()))
+    return (f"NER fallback: {summary['documents_ner']} docs in {summary['batches']} batches, "
+            f"{summary['seconds']:.1f}s | {summary['docs_per_second']} docs/s, "
+            f"{summary['ms_per_document']} ms/doc | filled: {filled or 'none'}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-process loan documents")
+    parser.add_argument('input_dir', nargs='?', default=RAW_DOCS_DIR)
+    parser.add_argument('--output', default='results.jsonl',
+                        help="results file (.jsonl or .csv)")
+    parser.add_argument('--format', choices=['jsonl', 'csv'],
+                        help="output format (default: from the output extension)")
+    parser.add_argument('--checkpoint', help="checkpoint file (default: OUTPUT.checkpoint)")
+    parser.add_argument('--workers', type=int, default=OCR_WORKERS)
+    parser.add_argument('--dpi', type=int, default=PDF_DPI)
+    parser.add_argument('--no-predict', action='store_true', help="skip loan prediction")
+    parser.add_argument('--trace-log', help="append per-stage timing spans to this JSON-lines file")
+    # The adaptive OCR path does not support early exit
+    ocr_mode = parser.add_mutually_exclusive_group()
+    ocr_mode.add_argument('--early-exit', action='store_true',
+                          help="stop OCR of a PDF once all fields are found; skip blank pages")
+    ocr_mode.add_argument('--adaptive', action='store_true',
+                          help="OCR after binarization only; enhance just low-confidence lines/pages")
+    parser.add_argument('--ner-fallback', action='store_true',
+                        help="fill fields the regexes missed from spaCy named entities (batched)")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ('csv' if args.output.lower().endswith('.csv') else 'jsonl')
+    checkpoint = args.checkpoint or f"{args.output}.checkpoint"
+    totals = run(args.input_dir, args.output, checkpoint, args.workers,
+                 dpi=args.dpi, predict=not args.no_predict, fmt=fmt,
+                 trace_log=args.trace_log, early_exit=args.early_exit,
+                 adaptive=args.adaptive, ner_fallback=args.ner_fallback)
+    return 1 if totals['failed'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
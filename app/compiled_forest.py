@@ -0,0 +1,348 @@
+"""
+Array-backed inference for the trained Random Forest and scaler
+
+export_forest() flattens every tree of the fitted RandomForestClassifier
+(node feature, threshold, children and normalized leaf class fractions)
+plus the StandardScaler parameters into contiguous NumPy arrays, written
+as one .npy file per array and a meta.json in a directory. CompiledForest
+loads that directory (memory-mapped by default) and scores a batch by
+walking all trees for all rows at once, level by level; large batches are
+instead split tree by tree, node by node (see CompiledForest.leaves).
+
+Probabilities are bit-identical to scaler.transform + model.predict_proba:
+features are scaled in float64, cast to float32 as scikit-learn does
+before tree traversal, and per-tree fractions are summed in tree order.
+
+    python app/compiled_forest.py export [--models-dir DIR]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import joblib
+import numpy as np
+
+FORMAT_VERSION = 1
+COMPILED_DIRNAME = 'compiled_forest'
+
+ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'roots', 'mean', 'scale')
+
+# From this many rows on, partitioning rows per tree node beats the level walk
+PARTITION_MIN_ROWS = 5000
+
+def _leaf_fractions(value: np.ndarray) -> np.ndarray:
+    """Per-node class fractions, normalized exactly like DecisionTreeClassifier.predict_proba"""
+    proba = value[:, 0, :].astype(np.float64)
+    normalizer = proba.sum(axis=1)
+    normalizer[normalizer == 0.0] = 1.0
+    return proba / normalizer[:, np.newaxis]
+
+def flatten_forest(model) -> Dict[str, np.ndarray]:
+    """Concatenate the nodes of all trees; child indices become global, leaves keep -1"""
+    if getattr(model, 'n_outputs_', 1) != 1:
+        raise ValueError("Only single-output forests can be compiled")
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        left = tree.children_left.astype(np.int32)
+        right = tree.children_right.astype(np.int32)
+        is_leaf = left == -1
+        roots.append(offset)
+        features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+        thresholds.append(tree.threshold.astype(np.float64))
+        lefts.append(np.where(is_leaf, -1, left + offset).astype(np.int32))
+        rights.append(np.where(is_leaf, -1, right + offset).astype(np.int32))
+        values.append(_leaf_fractions(tree.value))
+        offset += tree.node_count
+    return {
+        'feature': np.concatenate(features),
+        'threshold': np.concatenate(thresholds),
+        'left': np.concatenate(lefts),
+        'right': np.concatenate(rights),
+        'value': np.concatenate(values),
+        'roots': np.array(roots, dtype=np.int32),
+    }
+
+def scaler_arrays(scaler, n_features: int) -> Dict[str, np.ndarray]:
+    """StandardScaler parameters; identity when a step is disabled"""
+    if scaler is None:
+        return {'mean': np.zeros(n_features), 'scale': np.ones(n_features)}
+    if not hasattr(scaler, 'scale_') or not hasattr(scaler, 'with_mean'):
+        raise TypeError(f"Only StandardScaler can be compiled, got {type(scaler).__name__}")
+    mean = scaler.mean_ if scaler.with_mean else np.zeros(n_features)
+    scale = scaler.scale_ if scaler.with_std else np.ones(n_features)
+    return {'mean': np.asarray(mean, dtype=np.float64), 'scale': np.asarray(scale, dtype=np.float64)}
+
+def export_forest(model, scaler, out_dir: str, feature_names: Optional[List[str]] = None) -> str:
+    """Write the compiled arrays and meta.json to out_dir; returns out_dir"""
+    arrays = flatten_forest(model)
+    arrays.update(scaler_arrays(scaler, model.n_features_in_))
+    if feature_names is None:
+        # The scaler saw the same columns; it keeps their names when the model was fit on arrays
+        fitted = getattr(model, 'feature_names_in_', getattr(scaler, 'feature_names_in_', None))
+        feature_names = list(fitted) if fitted is not None else None
+    os.makedirs(out_dir, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(out_dir, f"{name}.npy"), np.ascontiguousarray(array))
+    meta = {
+        'format_version': FORMAT_VERSION,
+        'n_trees': len(model.estimators_),
+        'n_nodes': int(len(arrays['feature'])),
+        'n_features': int(model.n_features_in_),
+        'classes': np.asarray(model.classes_).tolist(),
+        'feature_names': [str(name) for name in feature_names] if feature_names is not None else None,
+        'max_depth': int(max(estimator.tree_.max_depth for estimator in model.estimators_)),
+    }
+    with open(os.path.join(out_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    return out_dir
+
+class CompiledForest:
+    """
+    Vectorized Random Forest + StandardScaler inference over flat node arrays
+
+    Small batches: every (row, tree) pair starts at its tree's root and
+    each step moves all pairs still on a split node one level down, so a
+    batch takes at most max_depth NumPy passes. From PARTITION_MIN_ROWS
+    rows on, row indices are partitioned node by node instead.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: Dict):
+        # np.asarray keeps memory-mapped data but drops the slower memmap subclass
+        self.feature = np.asarray(arrays['feature'])
+        self.threshold = np.asarray(arrays['threshold'])
+        self.left = np.asarray(arrays['left'])
+        self.right = np.asarray(arrays['right'])
+        self.value = np.asarray(arrays['value'])
+        self.roots = np.asarray(arrays['roots'])
+        self.mean = np.asarray(arrays['mean'])
+        self.scale = np.asarray(arrays['scale'])
+        self.meta = meta
+        self.classes_ = np.asarray(meta['classes'])
+        self.n_trees = len(self.roots)
+        self.n_features = meta['n_features']
+        self.is_leaf = self.left < 0
+        self._nodes = None
+        self._path_contributions = {}
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> 'CompiledForest':
+        with open(os.path.join(directory, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compiled forest format {meta.get('format_version')}")
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"),
+                                mmap_mode='r' if mmap else None)
+                  for name in ARRAYS}
+        return cls(arrays, meta)
+
+    @classmethod
+    def from_model(cls, model, scaler=None) -> 'CompiledForest':
+        """Compile in memory, without writing files"""
+        arrays = flatten_forest(model)
+        arrays.update(scaler_arrays(scaler, model.n_features_in_))
+        meta = {'format_version': FORMAT_VERSION, 'n_features': int(model.n_features_in_),
+                'classes': np.asarray(model.classes_).tolist()}
+        return cls(arrays, meta)
+
+    def transform(self, X) -> np.ndarray:
+        """StandardScaler.transform, in float64"""
+        X = np.array(X, dtype=np.float64)
+        X -= self.mean
+        X /= self.scale
+        return X
+
+    def leaves(self, X_scaled: np.ndarray) -> np.ndarray:
+        """Global leaf node index per (row, tree), shape (n_rows, n_trees)"""
+        return self._tree_leaves(X_scaled).T
+
+    def _tree_leaves(self, X_scaled: np.ndarray) -> np.ndarray:
+        """Leaf index per (tree, row), shape (n_trees, n_rows)"""
+        # scikit-learn traverses trees on float32 features
+        X32 = np.ascontiguousarray(X_scaled, dtype=np.float32)
+        if len(X32) >= PARTITION_MIN_ROWS:
+            return self._partition_leaves(X32)
+        return self._level_leaves(X32)
+
+    def _level_leaves(self, X32: np.ndarray) -> np.ndarray:
+        n_rows = len(X32)
+        nodes = np.repeat(np.asarray(self.roots, dtype=np.intp), n_rows)
+        rows = np.tile(np.arange(n_rows, dtype=np.intp), self.n_trees)
+        active = np.flatnonzero(~self.is_leaf[nodes])
+        while active.size:
+            current = nodes[active]
+            go_left = X32[rows[active], self.feature[current]] <= self.threshold[current]
+            nxt = np.where(go_left, self.left[current], self.right[current])
+            nodes[active] = nxt
+            active = active[~self.is_leaf[nxt]]
+        return nodes.reshape(self.n_trees, n_rows)
+
+    def _partition_leaves(self, X32: np.ndarray) -> np.ndarray:
+        """
+        Split the row indices at every split node of every tree
+
+        The level walk gathers (row, feature) pairs across the whole matrix
+        on every step; here each node reads one contiguous feature column,
+        so per-element work is cheaper and the Python cost is per node,
+        which only pays off on large batches.
+        """
+        if self._nodes is None:
+            # Thresholds stay NumPy float64 scalars so comparisons are done in float64
+            self._nodes = (self.feature.tolist(), list(self.threshold),
+                           self.left.tolist(), self.right.tolist())
+        feature, threshold, left, right = self._nodes
+        columns = list(np.ascontiguousarray(X32.T))
+        all_rows = np.arange(len(X32), dtype=np.intp)
+        leaves = np.empty((self.n_trees, len(X32)), dtype=np.intp)
+        for tree, root in enumerate(self.roots.tolist()):
+            tree_leaves = leaves[tree]
+            stack = [(root, all_rows)]
+            while stack:
+                node, rows = stack.pop()
+                if left[node] < 0:
+                    tree_leaves[rows] = node
+                    continue
+                go_left = columns[feature[node]].take(rows) <= threshold[node]
+                left_rows = rows[go_left]
+                if left_rows.size:
+                    stack.append((left[node], left_rows))
+                if left_rows.size != rows.size:
+                    stack.append((right[node], rows[~go_left]))
+        return leaves
+
+    def traverse(self, X, scaled: bool = False) -> np.ndarray:
+        """Leaf index per (tree, row) for raw (or already scaled) rows; feed to *_from_leaves"""
+        X_scaled = np.asarray(X, dtype=np.float64) if scaled else self.transform(X)
+        if X_scaled.ndim == 1:
+            X_scaled = X_scaled[np.newaxis, :]
+        return self._tree_leaves(X_scaled)
+
+    def leaves_from_apply(self, node_ids: np.ndarray) -> np.ndarray:
+        """Leaf index per (tree, row) from the source model's apply() (node id per row and tree)"""
+        return (np.asarray(node_ids, dtype=np.intp) + self.roots).T
+
+    def predict_proba(self, X, scaled: bool = False) -> np.ndarray:
+        """Class probabilities for raw (or already scaled) feature rows"""
+        return self.proba_from_leaves(self.traverse(X, scaled))
+
+    def proba_from_leaves(self, leaves: np.ndarray) -> np.ndarray:
+        # Summed tree by tree, in the order scikit-learn accumulates them
+        # (cumsum is strictly sequential; a plain sum may add pairwise)
+        if leaves.shape[1] < PARTITION_MIN_ROWS:
+            proba = np.cumsum(self.value[leaves], axis=0)[-1]
+        else:
+            proba = np.zeros((leaves.shape[1], self.value.shape[1]), dtype=np.float64)
+            for k in range(self.value.shape[1]):
+                class_value = np.ascontiguousarray(self.value[:, k])
+                column = np.zeros(leaves.shape[1], dtype=np.float64)
+                for tree_leaves in leaves:
+                    column += class_value.take(tree_leaves)
+                proba[:, k] = column
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X, scaled: bool = False) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(X, scaled), axis=1)]
+
+    def path_contributions(self, class_index: int = 1) -> np.ndarray:
+        """
+        Per node, the class fraction gained on the way from the root, by split feature
+
+        Row (node) of the result is the sum, over the splits on the root
+        path, of value[child] - value[parent] credited to the parent's
+        feature (Saabas path contributions). Computed once per class, a
+        level of nodes at a time.
+        """
+        if class_index not in self._path_contributions:
+            value = self.value[:, class_index]
+            contributions = np.zeros((len(self.feature), self.n_features), dtype=np.float64)
+            parents = np.asarray(self.roots, dtype=np.intp)
+            while parents.size:
+                parents = parents[~self.is_leaf[parents]]
+                split_feature = self.feature[parents]
+                for children in (self.left[parents], self.right[parents]):
+                    contributions[children] = contributions[parents]
+                    contributions[children, split_feature] += value[children] - value[parents]
+                parents = np.concatenate([self.left[parents], self.right[parents]]).astype(np.intp)
+            self._path_contributions[class_index] = contributions
+        return self._path_contributions[class_index]
+
+    def bias(self, class_index: int = 1) -> float:
+        """Forest output before any split: mean root class fraction"""
+        return float(self.value[self.roots, class_index].mean())
+
+    def contributions_from_leaves(self, leaves: np.ndarray, class_index: int = 1) -> np.ndarray:
+        """
+        Per-feature contributions to predict_proba[:, class_index], shape (n_rows, n_features)
+
+        Each leaf already holds its whole path's contributions, so a row
+        costs one gather per tree; bias + row sum equals the probability.
+        """
+        node_contributions = self.path_contributions(class_index)
+        if leaves.shape[1] < PARTITION_MIN_ROWS:
+            total = node_contributions[leaves].sum(axis=0)
+        else:
+            total = np.zeros((leaves.shape[1], self.n_features), dtype=np.float64)
+            for tree_leaves in leaves:
+                total += node_contributions[tree_leaves]
+        total /= self.n_trees
+        return total
+
+    def contributions(self, X, scaled: bool = False, class_index: int = 1) -> np.ndarray:
+        return self.contributions_from_leaves(self.traverse(X, scaled), class_index)
+
+class ContributionCache:
+    """LRU of contribution rows keyed by the raw feature vector's bytes"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def lookup(self, X: np.ndarray, out: np.ndarray) -> np.ndarray:
+        """Fill `out` rows found in the cache; returns the indices of the other rows"""
+        missing = []
+        with self._lock:
+            for i, row in enumerate(X):
+                cached = self._entries.get(row.tobytes())
+                if cached is None:
+                    missing.append(i)
+                else:
+                    self._entries.move_to_end(row.tobytes())
+                    out[i] = cached
+            self.stats['hits'] += len(X) - len(missing)
+            self.stats['misses'] += len(missing)
+        return np.array(missing, dtype=np.intp)
+
+    def store(self, X: np.ndarray, contributions: np.ndarray):
+        with self._lock:
+            for row, values in zip(X, contributions):
+                self._entries[row.tobytes()] = values.copy()
+                self._entries.move_to_end(row.tobytes())
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile the trained forest into NumPy arrays")
+    parser.add_argument('command', choices=['export'])
+    parser.add_argument('--models-dir', help="directory with loan_approval_model.pkl and scaler.pkl")
+    parser.add_argument('--out', help=f"output directory (default: MODELS_DIR/{COMPILED_DIRNAME})")
+    args = parser.parse_args(argv)
+
+    sys.path.append(str(Path(__file__).parent.parent))
+    from src.config import MODELS_DIR
+    models_dir = Path(args.models_dir or MODELS_DIR)
+    model = joblib.load(models_dir / 'loan_approval_model.pkl')
+    scaler = joblib.load(models_dir / 'scaler.pkl')
+    out_dir = export_forest(model, scaler, args.out or str(models_dir / COMPILED_DIRNAME))
+    print(f"Compiled {len(model.estimators_)} trees to {out_dir}")
+
+if __name__ == '__main__':
+    main()
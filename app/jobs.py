@@ -0,0 +1,222 @@
+"""
+Background document processing for the Streamlit app
+
+JobExecutor runs process_document (plus validation) in a pool of worker
+processes and keeps a table of jobs, so the UI submits a document, gets a
+job id back at once and polls the job instead of blocking its script
+thread. Workers report page-level progress and check for cancellation
+after every page through dicts shared via a multiprocessing Manager. A
+job that is still queued is cancelled immediately; a running one stops
+after its current page. While stage timings are recorded, each job
+returns its worker's tracing snapshot, which is merged into this
+process's tracer so the app's performance panel covers the workers. Each user (Streamlit session) may have at most
+JOB_MAX_PER_USER jobs queued or running.
+"""
+import functools
+import multiprocessing
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.config import JOB_WORKERS, JOB_MAX_PER_USER, JOB_HISTORY, OCR_WORKERS
+from src.ocr_cache import get_default_cache
+from src.ocr_processing import process_document
+from src.data_validation import validate_extracted_data
+from src import ocr_engine, tracing
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+FINISHED = (DONE, FAILED, CANCELLED)
+
+class JobCancelled(Exception):
+    """Raised inside a worker when its job was cancelled"""
+
+class TooManyJobs(Exception):
+    """Raised by submit() when the user already has JOB_MAX_PER_USER active jobs"""
+
+# Shared with the parent, set by the pool initializer
+_progress = None
+_cancelled = None
+
+def _init_worker(progress, cancelled, ocr_pool_size: int, trace: bool = False):
+    global _progress, _cancelled
+    _progress, _cancelled = progress, cancelled
+    # Job workers share the machine: size each OCR engine pool accordingly
+    ocr_engine.configure(size=ocr_pool_size)
+    _set_tracing(trace)
+
+def _set_tracing(trace: bool):
+    if trace and not tracing.is_enabled():
+        tracing.enable()
+    elif not trace and tracing.is_enabled():
+        tracing.disable()
+
+def _report(job_id: str, pages_done: int, pages_total: int):
+    _progress[job_id] = (pages_done, pages_total)
+    if job_id in _cancelled:
+        raise JobCancelled(job_id)
+
+def run_job(job_id: str, file_path: str, options: Dict, trace: bool = False) -> Dict:
+    """
+    Process, validate and report progress for one document (in a worker)
+
+    With `trace`, the result's 'trace' holds this job's stage timings
+    (tracing.snapshot() format) for the parent to merge.
+    """
+    # The app's "Record stage timings" toggle may have changed since the pool started
+    _set_tracing(trace)
+    tracing.reset()
+    _report(job_id, 0, 0)
+    stats = {}
+    fields = process_document(file_path, stats=stats, cache=get_default_cache(),
+                              progress=functools.partial(_report, job_id), **options)
+    result = {'fields': fields, 'validation_errors': validate_extracted_data(fields), 'stats': stats}
+    if trace:
+        result['trace'] = tracing.snapshot()
+    return result
+
+class Job:
+    """One submitted document; `result` is run_job's output once DONE"""
+
+    def __init__(self, user: str, file_path: str, name: str):
+        self.job_id = uuid.uuid4().hex
+        self.user = user
+        self.file_path = file_path
+        self.name = name
+        self.status = QUEUED
+        self.cancel_requested = False
+        self.pages_done = 0
+        self.pages_total = 0
+        self.submitted = time.time()
+        self.finished = None
+        self.result = None
+        self.error = None
+        self.future = None
+
+    def to_dict(self) -> Dict:
+        return {
+            'job_id': self.job_id,
+            'name': self.name,
+            'status': self.status,
+            'cancel_requested': self.cancel_requested,
+            'pages_done': self.pages_done,
+            'pages_total': self.pages_total,
+            'seconds': round((self.finished or time.time()) - self.submitted, 1),
+            'result': self.result,
+            'error': self.error,
+        }
+
+class JobExecutor:
+    """Process pool plus job table; all methods are thread-safe"""
+
+    def __init__(self, workers: int = JOB_WORKERS, max_per_user: int = JOB_MAX_PER_USER,
+                 history: int = JOB_HISTORY):
+        self.max_per_user = max_per_user
+        self.history = history
+        self._manager = multiprocessing.Manager()
+        self._progress = self._manager.dict()
+        self._cancelled = self._manager.dict()
+        self._ocr_workers = max(1, OCR_WORKERS // workers)
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker,
+            initargs=(self._progress, self._cancelled, self._ocr_workers, tracing.is_enabled()))
+        self._jobs: Dict[str, Job] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, user: str, file_path: str, name: Optional[str] = None, **options) -> str:
+        """Queue a document; options are passed to process_document"""
+        options.setdefault('parallel', True)
+        options.setdefault('workers', self._ocr_workers)
+        with self._lock:
+            active = sum(1 for job in self._jobs.values()
+                         if job.user == user and job.status not in FINISHED)
+            if active >= self.max_per_user:
+                raise TooManyJobs(f"At most {self.max_per_user} documents can be processed "
+                                  f"at once; wait for one to finish or cancel it")
+            job = Job(user, file_path, name or Path(file_path).name)
+            self._jobs[job.job_id] = job
+            job.future = self._executor.submit(run_job, job.job_id, file_path, options,
+                                               tracing.is_enabled())
+        job.future.add_done_callback(functools.partial(self._on_done, job))
+        return job.job_id
+
+    def _on_done(self, job: Job, future):
+        if future.cancelled():
+            status, result, error = CANCELLED, None, None
+        else:
+            error = future.exception()
+            if isinstance(error, JobCancelled):
+                status, result, error = CANCELLED, None, None
+            elif error is not None:
+                status, result, error = FAILED, None, f"{type(error).__name__}: {error}"
+            else:
+                status, result = DONE, future.result()
+                trace = result.pop('trace', None)
+                if trace:
+                    tracing.merge(trace)
+        with self._lock:
+            self._sync(job)
+            job.status, job.result, job.error = status, result, error
+            job.finished = time.time()
+            self._progress.pop(job.job_id, None)
+            self._cancelled.pop(job.job_id, None)
+            self._trim()
+
+    def _sync(self, job: Job):
+        """Copy the worker's progress into the job (caller holds the lock)"""
+        progress = self._progress.get(job.job_id)
+        if progress is not None:
+            job.pages_done, job.pages_total = progress
+            if job.status == QUEUED:
+                job.status = RUNNING
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Snapshot of one job, or None if it is unknown (or aged out)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.status not in FINISHED:
+                self._sync(job)
+            return job.to_dict()
+
+    def jobs(self, user: Optional[str] = None) -> List[Dict]:
+        """Snapshots of all jobs (of one user), oldest first"""
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if user is None or job.user == user]
+            for job in jobs:
+                if job.status not in FINISHED:
+                    self._sync(job)
+            return [job.to_dict() for job in jobs]
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued job now or ask a running one to stop after its page"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return False
+            job.cancel_requested = True
+            self._cancelled[job_id] = True
+        # Outside the lock: a successful cancel() runs _on_done right away
+        job.future.cancel()
+        return True
+
+    def shutdown(self, wait: bool = False):
+        with self._lock:
+            for job in self._jobs.values():
+                if job.status not in FINISHED:
+                    self._cancelled[job.job_id] = True
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        if wait:
+            self._manager.shutdown()
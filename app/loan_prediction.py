@@ -1,30 +1,41 @@
-import joblib
 import pandas as pd
 import numpy as np
 import re
+import sys
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List, Optional, Union
+
+# Add project root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src import resources, tracing
+from src.config import COMPILED_MAX_ROWS, EXPLAIN_CACHE_SIZE, EXPLAIN_TOP_K
+from compiled_forest import CompiledForest, ContributionCache
+from model_store import ModelBundle, ModelStore, get_store
+
+ENGINES = ('auto', 'sklearn', 'compiled')
+
+def _format_value(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return f"{value:,.0f}"
+    return str(value)
 
 class LoanPredictor:
-    def __init__(self):
-        # Model paths
-        self.models_path = Path("E:/TCS project/Automated-Personal-Loan/models")
-        
-        # Load trained artifacts
-        self.model = joblib.load(self.models_path / "loan_approval_model.pkl")
-        self.scaler = joblib.load(self.models_path / "scaler.pkl")
-        self.label_encoders = joblib.load(self.models_path / "label_encoders.pkl")
-        
-        # Get exact feature order from model or define manually
-        if hasattr(self.model, 'feature_names_in_'):
-            self.feature_order = self.model.feature_names_in_
-        else:
-            # Define feature order manually if not available
-            self.feature_order = [
-                'no_of_dependents', 'education', 'self_employed', 'income_annum',
-                'loan_amount', 'loan_term', 'cibil_score', 'residential_assets_value',
-                'commercial_assets_value', 'luxury_assets_value', 'bank_asset_value', 'address'
-            ]
+    def __init__(self, engine: str = 'auto', store: ModelStore = None):
+        """
+        engine: 'sklearn' scores with scaler + model; 'compiled' with the
+        array-backed CompiledForest (the version's compiled_forest export,
+        or compiled in memory if it has none); 'auto' uses the export when
+        present and scikit-learn otherwise, and for batches of more than
+        COMPILED_MAX_ROWS rows lets scikit-learn find the export's leaves
+
+        store: where model versions come from (default: the process-wide
+        store for MODELS_DIR, see app/model_store.py)
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES}")
+        self.engine = engine
+        self.store = store or get_store()
         
         # Define expected schema based on your CSV
         self.expected_features = [
@@ -39,7 +50,161 @@ class LoanPredictor:
             'self_employed': ['No', 'Yes'],
             'address': ['america', 'australia', 'dubai', 'india', 'japan']
         }
-        print("Expected feature order:", self.feature_order)
+
+    @property
+    def bundle(self) -> ModelBundle:
+        """Active model version; fetch once per prediction so a hot swap cannot split it"""
+        return self.store.current()
+
+    @property
+    def models_path(self) -> Path:
+        return self.bundle.path
+
+    @property
+    def model(self):
+        return self.bundle.model
+
+    @property
+    def scaler(self):
+        return self.bundle.scaler
+
+    @property
+    def label_encoders(self):
+        return self.bundle.label_encoders
+
+    @property
+    def compiled(self):
+        """CompiledForest used for scoring, or None to use scikit-learn"""
+        return self._compiled(self.bundle)
+
+    def _compiled(self, bundle: ModelBundle):
+        if self.engine == 'sklearn':
+            return None
+        if bundle.compiled is not None or self.engine == 'auto':
+            return bundle.compiled
+        return self._explainer(bundle)
+
+    def _explainer(self, bundle: ModelBundle) -> CompiledForest:
+        """CompiledForest for contributions, even when scoring uses scikit-learn"""
+        if bundle.compiled is not None:
+            return bundle.compiled
+        return bundle.cached('compiled_in_memory',
+                             lambda: CompiledForest.from_model(bundle.model, bundle.scaler))
+
+    def _predict_proba(self, bundle: ModelBundle, features: pd.DataFrame) -> tuple:
+        """Class labels, probabilities and (compiled engine only) the traversed leaves"""
+        compiled = self._compiled(bundle)
+        if compiled is not None:
+            if self.engine == 'auto' and len(features) > COMPILED_MAX_ROWS:
+                # Same leaves, found by scikit-learn's faster traversal on large batches
+                leaves = compiled.leaves_from_apply(
+                    bundle.model.apply(bundle.scaler.transform(features)))
+            else:
+                leaves = compiled.traverse(features.to_numpy(dtype=np.float64))
+            return compiled.classes_, compiled.proba_from_leaves(leaves), leaves
+        model = bundle.model
+        return model.classes_, model.predict_proba(bundle.scaler.transform(features)), None
+
+    def _approved_index(self, bundle: ModelBundle, classes: np.ndarray) -> int:
+        """Column of predict_proba for 'Approved' (LabelEncoder sorts it before 'Rejected')"""
+        def lookup():
+            encoder = bundle.label_encoders['loan_status']
+            # The training data spells the labels with a leading space
+            label = next(value for value in encoder.classes_ if str(value).strip() == 'Approved')
+            code = encoder.transform([label])[0]
+            return int(np.flatnonzero(np.asarray(classes) == code)[0])
+        return bundle.cached('approved_index', lookup)
+
+    def _contributions(self, bundle: ModelBundle, matrix: np.ndarray, approved: int,
+                       leaves: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Per-feature contributions to approval_probability for each row
+
+        Rows seen before come from the version's cache; the others are
+        explained together, reusing the scoring traversal when there is one.
+        """
+        explainer = self._explainer(bundle)
+        cache = bundle.cached('contribution_cache', lambda: ContributionCache(EXPLAIN_CACHE_SIZE))
+        with tracing.span('explain') as span:
+            contributions = np.empty_like(matrix)
+            missing = cache.lookup(matrix, contributions)
+            span.add('rows', len(matrix))
+            span.add('cache_hits', len(matrix) - len(missing))
+            if missing.size:
+                if leaves is not None:
+                    computed = explainer.contributions_from_leaves(leaves[:, missing], approved)
+                else:
+                    computed = explainer.contributions(matrix[missing], class_index=approved)
+                contributions[missing] = computed
+                cache.store(matrix[missing], computed)
+        return contributions
+
+    def _explain_row(self, bundle: ModelBundle, row: np.ndarray, contributions: np.ndarray,
+                     top_k: Optional[int]) -> tuple:
+        """Factors sorted by impact (top_k of them, all if None) and the risk factor texts"""
+        feature_order = self._feature_order(bundle)
+        category_codes = self._category_codes(bundle)
+        labels = bundle.cached('category_labels', lambda: {
+            field: {code: value for value, code in codes.items()}
+            for field, codes in category_codes.items()
+        })
+        order = np.argsort(-np.abs(contributions), kind='stable')
+        if top_k is not None:
+            order = order[:top_k]
+        factors = []
+        for j in order:
+            field = str(feature_order[j])
+            value = labels[field].get(row[j], row[j]) if field in labels else float(row[j])
+            factors.append({'feature': field, 'value': value,
+                            'contribution': float(contributions[j])})
+        risks = [f"{factor['feature']} ({_format_value(factor['value'])}) lowers approval "
+                 f"probability by {-factor['contribution'] * 100:.1f} points"
+                 for factor in factors if factor['contribution'] < 0]
+        return factors, risks or ["All criteria met"]
+
+    @property
+    def feature_order(self):
+        return self._feature_order(self.bundle)
+
+    def _feature_order(self, bundle: ModelBundle):
+        return bundle.cached('feature_order', lambda: self._load_feature_order(bundle))
+
+    def _load_feature_order(self, bundle: ModelBundle):
+        # Get exact feature order from model or define manually
+        compiled = self._compiled(bundle)
+        if compiled is not None and compiled.meta.get('feature_names'):
+            return np.asarray(compiled.meta['feature_names'], dtype=object)
+        if hasattr(bundle.model, 'feature_names_in_'):
+            return bundle.model.feature_names_in_
+        # Define feature order manually if not available
+        return [
+            'no_of_dependents', 'education', 'self_employed', 'income_annum',
+            'loan_amount', 'loan_term', 'cibil_score', 'residential_assets_value',
+            'commercial_assets_value', 'luxury_assets_value', 'bank_asset_value', 'address'
+        ]
+
+    @property
+    def category_codes(self):
+        return self._category_codes(self.bundle)
+
+    def _category_codes(self, bundle: ModelBundle):
+        """Precomputed lookup tables for batch encoding (raw value -> code)"""
+        feature_order = self._feature_order(bundle)
+        return bundle.cached('category_codes', lambda: {
+            field: dict(zip(values, bundle.label_encoders[field].transform(values)))
+            for field, values in self.categorical_map.items()
+            if field in feature_order
+        })
+
+    def warm_up(self) -> list:
+        """Load all model artifacts now instead of on the first prediction"""
+        bundle = self.bundle
+        bundle.warm_up()
+        if self._compiled(bundle) is None:
+            bundle.model
+            bundle.scaler
+        self._category_codes(bundle)
+        return resources.startup_report()
 
     def _clean_numeric(self, value):
         """Convert string numbers with symbols to float"""
@@ -47,10 +212,12 @@ class LoanPredictor:
             return float(re.sub(r'[^\d.]', '', value))
         return float(value)
 
-    def preprocess_input(self, extracted_data: Dict) -> pd.DataFrame:
+    def preprocess_input(self, extracted_data: Dict, bundle: ModelBundle = None) -> pd.DataFrame:
         """Transform raw data to model-ready format"""
+        bundle = bundle or self.bundle
+        feature_order = self._feature_order(bundle)
         # Initialize with correct column order
-        processed = pd.DataFrame(columns=self.feature_order)
+        processed = pd.DataFrame(columns=feature_order)
         
         # 1. Process numeric fields
         numeric_fields = [
@@ -60,53 +227,61 @@ class LoanPredictor:
         ]
         
         for field in numeric_fields:
-            if field in self.feature_order:
+            if field in feature_order:
                 processed[field] = [self._clean_numeric(extracted_data.get(field, 0))]
         
         # 2. Process categorical fields
         for field, allowed_values in self.categorical_map.items():
-            if field in self.feature_order:
+            if field in feature_order:
                 raw_value = str(extracted_data.get(field, '')).strip()
                 if raw_value in allowed_values:
-                    encoded = self.label_encoders[field].transform([raw_value])[0]
+                    encoded = bundle.label_encoders[field].transform([raw_value])[0]
                 else:
                     encoded = 0  # Default to first category
                 processed[field] = [encoded]
         
         # 3. Handle missing features
-        for feature in self.feature_order:
+        for feature in feature_order:
             if feature not in processed.columns:
                 processed[feature] = 0  # Default value for missing features
         
-        # Debugging: Print the preprocessed DataFrame
-        print("Preprocessed DataFrame:", processed)
-        
-        return processed[self.feature_order]
+        return processed[feature_order]
 
-    def predict(self, extracted_data: Dict) -> Dict:
-        """Make prediction with full validation"""
+    @tracing.traced('predict')
+    def predict(self, extracted_data: Dict, top_k: Optional[int] = EXPLAIN_TOP_K) -> Dict:
+        """Make prediction with full validation; top_k limits the returned contributions"""
         try:
+            # One model version for the whole call, even if a new one is activated meanwhile
+            bundle = self.bundle
+            feature_order = self._feature_order(bundle)
+
             # Validate and preprocess
-            input_df = self.preprocess_input(extracted_data)
+            input_df = self.preprocess_input(extracted_data, bundle)
             
             # Verify feature match
-            if list(input_df.columns) != list(self.feature_order):
-                missing = set(self.feature_order) - set(input_df.columns)
-                extra = set(input_df.columns) - set(self.feature_order)
+            if list(input_df.columns) != list(feature_order):
+                missing = set(feature_order) - set(input_df.columns)
+                extra = set(input_df.columns) - set(feature_order)
                 raise ValueError(
                     f"Feature mismatch. Missing: {missing}. Extra: {extra}. "
-                    f"Expected order: {self.feature_order}"
+                    f"Expected order: {feature_order}"
                 )
             
             # Transform and predict
-            scaled = self.scaler.transform(input_df)
-            pred = self.model.predict(scaled)[0]
-            proba = self.model.predict_proba(scaled)[0][1]
+            classes, probabilities, leaves = self._predict_proba(bundle, input_df)
+            pred = classes[np.argmax(probabilities[0])]
+            approved = self._approved_index(bundle, classes)
+            proba = probabilities[0][approved]
+
+            row = input_df.to_numpy(dtype=np.float64)
+            contributions = self._contributions(bundle, row, approved, leaves)[0]
+            factors, risks = self._explain_row(bundle, row[0], contributions, top_k)
             
             return {
-                'status': self.label_encoders['loan_status'].inverse_transform([pred])[0],
+                'status': bundle.label_encoders['loan_status'].inverse_transform([pred])[0],
                 'approval_probability': float(proba),
-                'risk_factors': self._identify_risk_factors(input_df.iloc[0])
+                'contributions': factors,
+                'risk_factors': risks
             }
             
         except Exception as e:
@@ -116,21 +291,83 @@ class LoanPredictor:
                 'approval_probability': 0.0
             }
 
-    def _identify_risk_factors(self, row) -> list:
-        """Explain model decision based on key factors"""
-        risks = []
-        
-        # CIBIL Score check
-        if row['cibil_score'] < 600:
-            risks.append(f"Low CIBIL score ({row['cibil_score']})")
-        
-        # Debt-to-income ratio
-        if row['loan_amount'] > 3 * row['income_annum']:
-            ratio = row['loan_amount'] / max(1, row['income_annum'])
-            risks.append(f"High debt-to-income ratio ({ratio:.1f}x)")
-        
-        # Self-employed risk
-        if row['self_employed'] == 1:  # Encoded 'Yes'
-            risks.append("Self-employed applicant")
-            
-        return risks if risks else ["All criteria met"]
\ No newline at end of file
+    def build_feature_matrix(self, records: List[Dict], bundle: ModelBundle = None) -> tuple:
+        """Encode a list of records into one feature matrix (same rules as preprocess_input)"""
+        bundle = bundle or self.bundle
+        feature_order = self._feature_order(bundle)
+        feature_index = {name: i for i, name in enumerate(feature_order)}
+        numeric_fields = [
+            'no_of_dependents', 'income_annum', 'loan_amount', 'loan_term',
+            'cibil_score', 'residential_assets_value', 'commercial_assets_value',
+            'luxury_assets_value', 'bank_asset_value'
+        ]
+        numeric_cols = [(field, feature_index[field]) for field in numeric_fields
+                        if field in feature_index]
+        categorical_cols = [(field, feature_index[field], codes)
+                            for field, codes in self._category_codes(bundle).items()]
+
+        matrix = np.zeros((len(records), len(feature_order)), dtype=np.float64)
+        errors = {}
+        for i, record in enumerate(records):
+            try:
+                for field, col in numeric_cols:
+                    matrix[i, col] = self._clean_numeric(record.get(field, 0))
+            except Exception as e:
+                errors[i] = str(e)
+                continue
+            for field, col, codes in categorical_cols:
+                matrix[i, col] = codes.get(str(record.get(field, '')).strip(), 0)
+
+        return matrix, errors
+
+    def predict_batch(self, records: Union[List[Dict], pd.DataFrame],
+                      top_k: Optional[int] = EXPLAIN_TOP_K) -> List[Dict]:
+        """Score many records with a single scaler and model call
+
+        Returns one result per record, matching predict() row for row.
+        """
+        if isinstance(records, pd.DataFrame):
+            records = records.to_dict(orient='records')
+        if not records:
+            return []
+        with tracing.span('predict_batch') as span:
+            span.add('records', len(records))
+            return self._score_batch(records, top_k)
+
+    def _score_batch(self, records: List[Dict], top_k: Optional[int] = EXPLAIN_TOP_K) -> List[Dict]:
+        try:
+            bundle = self.bundle
+            feature_order = self._feature_order(bundle)
+            matrix, errors = self.build_feature_matrix(records, bundle)
+        except Exception as e:
+            return [{'error': str(e), 'status': 'Error', 'approval_probability': 0.0}
+                    for _ in records]
+        results = [None] * len(records)
+        for i, message in errors.items():
+            results[i] = {'error': message, 'status': 'Error', 'approval_probability': 0.0}
+
+        valid = np.array([i for i in range(len(records)) if i not in errors], dtype=np.intp)
+        if len(valid) == 0:
+            return results
+
+        try:
+            features = pd.DataFrame(matrix[valid], columns=feature_order)
+            classes, proba, leaves = self._predict_proba(bundle, features)
+            preds = classes[np.argmax(proba, axis=1)]
+            statuses = bundle.label_encoders['loan_status'].inverse_transform(preds)
+            approved = self._approved_index(bundle, classes)
+            contributions = self._contributions(bundle, matrix[valid], approved, leaves)
+        except Exception as e:
+            for i in valid:
+                results[i] = {'error': str(e), 'status': 'Error', 'approval_probability': 0.0}
+            return results
+
+        for j, i in enumerate(valid):
+            factors, risks = self._explain_row(bundle, matrix[i], contributions[j], top_k)
+            results[i] = {
+                'status': statuses[j],
+                'approval_probability': float(proba[j][approved]),
+                'contributions': factors,
+                'risk_factors': risks
+            }
+        return results
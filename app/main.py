@@ -1,6 +1,9 @@
 import streamlit as st
 import pandas as pd
+import hashlib
 import os
+import time
+import uuid
 os.environ['PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION'] = 'python'
 import sys
 from pathlib import Path
@@ -9,25 +12,77 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent
 sys.path.append(str(project_root))
 
-from src.ocr_processing import process_document
-from src.data_validation import validate_extracted_data
-from src.config import RAW_DOCS_DIR, PROCESSED_DIR
-from src.preprocessing import convert_pdf_to_images, preprocess_image
+from src.config import RAW_DOCS_DIR, PROCESSED_DIR, JOB_POLL_INTERVAL
+from src.preprocessing import pdf_thumbnail, preprocess_image
+from src import tracing
 from loan_prediction import LoanPredictor  # Our new prediction class
+from jobs import FINISHED, DONE, FAILED, CANCELLED, JobExecutor, TooManyJobs
 import pytesseract
 import cv2
 from PIL import Image
 
-# Initialize loan predictor
-# predictor = LoanPredictor()
-from loan_prediction import LoanPredictor
+@st.cache_resource(show_spinner=False)
+def get_predictor():
+    """One LoanPredictor per server process, shared by all sessions and reruns"""
+    return LoanPredictor()
 
-# Initialize predictor
-predictor = LoanPredictor()
+predictor = get_predictor()
+
+@st.cache_resource(show_spinner=False)
+def get_job_executor():
+    """One background job pool per server process, shared by all sessions"""
+    return JobExecutor()
+
+def session_user() -> str:
+    """Id of this browser session, the unit of the per-user job limit"""
+    return st.session_state.setdefault('user_id', uuid.uuid4().hex)
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def _cached_prediction(fields: tuple, model_version: str, _data: dict) -> dict:
+    # Only `fields` and `model_version` are hashed; `_data` is the same values as a dict
+    return predictor.predict(_data)
+
+def predict(data):
+    """Prediction memoized on the field values (and the active model version)"""
+    fields = tuple(sorted((k, str(v)) for k, v in data.items()))
+    try:
+        model_version = predictor.bundle.version
+    except Exception:
+        model_version = None  # predict() reports why the model is unavailable
+    return _cached_prediction(fields, model_version, dict(data))
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def first_page_thumbnail(file_digest: str, _file_path: str, is_pdf: bool):
+    """Low-DPI preview of the first page, cached per file content"""
+    if is_pdf:
+        return pdf_thumbnail(_file_path)
+    img = Image.open(_file_path)
+    img.thumbnail((800, 800))
+    return img.copy()
+
+def save_upload(uploaded_file) -> tuple:
+    """Write an upload to RAW_DOCS_DIR once; reruns reuse the saved path"""
+    data = uploaded_file.getbuffer()
+    digest = hashlib.sha256(data).hexdigest()
+    saved = st.session_state.setdefault('saved_uploads', {})
+    if digest not in saved:
+        file_path = os.path.join(RAW_DOCS_DIR, uploaded_file.name)
+
+        # Handle duplicate filenames
+        counter = 1
+        while os.path.exists(file_path):
+            name, ext = os.path.splitext(uploaded_file.name)
+            file_path = os.path.join(RAW_DOCS_DIR, f"{name}_{counter}{ext}")
+            counter += 1
+
+        with open(file_path, "wb") as f:
+            f.write(data)
+        saved[digest] = file_path
+    return saved[digest], digest
 
 def show_decision(data):
     """Display loan decision results"""
-    result = predictor.predict(data)
+    result = predict(data)
     
     if 'error' in result:
         st.error(f"Prediction Error: {result['error']}")
@@ -56,6 +111,37 @@ def show_decision(data):
         st.write("Features used for prediction:")
         st.json({k: data.get(k, "MISSING") for k in predictor.expected_features})
 
+def show_perf_panel():
+    """Sidebar panel with per-stage timings recorded by src.tracing"""
+    with st.sidebar:
+        st.header("Performance")
+        enabled = st.checkbox("Record stage timings", value=tracing.is_enabled())
+        if enabled and not tracing.is_enabled():
+            tracing.enable()
+        elif not enabled and tracing.is_enabled():
+            tracing.disable()
+        if st.button("Reset timings"):
+            tracing.reset()
+
+        snapshot = tracing.snapshot()
+        if not snapshot:
+            st.caption("No stage timings recorded yet.")
+            return
+        rows = [{
+            'stage': stage,
+            'calls': metrics['count'],
+            'mean ms': metrics['mean_ms'],
+            'p50 ms': metrics['p50_ms'],
+            'p95 ms': metrics['p95_ms'],
+            'max ms': metrics['max_ms'],
+            'pages': metrics['counters'].get('pages'),
+            'MB': round(metrics['counters']['bytes'] / 2**20, 1) if 'bytes' in metrics['counters'] else None,
+        } for stage, metrics in snapshot.items()]
+        st.dataframe(pd.DataFrame(rows).set_index('stage'))
+        peak = [m['peak_rss_bytes'] for m in snapshot.values() if m['peak_rss_bytes']]
+        if peak:
+            st.metric("Peak memory (RSS)", f"{max(peak) / 2**20:.0f} MB")
+
 # Create directories if they don't exist
 Path(RAW_DOCS_DIR).mkdir(parents=True, exist_ok=True)
 Path(PROCESSED_DIR).mkdir(parents=True, exist_ok=True)
@@ -70,7 +156,7 @@ def show_prediction_results(data):
     """Display loan approval prediction results"""
     st.subheader("Loan Approval Prediction")
     
-    result = predictor.predict(data)
+    result = predict(data)
     
     if 'error' in result:
         st.error(f"Prediction error: {result['error']}")
@@ -86,7 +172,7 @@ def show_prediction_results(data):
         else:
             st.error(f"❌ {result['status']}")
         
-        st.metric("Dispproval Probability", 
+        st.metric("Approval Probability", 
                  f"{result['approval_probability']:.2%}")
     
     with col2:
@@ -98,6 +184,11 @@ def show_prediction_results(data):
         with st.expander("Detailed Risk Factors"):
             for factor in result['risk_factors']:
                 st.write(f"- {factor}")
+
+    # Per-feature contributions to the model's probability
+    if result.get('contributions'):
+        with st.expander("Feature Contributions"):
+            st.dataframe(pd.DataFrame(result['contributions']))
     
     # Debug info
     with st.expander("Technical Details"):
@@ -107,62 +198,101 @@ def show_prediction_results(data):
         else:
             st.warning("No feature details available.")
 
+def show_extraction(result):
+    """Extracted fields and validation of a finished job"""
+    extracted_data = result['fields']
+    validation_errors = result['validation_errors']
+
+    st.subheader("Extracted Data")
+    df = pd.DataFrame.from_dict(extracted_data, orient='index', columns=['Value'])
+    st.dataframe(df)
+    if result['stats'].get('ner_fields'):
+        st.caption("Found by entity recognition (not the form labels): "
+                   + ", ".join(result['stats']['ner_fields']))
+
+    if validation_errors:
+        st.subheader("Validation Errors")
+        st.error("\n".join([f"{k}: {v}" for k, v in validation_errors.items()]))
+    else:
+        st.success("All extracted data passed validation checks!")
+
+    # Show prediction immediately if no errors
+    if not validation_errors:
+        show_prediction_results(extracted_data)
+
+def show_job(job) -> bool:
+    """Render the state of a processing job; True while it still needs polling"""
+    if job['status'] not in FINISHED:
+        if job['pages_total']:
+            page = min(job['pages_done'] + 1, job['pages_total'])
+            text = f"Processing page {page} of {job['pages_total']}..."
+            fraction = min(job['pages_done'] / job['pages_total'], 1.0)
+        else:
+            text, fraction = "Waiting for a free worker...", 0.0
+        if job['cancel_requested']:
+            text = "Cancelling..."
+        st.progress(fraction, text=text)
+        if not job['cancel_requested'] and st.button("Cancel"):
+            get_job_executor().cancel(job['job_id'])
+            st.rerun()
+        return True
+
+    if job['status'] == DONE:
+        # Load the fields into the correction form once per job
+        if st.session_state.get('loaded_job') != job['job_id']:
+            st.session_state['extracted_data'] = job['result']['fields']
+            st.session_state.pop('corrected_data', None)
+            st.session_state['loaded_job'] = job['job_id']
+        show_extraction(job['result'])
+    elif job['status'] == FAILED:
+        st.error(f"Processing failed: {job['error']}")
+    elif job['status'] == CANCELLED:
+        st.info("Processing cancelled.")
+    return False
+
+def show_jobs_panel() -> bool:
+    """Sidebar list of this session's processing jobs; True if any is still active"""
+    jobs = get_job_executor().jobs(session_user())
+    if not jobs:
+        return False
+    with st.sidebar:
+        st.header("Documents")
+        st.dataframe(pd.DataFrame([{
+            'document': job['name'],
+            'status': job['status'],
+            'pages': f"{job['pages_done']}/{job['pages_total']}" if job['pages_total'] else "",
+            'seconds': job['seconds'],
+        } for job in reversed(jobs)]), hide_index=True)
+    return any(job['status'] not in FINISHED for job in jobs)
+
+polling = False
+
 # File upload
 uploaded_file = st.file_uploader("Upload Loan Document", type=['pdf', 'png', 'jpg', 'jpeg'])
 
 if uploaded_file is not None:
-    # Save the uploaded file
-    file_path = os.path.join(RAW_DOCS_DIR, uploaded_file.name)
-    
-    # Handle duplicate filenames
-    counter = 1
-    while os.path.exists(file_path):
-        name, ext = os.path.splitext(uploaded_file.name)
-        file_path = os.path.join(RAW_DOCS_DIR, f"{name}_{counter}{ext}")
-        counter += 1
-    
-    with open(file_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
+    # Save the uploaded file (once per upload, not on every rerun)
+    file_path, file_digest = save_upload(uploaded_file)
     
     # Display document preview
     st.subheader("Document Preview")
-    if uploaded_file.type == "application/pdf":
-        images = convert_pdf_to_images(file_path)
-        st.image(images[0], caption="First page of PDF", use_column_width=True)
-    else:
-        img = Image.open(uploaded_file)
-        st.image(img, caption="Uploaded Image", use_column_width=True)
+    is_pdf = uploaded_file.type == "application/pdf"
+    thumbnail = first_page_thumbnail(file_digest, file_path, is_pdf)
+    st.image(thumbnail, caption="First page of PDF" if is_pdf else "Uploaded Image")
     
-    # Process document
+    # Process document in the background; the page polls the job
     if st.button("Process Document"):
-        with st.spinner("Processing document..."):
-            try:
-                # Extract data
-                extracted_data = process_document(file_path)
-                
-                # Validate data
-                validation_errors = validate_extracted_data(extracted_data)
-                
-                # Display results
-                st.subheader("Extracted Data")
-                df = pd.DataFrame.from_dict(extracted_data, orient='index', columns=['Value'])
-                st.dataframe(df)
-                
-                if validation_errors:
-                    st.subheader("Validation Errors")
-                    st.error("\n".join([f"{k}: {v}" for k, v in validation_errors.items()]))
-                else:
-                    st.success("All extracted data passed validation checks!")
-                
-                # Store extracted data in session state
-                st.session_state['extracted_data'] = extracted_data
-                
-                # Show prediction immediately if no errors
-                if not validation_errors:
-                    show_prediction_results(extracted_data)
-                    
-            except Exception as e:
-                st.error(f"Processing failed: {str(e)}")
+        try:
+            job_id = get_job_executor().submit(session_user(), file_path, name=uploaded_file.name,
+                                               ner_fallback=True)
+            st.session_state.setdefault('file_jobs', {})[file_digest] = job_id
+        except TooManyJobs as e:
+            st.warning(str(e))
+
+    job_id = st.session_state.get('file_jobs', {}).get(file_digest)
+    job = get_job_executor().get(job_id) if job_id else None
+    if job is not None:
+        polling = show_job(job)
     
     # Manual correction section
     if 'extracted_data' in st.session_state:
@@ -193,3 +323,9 @@ if uploaded_file is not None:
         else:
             st.warning("Please process the document first")
 
+polling = show_jobs_panel() or polling
+show_perf_panel()
+
+if polling:
+    time.sleep(JOB_POLL_INTERVAL)
+    st.rerun()
@@ -0,0 +1,320 @@
+"""
+Versioned model artifacts shared by every scoring process
+
+    MODELS_DIR/
+        CURRENT                 name of the active version
+        versions/<version>/
+            manifest.json       version, creation time, size and sha256 per file
+            loan_approval_model.pkl, scaler.pkl, label_encoders.pkl
+            compiled_forest/    CompiledForest arrays (.npy, memory-mapped)
+
+publish() builds a version under a temporary name, renames it into place
+and only then replaces CURRENT, so readers never see a partial version.
+ModelStore.current() returns an immutable ModelBundle and looks at CURRENT
+again at most every MODEL_RELOAD_INTERVAL seconds; the new bundle is loaded
+before it is swapped in, and a prediction that already holds the old
+bundle finishes with it.
+
+The forest arrays are memory-mapped read-only, so all worker processes
+share one page-cache copy instead of unpickling a forest each. The pickles
+are loaded only when needed (label encoders, or scoring with scikit-learn).
+
+A MODELS_DIR without CURRENT that holds the .pkl files directly (the
+original layout) is served as a single version named 'unversioned'.
+
+    python app/model_store.py publish SOURCE_DIR [--version V] [--no-activate]
+    python app/model_store.py activate V
+    python app/model_store.py list
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import joblib
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src import resources
+from src.config import MODELS_DIR, MODEL_RELOAD_INTERVAL
+from compiled_forest import COMPILED_DIRNAME, CompiledForest, export_forest
+
+MANIFEST_VERSION = 1
+UNVERSIONED = 'unversioned'
+
+ARTIFACT_FILES = {
+    'model': 'loan_approval_model.pkl',
+    'scaler': 'scaler.pkl',
+    'label_encoders': 'label_encoders.pkl',
+}
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def build_manifest(version_dir: Path, version: str) -> Dict:
+    files = {}
+    for path in sorted(p for p in version_dir.rglob('*') if p.is_file()):
+        name = path.relative_to(version_dir).as_posix()
+        if name != 'manifest.json':
+            files[name] = {'bytes': path.stat().st_size, 'sha256': _sha256(path)}
+    return {
+        'manifest_version': MANIFEST_VERSION,
+        'version': version,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'files': files,
+    }
+
+def verify_manifest(version_dir: Path, manifest: Dict, checksums: bool = False):
+    """Raise ValueError if a listed file is missing or differs (size, or sha256 if checksums)"""
+    if manifest.get('manifest_version') != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported manifest version {manifest.get('manifest_version')}")
+    for name, expected in manifest['files'].items():
+        path = version_dir / name
+        if not path.is_file():
+            raise ValueError(f"{version_dir.name}: missing {name}")
+        if path.stat().st_size != expected['bytes']:
+            raise ValueError(f"{version_dir.name}: {name} has unexpected size")
+        if checksums and _sha256(path) != expected['sha256']:
+            raise ValueError(f"{version_dir.name}: {name} checksum mismatch")
+
+def _write_atomic(path: Path, text: str):
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class ModelBundle:
+    """
+    The artifacts of one model version; never modified after it is opened
+
+    Pickled artifacts are registered with src.resources (so they show up in
+    the startup report) and loaded on first use. `cached` keeps values
+    derived from this version (feature order, encoding tables) with it, so
+    they are swapped together with the model.
+    """
+
+    def __init__(self, version: str, path: Path, manifest: Optional[Dict] = None):
+        self.version = version
+        self.path = Path(path)
+        self.manifest = manifest
+        self._artifacts = {
+            name: resources.register(f"model:{self.path / filename}",
+                                     lambda p=self.path / filename: joblib.load(p))
+            for name, filename in ARTIFACT_FILES.items()
+        }
+        self._compiled = resources.register(f"compiled:{self.path / COMPILED_DIRNAME}",
+                                            self._load_compiled)
+        self._derived = {}
+        # Reentrant: a factory may itself ask for another derived value
+        self._derived_lock = threading.RLock()
+
+    @classmethod
+    def open(cls, path: Path, version: str) -> 'ModelBundle':
+        manifest_path = Path(path) / 'manifest.json'
+        manifest = None
+        if manifest_path.exists():
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            verify_manifest(Path(path), manifest)
+        elif version != UNVERSIONED:
+            raise ValueError(f"Model version {version} has no manifest.json")
+        return cls(version, path, manifest)
+
+    @property
+    def model(self):
+        return self._artifacts['model'].get()
+
+    @property
+    def scaler(self):
+        return self._artifacts['scaler'].get()
+
+    @property
+    def label_encoders(self):
+        return self._artifacts['label_encoders'].get()
+
+    @property
+    def compiled(self) -> Optional[CompiledForest]:
+        """Memory-mapped CompiledForest, or None if this version has no export"""
+        return self._compiled.get()
+
+    def _load_compiled(self):
+        compiled_dir = self.path / COMPILED_DIRNAME
+        if (compiled_dir / 'meta.json').exists():
+            return CompiledForest.load(str(compiled_dir))
+        return None
+
+    def cached(self, key: str, factory: Callable):
+        """Value derived from this version, computed once"""
+        value = self._derived.get(key)
+        if value is None:
+            with self._derived_lock:
+                value = self._derived.get(key)
+                if value is None:
+                    value = self._derived[key] = factory()
+        return value
+
+    def warm_up(self):
+        """Load what scoring needs: encoders, and the compiled forest or else the pickles"""
+        self.label_encoders
+        if self.compiled is None:
+            self.model
+            self.scaler
+
+    def release(self):
+        """Drop this version from the resource registry; current holders are unaffected"""
+        for name in [f"model:{self.path / filename}" for filename in ARTIFACT_FILES.values()]:
+            resources.unregister(name)
+        resources.unregister(f"compiled:{self.path / COMPILED_DIRNAME}")
+
+class ModelStore:
+    """Resolves MODELS_DIR/CURRENT to a ModelBundle and swaps it when CURRENT changes"""
+
+    def __init__(self, root=MODELS_DIR, reload_interval: float = MODEL_RELOAD_INTERVAL):
+        self.root = Path(root)
+        self.reload_interval = reload_interval
+        self.last_error = None
+        self._bundle = None
+        self._checked = float('-inf')
+        self._lock = threading.Lock()
+
+    @property
+    def versions_dir(self) -> Path:
+        return self.root / 'versions'
+
+    def active_version(self) -> str:
+        try:
+            return (self.root / 'CURRENT').read_text(encoding='utf-8').strip()
+        except FileNotFoundError:
+            return UNVERSIONED
+
+    def version_path(self, version: str) -> Path:
+        return self.root if version == UNVERSIONED else self.versions_dir / version
+
+    def list_versions(self) -> List[str]:
+        if not self.versions_dir.is_dir():
+            return []
+        return sorted(p.name for p in self.versions_dir.iterdir()
+                      if p.is_dir() and not p.name.startswith('.'))
+
+    def current(self) -> ModelBundle:
+        """Active bundle; callers should fetch it once per prediction and reuse it"""
+        bundle = self._bundle
+        if bundle is None or time.monotonic() - self._checked >= self.reload_interval:
+            bundle = self.refresh()
+        return bundle
+
+    def refresh(self) -> ModelBundle:
+        """Swap to the version named in CURRENT if it changed"""
+        with self._lock:
+            # Other threads keep using the current bundle while this one loads
+            self._checked = time.monotonic()
+            version = self.active_version()
+            old = self._bundle
+            if old is not None and old.version == version:
+                return old
+            try:
+                bundle = ModelBundle.open(self.version_path(version), version)
+                bundle.warm_up()
+            except Exception as e:
+                if old is None:
+                    raise
+                self.last_error = f"version {version}: {type(e).__name__}: {e}"
+                print(f"Model reload failed, keeping {old.version}: {self.last_error}", flush=True)
+                return old
+            self._bundle = bundle
+            self.last_error = None
+        if old is not None:
+            old.release()
+        return bundle
+
+    def publish(self, source_dir, version: Optional[str] = None, activate: bool = True,
+                compile_forest: bool = True) -> str:
+        """Copy the .pkl artifacts of source_dir into a new version (plus the compiled forest)"""
+        source_dir = Path(source_dir)
+        version = version or time.strftime('%Y%m%d-%H%M%S')
+        if version == UNVERSIONED or version.startswith('.') or '/' in version:
+            raise ValueError(f"Invalid version name {version!r}")
+        final_dir = self.versions_dir / version
+        if final_dir.exists():
+            raise FileExistsError(f"Model version {version} already exists")
+
+        staging = self.versions_dir / f".{version}.{os.getpid()}.tmp"
+        staging.mkdir(parents=True)
+        try:
+            for filename in ARTIFACT_FILES.values():
+                shutil.copy2(source_dir / filename, staging / filename)
+            if compile_forest:
+                export_forest(joblib.load(staging / ARTIFACT_FILES['model']),
+                              joblib.load(staging / ARTIFACT_FILES['scaler']),
+                              str(staging / COMPILED_DIRNAME))
+            manifest = build_manifest(staging, version)
+            _write_atomic(staging / 'manifest.json', json.dumps(manifest, indent=2))
+            os.rename(staging, final_dir)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        if activate:
+            self.activate(version)
+        return version
+
+    def activate(self, version: str):
+        """Point CURRENT at an existing version (also used to roll back)"""
+        path = self.version_path(version)
+        with open(path / 'manifest.json', 'r', encoding='utf-8') as f:
+            verify_manifest(path, json.load(f), checksums=True)
+        _write_atomic(self.root / 'CURRENT', version + '\n')
+        # This process picks it up on its next current() call
+        self._checked = float('-inf')
+
+_stores: Dict[str, ModelStore] = {}
+_stores_lock = threading.Lock()
+
+def get_store(root=None) -> ModelStore:
+    """Process-wide ModelStore for root (default MODELS_DIR)"""
+    key = str(Path(root or MODELS_DIR).resolve())
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = ModelStore(key)
+        return _stores[key]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage versioned model artifacts")
+    parser.add_argument('--models-dir', default=MODELS_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    publish = commands.add_parser('publish', help="add a version from a directory of .pkl files")
+    publish.add_argument('source_dir')
+    publish.add_argument('--version')
+    publish.add_argument('--no-activate', action='store_true')
+    publish.add_argument('--no-compile', action='store_true')
+    activate = commands.add_parser('activate', help="make a published version current")
+    activate.add_argument('version')
+    commands.add_parser('list', help="list published versions")
+    args = parser.parse_args(argv)
+
+    store = ModelStore(args.models_dir)
+    if args.command == 'publish':
+        version = store.publish(args.source_dir, args.version, activate=not args.no_activate,
+                                compile_forest=not args.no_compile)
+        print(f"Published {version}" + ("" if args.no_activate else " (active)"))
+    elif args.command == 'activate':
+        store.activate(args.version)
+        print(f"Active version: {args.version}")
+    else:
+        active = store.active_version()
+        for version in store.list_versions():
+            print(f"{'*' if version == active else ' '} {version}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+"""
+Async HTTP/JSON scoring service around LoanPredictor
+
+Concurrent requests are collected into micro-batches (up to
+--max-batch-size records, waiting at most --max-wait-ms for a batch to fill)
+and each batch is scored with one LoanPredictor.predict_batch call. Requests
+beyond --max-queue pending records are rejected with 503 instead of piling
+up latency.
+
+    python app/scoring_service.py --port 8080 --max-batch-size 64 --max-wait-ms 5
+
+    POST /predict   one record (JSON object) or a list of records
+    GET  /stats     queue depth, batch sizes, p50/p99 latency
+    GET  /metrics   per-stage timings in Prometheus text format (with --trace)
+    GET  /health
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from loan_prediction import LoanPredictor
+from src import tracing
+
+# Largest request body accepted (bytes)
+MAX_BODY_BYTES = 1024 * 1024
+
+class Overloaded(Exception):
+    """Raised when the batch queue is full"""
+
+class LatencyTracker:
+    """Rolling window of request latencies (seconds)"""
+
+    def __init__(self, window: int = 10000):
+        self.samples = deque(maxlen=window)
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentiles_ms(self) -> dict:
+        if not self.samples:
+            return {'p50': None, 'p99': None}
+        p50, p99 = np.percentile(np.fromiter(self.samples, dtype=float), [50, 99])
+        return {'p50': round(float(p50) * 1000, 3), 'p99': round(float(p99) * 1000, 3)}
+
+class MicroBatcher:
+    """
+    Collect single records from concurrent callers into batched model calls
+
+    A batch is dispatched as soon as it holds max_batch_size records or
+    max_wait_ms has passed since its first record arrived. Scoring runs in
+    a worker thread so the event loop keeps accepting requests meanwhile.
+    """
+
+    def __init__(self, predictor: LoanPredictor, max_batch_size: int = 64,
+                 max_wait_ms: float = 5.0, max_queue: int = 1024):
+        self.predictor = predictor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self.queue = None
+        self.latency = LatencyTracker()
+        self.batch_latency = LatencyTracker()
+        self.stats = {'records': 0, 'batches': 0, 'rejected': 0}
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._task = None
+
+    def start(self):
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+        self._executor.shutdown(wait=False)
+
+    def capacity(self) -> int:
+        return self.max_queue - self.queue.qsize()
+
+    async def score(self, records: list) -> list:
+        """Score records, each riding in whichever batch it lands in"""
+        if len(records) > self.capacity():
+            self.stats['rejected'] += len(records)
+            raise Overloaded(f"queue full ({self.queue.qsize()} pending)")
+
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        futures = []
+        for record in records:
+            future = loop.create_future()
+            self.queue.put_nowait((record, future))
+            futures.append(future)
+        results = await asyncio.gather(*futures)
+        self.latency.add(time.perf_counter() - start)
+        return results
+
+    async def _next_batch(self) -> list:
+        batch = [await self.queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            records = [record for record, _ in batch]
+            start = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(
+                    self._executor, self.predictor.predict_batch, records)
+            except Exception as e:
+                results = [{'error': str(e), 'status': 'Error', 'approval_probability': 0.0}
+                           for _ in batch]
+            self.batch_latency.add(time.perf_counter() - start)
+            self.stats['batches'] += 1
+            self.stats['records'] += len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def snapshot(self) -> dict:
+        batches = max(self.stats['batches'], 1)
+        return {
+            **self.stats,
+            'queue_depth': self.queue.qsize() if self.queue else 0,
+            'avg_batch_size': round(self.stats['records'] / batches, 2),
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'request_latency_ms': self.latency.percentiles_ms(),
+            'batch_latency_ms': self.batch_latency.percentiles_ms(),
+        }
+
+class ScoringServer:
+    """Minimal HTTP/1.1 JSON server (keep-alive, Content-Length bodies only)"""
+
+    def __init__(self, batcher: MicroBatcher):
+        self.batcher = batcher
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0))
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                        {'error': 'body too large'}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                status, payload = await self.route(method, path.split('?', 1)[0], body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method: str, path: str, body: bytes):
+        if method == 'GET' and path == '/health':
+            return HTTPStatus.OK, {'status': 'ok'}
+        if method == 'GET' and path == '/stats':
+            return HTTPStatus.OK, self.batcher.snapshot()
+        if method == 'GET' and path == '/metrics':
+            return HTTPStatus.OK, tracing.format_prometheus(tracing.snapshot())
+        if method == 'POST' and path == '/predict':
+            try:
+                data = json.loads(body or b'null')
+            except ValueError:
+                return HTTPStatus.BAD_REQUEST, {'error': 'invalid JSON'}
+            records = data if isinstance(data, list) else [data]
+            if not records or not all(isinstance(r, dict) for r in records):
+                return HTTPStatus.BAD_REQUEST, {'error': 'expected an object or a list of objects'}
+            try:
+                results = await self.batcher.score(records)
+            except Overloaded as e:
+                return HTTPStatus.SERVICE_UNAVAILABLE, {'error': str(e)}
+            return HTTPStatus.OK, results if isinstance(data, list) else results[0]
+        return HTTPStatus.NOT_FOUND, {'error': f'no route for {method} {path}'}
+
+    @staticmethod
+    async def _respond(writer, status: HTTPStatus, payload, keep_alive: bool = True):
+        if isinstance(payload, str):
+            body, content_type = payload.encode('utf-8'), 'text/plain; version=0.0.4'
+        else:
+            body, content_type = json.dumps(payload, default=str).encode('utf-8'), 'application/json'
+        head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+async def serve(host: str, port: int, batcher: MicroBatcher):
+    batcher.start()
+    server = await asyncio.start_server(ScoringServer(batcher).handle, host, port)
+    print(f"Scoring service listening on http://{host}:{port}", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await batcher.stop()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Micro-batching loan scoring service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--max-queue', type=int, default=1024,
+                        help="pending records before requests are rejected with 503")
+    parser.add_argument('--warm-up', action='store_true', help="load the model before serving")
+    parser.add_argument('--trace', action='store_true', help="record per-stage timings for /metrics")
+    args = parser.parse_args(argv)
+
+    if args.trace:
+        tracing.enable()
+    predictor = LoanPredictor()
+    if args.warm_up:
+        predictor.warm_up()
+    batcher = MicroBatcher(predictor, args.max_batch_size, args.max_wait_ms, args.max_queue)
+    try:
+        asyncio.run(serve(args.host, args.port, batcher))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    sys.exit(main())
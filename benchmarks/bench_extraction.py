@@ -0,0 +1,136 @@
+"""
+Micro-benchmark and equivalence check for loan field extraction
+
+Compares the single-pass FieldExtractor behind extract_loan_fields with the
+original implementation (one re.search per field) on generated OCR-like
+text, and fails if any document extracts differently.
+
+    python benchmarks/bench_extraction.py [--docs 500] [--pages 10]
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.config import LOAN_FIELD_PATTERNS, NUMERIC_LOAN_FIELDS, FIELD_PATTERNS
+from src.field_extraction import FieldExtractor
+from src.ocr_processing import extract_loan_fields
+
+def legacy_extract_loan_fields(text, patterns=LOAN_FIELD_PATTERNS, flags=re.IGNORECASE):
+    """Original extract_loan_fields: normalize, then one re.search per field"""
+    text = re.sub(r'[ \t]+', ' ', text)
+    text = re.sub(r'\n+', '\n', text)
+
+    extracted = {}
+    for field, pattern in patterns.items():
+        match = re.search(pattern, text, flags)
+        if match:
+            extracted[field] = match.group(1).strip()
+
+    for field in NUMERIC_LOAN_FIELDS:
+        if field in extracted:
+            extracted[field] = extracted[field].replace(',', '')
+
+    return extracted
+
+FORM_LINES = [
+    "Applicant Name: {name}",
+    "Address: {address}",
+    "Date of Birth: {dob}",
+    "Education: {education}",
+    "Self Employed: {self_employed}",
+    "Number of Dependents: {dependents}",
+    "Annual Income: ₹{income:,}",
+    "Loan Amount Requested: ₹{loan:,}",
+    "Loan Term: {term} years",
+    "CIBIL Score: {cibil}",
+    "Residential Assets: ₹{res:,}",
+    "Commercial Assets: ₹{com:,}",
+    "Luxury Assets: ₹{lux:,}",
+    "Bank Assets: ₹{bank:,}",
+]
+
+FILLER = ("The applicant declares that the information provided is true and "
+          "complete. Loan disbursal is subject to verification of documents "
+          "and the bank's internal credit policy.")
+
+def make_document(rng, pages):
+    values = {
+        'name': rng.choice(['Ravi Kumar', 'Anita Sharma', 'John Mathew']),
+        'address': rng.choice(['12 MG Road, Pune', 'india', '4 Lake View, Chennai']),
+        'dob': f"{rng.randint(1, 28):02d}{rng.choice('-/')}{rng.randint(1, 12):02d}-{rng.randint(1950, 2000)}",
+        'education': rng.choice(['Graduate', 'Not Graduate', 'Undergraduate']),
+        'self_employed': rng.choice(['Yes', 'No']),
+        'dependents': rng.randint(0, 5),
+        'income': rng.randint(100000, 9900000),
+        'loan': rng.randint(100000, 39000000),
+        'term': rng.randint(2, 20),
+        'cibil': rng.randint(300, 900),
+        'res': rng.randint(0, 2000000),
+        'com': rng.randint(0, 2000000),
+        'lux': rng.randint(0, 2000000),
+        'bank': rng.randint(0, 2000000),
+    }
+    lines = []
+    for line in FORM_LINES:
+        if rng.random() < 0.1:
+            continue  # field missing from the scan
+        line = line.format(**values)
+        if rng.random() < 0.2:
+            line = line.upper() if rng.random() < 0.5 else line.replace(': ', ' :  ')
+        lines.append(line)
+    if rng.random() < 0.2:
+        # OCR merged two lines
+        i = rng.randrange(len(lines) - 1)
+        lines[i:i + 2] = [lines[i] + '   ' + lines[i + 1]]
+    pages_text = ["\n".join(lines)]
+    for _ in range(pages - 1):
+        pages_text.append("\n\n".join([FILLER] * rng.randint(5, 20)))
+    return "\n\n".join(pages_text)
+
+def check_equivalence(docs):
+    config_extractor = FieldExtractor(FIELD_PATTERNS, flags=0, numeric_fields=NUMERIC_LOAN_FIELDS)
+    mismatches = 0
+    for doc in docs:
+        if extract_loan_fields(doc) != legacy_extract_loan_fields(doc):
+            mismatches += 1
+        if config_extractor.extract(doc) != legacy_extract_loan_fields(doc, FIELD_PATTERNS, 0):
+            mismatches += 1
+    return mismatches
+
+def time_per_doc(func, docs, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for doc in docs:
+            func(doc)
+        best = min(best, time.perf_counter() - start)
+    return best / len(docs)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--docs', type=int, default=500)
+    parser.add_argument('--pages', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    docs = [make_document(rng, rng.randint(1, args.pages)) for _ in range(args.docs)]
+
+    mismatches = check_equivalence(docs)
+    print(f"equivalence: {len(docs)} documents, {mismatches} mismatches")
+
+    legacy = time_per_doc(legacy_extract_loan_fields, docs, args.repeat)
+    engine = time_per_doc(extract_loan_fields, docs, args.repeat)
+    print(f"legacy re.search per field: {legacy * 1e6:9.1f} us/doc")
+    print(f"single-pass FieldExtractor: {engine * 1e6:9.1f} us/doc  ({legacy / engine:.2f}x)")
+
+    return 1 if mismatches else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Benchmark and equivalence check for the compiled Random Forest
+
+Scores the same feature rows with scaler.transform + model.predict_proba
+and with CompiledForest.predict_proba, fails if any probability differs,
+and reports latency for batches of 1, 100 and 100k rows, also for leaves
+found by model.apply (engine='auto' above COMPILED_MAX_ROWS), plus the extra
+cost of per-feature path contributions (checked to add up to the
+probability) on top of a scoring pass. Uses the trained artifacts from
+--models-dir when they exist, otherwise a stand-in forest trained on
+random data with the same shape.
+
+    python benchmarks/bench_forest.py [--models-dir models] [--rows 1 100 100000]
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent.parent / 'app'))
+
+from compiled_forest import CompiledForest, export_forest
+
+def stand_in_artifacts(seed: int):
+    """Forest + scaler shaped like the loan model (12 features, 100 trees)"""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler
+    rng = np.random.default_rng(seed)
+    X = random_rows(rng, 4000)
+    y = (X[:, 6] + rng.normal(0, 80, len(X)) > 600).astype(int)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=100, random_state=seed).fit(scaler.transform(X), y)
+    return model, scaler
+
+def random_rows(rng, n: int) -> np.ndarray:
+    """Loan-like feature rows: small integers, amounts in the millions, cibil 300-900"""
+    X = rng.integers(0, 40_000_000, size=(n, 12)).astype(np.float64)
+    X[:, 0] = rng.integers(0, 6, n)
+    X[:, 1:3] = rng.integers(0, 2, (n, 2))
+    X[:, 5] = rng.integers(2, 21, n)
+    X[:, 6] = rng.integers(300, 901, n)
+    X[:, 11] = rng.integers(0, 5, n)
+    return X
+
+def best_time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--models-dir', help="directory with loan_approval_model.pkl and scaler.pkl")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1, 100, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    models_dir = Path(args.models_dir) if args.models_dir else None
+    if models_dir is not None and (models_dir / 'loan_approval_model.pkl').exists():
+        model = joblib.load(models_dir / 'loan_approval_model.pkl')
+        scaler = joblib.load(models_dir / 'scaler.pkl')
+        source = str(models_dir)
+    else:
+        model, scaler = stand_in_artifacts(args.seed)
+        source = 'stand-in forest (no --models-dir)'
+    columns = getattr(scaler, 'feature_names_in_', None)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        export_forest(model, scaler, tmp)
+        start = time.perf_counter()
+        compiled = CompiledForest.load(tmp)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        def scaler_input(X):
+            features = pd.DataFrame(X, columns=columns) if columns is not None else X
+            return scaler.transform(features)
+
+        def sklearn_proba(X):
+            return model.predict_proba(scaler_input(X))
+
+        rng = np.random.default_rng(args.seed + 1)
+        print(f"model: {source}, {compiled.n_trees} trees, {len(compiled.feature)} nodes")
+        print(f"compiled forest load (mmap): {load_ms:.2f} ms")
+        mismatches = 0
+        additivity_error = 0.0
+        for n in args.rows:
+            X = random_rows(rng, n)
+            expected = sklearn_proba(X)
+            got = compiled.predict_proba(X)
+            mismatches += int((expected != got).any(axis=1).sum())
+            applied = compiled.proba_from_leaves(compiled.leaves_from_apply(model.apply(scaler_input(X))))
+            mismatches += int((expected != applied).any(axis=1).sum())
+            repeat = args.repeat if n < 10000 else max(1, args.repeat // 2)
+            reference = best_time(lambda: sklearn_proba(X), repeat)
+            fast = best_time(lambda: compiled.predict_proba(X), repeat)
+            via_apply = best_time(lambda: compiled.proba_from_leaves(
+                compiled.leaves_from_apply(model.apply(scaler_input(X)))), repeat)
+            leaves = compiled.traverse(X)
+            contributions = compiled.contributions_from_leaves(leaves)
+            additivity_error = max(additivity_error, float(np.abs(
+                compiled.bias() + contributions.sum(axis=1) - got[:, 1]).max()))
+            explain = best_time(lambda: compiled.contributions_from_leaves(leaves), repeat)
+            print(f"{n:>7} rows: sklearn {reference * 1000:10.3f} ms  "
+                  f"compiled {fast * 1000:10.3f} ms  ({reference / fast:.2f}x)  "
+                  f"apply+leaves {via_apply * 1000:10.3f} ms  "
+                  f"+ contributions {explain * 1000:8.3f} ms")
+        print(f"equivalence: {mismatches} rows with different probabilities")
+        print(f"contributions: bias + sum differs from the probability by at most {additivity_error:.1e}")
+    return 1 if mismatches or additivity_error > 1e-9 else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Benchmark for the spaCy NER fallback, measured apart from OCR
+
+Builds free-text loan letters (the fields stated in sentences, so the
+regexes find none of them) and fills them with NerFallback three ways: one
+nlp() call per document with the full pipeline, nlp.pipe with only the
+entity recognizer enabled in one process, and the same over NER_PROCESSES
+processes. Reports documents/s and latency per document, and fails if the
+batched runs fill different fields than the per-document run. Needs the
+en_core_web_sm model.
+
+    python benchmarks/bench_ner.py [--docs 2000] [--batch-size 32] [--processes 2]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.config import NER_BATCH_SIZE, NER_PROCESSES
+from src.ner_fallback import NLP, NerFallback
+from synthetic import random_fields
+
+LETTER = ("I, the undersigned {applicant_name}, residing at {address}, request a personal loan.\n"
+          "I earn an annual income of ₹{income_annum:,} and wish to borrow ₹{loan_amount:,}.\n"
+          "My bank balance is ₹{bank_assets:,} and I own residential property worth "
+          "₹{residential_assets:,}.\n")
+
+def make_letter(rng: random.Random) -> str:
+    fields = random_fields(rng)
+    for field in ('income_annum', 'loan_amount', 'bank_assets', 'residential_assets'):
+        fields[field] = int(fields[field])
+    return LETTER.format(**fields)
+
+def per_document(fallback: NerFallback, texts):
+    """Unbatched reference: full pipeline, one nlp() call per document"""
+    nlp = fallback.nlp
+    return [fallback.entity_fields(nlp(text), fallback.missing({})) for text in texts]
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--docs', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=NER_BATCH_SIZE)
+    parser.add_argument('--processes', type=int, default=NER_PROCESSES)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    try:
+        NLP.get()
+    except (ImportError, OSError) as e:
+        print(f"spaCy model unavailable: {e}")
+        return 2
+
+    rng = random.Random(args.seed)
+    texts = [make_letter(rng) for _ in range(args.docs)]
+    empty = [{} for _ in texts]
+
+    reference, seconds = timed(lambda: per_document(NerFallback(), texts))
+    print(f"{'nlp() per document':<28} {len(texts) / seconds:8.1f} docs/s  "
+          f"{seconds / len(texts) * 1000:7.2f} ms/doc")
+
+    mismatches = 0
+    for label, processes in [('nlp.pipe, 1 process', 1),
+                             (f'nlp.pipe, {args.processes} processes', args.processes)]:
+        fallback = NerFallback(batch_size=args.batch_size, n_process=processes)
+        filled, seconds = timed(lambda: fallback.fill(texts, empty))
+        mismatches += sum(a != b for a, b in zip(filled, reference))
+        summary = fallback.summary()
+        print(f"{label:<28} {len(texts) / seconds:8.1f} docs/s  "
+              f"{seconds / len(texts) * 1000:7.2f} ms/doc  ({summary['batches']} batches)")
+
+    found = sum(len(fields) for fields in reference) / max(1, len(reference))
+    print(f"fields filled per document: {found:.2f} of {len(NerFallback().fields)}")
+    print(f"equivalence: {mismatches} documents filled differently when batched")
+    return 1 if mismatches else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+Per-stage time and allocation benchmark for image preprocessing
+
+Runs the shared PreprocessPipeline ('fast' OCR binarization and the
+'enhanced' preprocess_image stages) against the original, copy-per-step
+implementations on synthetic page images, and reports per-stage time plus
+bytes allocated per page (tracemalloc sees numpy/OpenCV buffers).
+
+    python benchmarks/bench_preprocessing.py [--dpi 200 300] [--pages 20]
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.preprocessing import PreprocessPipeline, FAST_STAGES, ENHANCED_STAGES
+
+def legacy_ocr_binarize(img):
+    """Original extract_text_from_image preprocessing"""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    return cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)[1]
+
+def legacy_preprocess_image(img):
+    """Original preprocess_image on a PIL-style RGB array"""
+    img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)[1]
+    kernel = np.ones((1, 1), np.uint8)
+    cleaned = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel)
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    return clahe.apply(cleaned)
+
+def synthetic_page(dpi, seed=0):
+    """Letter-size RGB page with text-like dark strokes on a noisy background"""
+    rng = np.random.default_rng(seed)
+    height, width = int(11 * dpi), int(8.5 * dpi)
+    page = np.full((height, width, 3), 235, dtype=np.uint8)
+    page += rng.integers(0, 20, size=page.shape, dtype=np.uint8)
+    line_height = max(4, dpi // 8)
+    for y in range(dpi // 2, height - dpi // 2, line_height * 2):
+        x = dpi // 2
+        while x < width - dpi // 2:
+            word = int(rng.integers(dpi // 6, dpi // 2))
+            page[y:y + line_height, x:x + word] = 30
+            x += word + dpi // 10
+    return page
+
+def measure(func, pages):
+    """(seconds per page, bytes allocated per page)"""
+    func(pages[0])  # warm up buffers / OpenCV
+    tracemalloc.start()
+    allocated = 0
+    start = time.perf_counter()
+    for page in pages:
+        snapshot = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        func(page)
+        allocated += tracemalloc.get_traced_memory()[1] - snapshot
+    seconds = time.perf_counter() - start
+    tracemalloc.stop()
+    return seconds / len(pages), allocated / len(pages)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--dpi', type=int, nargs='+', default=[200, 300])
+    parser.add_argument('--pages', type=int, default=10)
+    args = parser.parse_args()
+
+    for dpi in args.dpi:
+        pages = [synthetic_page(dpi, seed) for seed in range(args.pages)]
+        print(f"\n{dpi} DPI page {pages[0].shape[1]}x{pages[0].shape[0]}")
+
+        fast = PreprocessPipeline(FAST_STAGES, profile=True)
+        enhanced = PreprocessPipeline(ENHANCED_STAGES, profile=True)
+        runs = [
+            ('legacy OCR binarize', legacy_ocr_binarize),
+            ('pipeline fast', lambda page: fast.process(page, 'rgb')),
+            ('legacy preprocess_image', legacy_preprocess_image),
+            ('pipeline enhanced', lambda page: enhanced.process(page, 'rgb')),
+        ]
+        for name, func in runs:
+            seconds, allocated = measure(func, pages)
+            print(f"  {name:<24} {seconds * 1000:8.2f} ms/page  {allocated / 1e6:8.2f} MB allocated/page")
+
+        for name, pipeline in [('fast', fast), ('enhanced', enhanced)]:
+            print(f"  stages ({name}):")
+            for stage, stats in pipeline.stage_stats.items():
+                print(f"    {stage:<10} {stats['seconds'] / stats['calls'] * 1000:8.2f} ms  "
+                      f"{stats['allocated_bytes'] / 1e6:8.2f} MB buffers (total)")
+
+if __name__ == '__main__':
+    main()
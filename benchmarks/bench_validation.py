@@ -0,0 +1,123 @@
+"""
+Benchmark and equivalence check for extracted-data validation
+
+Compares the original record-at-a-time validate_extracted_data loop with
+ValidationEngine.validate_one, today's validate_extracted_data (the path
+every caller takes for one record) and the columnar ValidationEngine.validate on
+generated records (valid values, out-of-range numbers, OCR garbage), and
+fails if any record gets different error messages.
+
+    python benchmarks/bench_validation.py [--records 20000]
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.config import VALIDATION_RULES
+from src.data_validation import ValidationEngine, validate_extracted_data
+from synthetic import random_fields
+
+def legacy_validate(data, rules):
+    """Original validate_extracted_data (with the missing `import re` added)"""
+    errors = {}
+    for field, value in data.items():
+        if field in rules:
+            field_rules = rules[field]
+            if 'min_value' in field_rules or 'max_value' in field_rules:
+                try:
+                    num_value = float(str(value).replace(',', '').replace('$', ''))
+                    if 'min_value' in field_rules and num_value < field_rules['min_value']:
+                        errors[field] = f"Value too small (min {field_rules['min_value']})"
+                    if 'max_value' in field_rules and num_value > field_rules['max_value']:
+                        errors[field] = f"Value too large (max {field_rules['max_value']})"
+                except ValueError:
+                    errors[field] = "Invalid numeric format"
+            if 'min_length' in field_rules and len(str(value)) < field_rules['min_length']:
+                errors[field] = f"Too short (min {field_rules['min_length']} chars)"
+            if 'max_length' in field_rules and len(str(value)) > field_rules['max_length']:
+                errors[field] = f"Too long (max {field_rules['max_length']} chars)"
+            if 'pattern' in field_rules and not re.match(field_rules['pattern'], str(value)):
+                errors[field] = "Invalid format"
+    return errors if errors else None
+
+GARBAGE = [True, None, 3.5, '', 'N/A', '1_000', 'nan', '12O0', '$5,000', '-3', '1e5', ' 42 ', 'O', 'inf']
+
+def make_record(rng):
+    record = {
+        'loan_id': rng.choice(['LN12345', 'ln1', 'LOAN2024XYZ', 'A' * 25]),
+        'applicant_name': rng.choice(['Ravi Kumar', 'R', "Anita D'Souza", 'J0hn']),
+        'address': rng.choice(['12 MG Road Pune', 'X', 'india']),
+        'dob': rng.choice(['01-02-1990', '1/2/1990', '15/08/1985']),
+        'education': rng.choice(['Graduate', 'Not Graduate', 'GRADUATE']),
+        'self_employed': rng.choice(['Yes', 'No', 'yes']),
+        'no_of_dependents': str(rng.randint(0, 25)),
+        'income_annum': str(rng.randint(0, 2000000)),
+        'loan_amount': f"{rng.randint(0, 900000):,}",
+        'loan_term': rng.randint(0, 40),
+        'cibil_score': str(rng.randint(100, 999)),
+        'residential_assets': str(rng.randint(-100000, 2000000)),
+        'bank_assets': rng.randint(0, 2000000),
+    }
+    for field in rng.sample(sorted(record), rng.randint(0, 3)):
+        if rng.random() < 0.5:
+            del record[field]
+        else:
+            record[field] = rng.choice(GARBAGE)
+    return record
+
+def best_time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--records', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    records = [make_record(rng) for _ in range(args.records)]
+
+    # The original loop knows no 'allowed_values' rules: compare on the rest
+    legacy_rules = {field: {k: v for k, v in rules.items() if k != 'allowed_values'}
+                    for field, rules in VALIDATION_RULES.items()}
+    legacy_engine = ValidationEngine(legacy_rules)
+    engine = ValidationEngine()
+
+    expected = [legacy_validate(record, legacy_rules) for record in records]
+    mismatches = sum(legacy_engine.validate_one(r) != e for r, e in zip(records, expected))
+    mismatches += sum(a != b for a, b in zip(legacy_engine.validate(records).to_list(), expected))
+    mismatches += sum(a != engine.validate_one(r)
+                      for a, r in zip(engine.validate(records).to_list(), records))
+    print(f"equivalence: {len(records)} records, {mismatches} mismatches")
+
+    clean = [random_fields(rng) for _ in range(args.records)]
+    for label, batch_records in [('mixed records', records), ('clean extractor output', clean)]:
+        legacy = best_time(lambda: [legacy_validate(r, VALIDATION_RULES) for r in batch_records],
+                           args.repeat)
+        single = best_time(lambda: [engine.validate_one(r) for r in batch_records], args.repeat)
+        public = best_time(lambda: [validate_extracted_data(r) for r in batch_records], args.repeat)
+        batch = best_time(lambda: engine.validate(batch_records), args.repeat)
+        per = lambda seconds: seconds / len(batch_records) * 1e6
+        print(f"\n{label}")
+        print(f"legacy loop per record:        {per(legacy):8.2f} us/record")
+        print(f"ValidationEngine.validate_one: {per(single):8.2f} us/record  ({legacy / single:.2f}x)")
+        print(f"validate_extracted_data:       {per(public):8.2f} us/record  ({legacy / public:.2f}x)")
+        print(f"ValidationEngine.validate:     {per(batch):8.2f} us/record  ({legacy / batch:.2f}x)")
+
+    result = engine.validate(records)
+    print(f"\nsummary (mixed records): {result.summary()}")
+    return 1 if mismatches else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
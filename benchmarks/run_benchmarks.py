@@ -0,0 +1,322 @@
+"""
+End-to-end pipeline benchmark on synthetic loan documents
+
+Generates documents with benchmarks/synthetic.py (or reuses a directory
+written by it), runs each through the real pipeline (extract_document,
+i.e. process_document without the NER fallback) and times every stage
+separately: rasterize, preprocess and OCR from the pipeline's own tracing
+spans, then extract, validate, predict and batch predict. Extraction
+accuracy is scored against the ground truth. Stages that cannot run here
+(no poppler, no Tesseract) are reported as skipped. Results are written as JSON. Pass
+--baseline with an earlier result file to flag stages that got slower, or
+accuracy that dropped, beyond --tolerance (exit status 1).
+
+    python benchmarks/run_benchmarks.py --docs 20 --pages 3 --output bench.json
+    python benchmarks/run_benchmarks.py --baseline bench.json --tolerance 0.15
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+from pdf2image.exceptions import PDFInfoNotInstalledError, PDFPageCountError, PDFSyntaxError
+from PIL import Image
+
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / 'app'))
+
+from src.config import LOAN_FIELD_PATTERNS, PDF_DPI
+from src.data_validation import validate_extracted_data
+from src.ocr_processing import extract_document, extract_loan_fields
+from src.preprocessing import convert_pdf_to_images, get_pipeline
+from src import ocr_engine, tracing
+from synthetic import form_lines, load_ground_truth, write_dataset
+
+STAGES = ('rasterize', 'preprocess', 'ocr', 'extract', 'validate', 'predict', 'batch_predict')
+
+# Stages timed from the spans extract_document records
+PIPELINE_STAGES = ('rasterize', 'preprocess', 'ocr')
+
+# pdf2image errors when poppler is missing or cannot read the file
+RASTERIZE_ERRORS = (PDFInfoNotInstalledError, PDFPageCountError, PDFSyntaxError)
+
+class StageTimer:
+    """Wall-clock samples per stage; each sample covers `items` pages/records"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.skipped = {}
+
+    def add(self, stage: str, seconds: float, items: int = 1):
+        self.samples[stage].append((seconds, items))
+
+    @contextmanager
+    def time(self, stage: str, items: int = 1):
+        """Time the block; nothing is recorded if it raises"""
+        start = time.perf_counter()
+        yield
+        self.add(stage, time.perf_counter() - start, items)
+
+    def skip(self, stage: str, reason: str):
+        self.skipped.setdefault(stage, reason)
+
+    def summary(self) -> dict:
+        summary = {}
+        for stage in STAGES:
+            if stage in self.samples:
+                seconds = np.array([s for s, _ in self.samples[stage]])
+                items = sum(n for _, n in self.samples[stage])
+                p50, p95 = np.percentile(seconds, [50, 95])
+                summary[stage] = {
+                    'calls': len(seconds),
+                    'items': items,
+                    'total_s': round(float(seconds.sum()), 6),
+                    'per_item_ms': round(float(seconds.sum()) / max(items, 1) * 1000, 4),
+                    'p50_ms': round(float(p50) * 1000, 4),
+                    'p95_ms': round(float(p95) * 1000, 4),
+                }
+            elif stage in self.skipped:
+                summary[stage] = {'skipped': self.skipped[stage]}
+        return summary
+
+class SpanRecorder:
+    """
+    Tracing exporter that keeps one document's pipeline spans
+
+    commit() hands them to a StageTimer once the document went through, so
+    a document that failed half-way adds no samples.
+    """
+
+    def __init__(self):
+        self.events = []
+
+    def export(self, event: dict, tracer):
+        if event['span'] in PIPELINE_STAGES and 'error' not in event:
+            self.events.append(event)
+
+    def flush(self, tracer):
+        pass
+
+    def commit(self, timer: StageTimer):
+        for event in self.events:
+            timer.add(event['span'], event['duration_ms'] / 1000, event.get('pages', 1))
+        self.events = []
+
+@contextmanager
+def recording(recorder: SpanRecorder):
+    """Route the process-wide tracer to `recorder` for the block"""
+    tracer = tracing.tracer
+    enabled, exporters = tracer.enabled, tracer.exporters
+    recorder.events = []
+    tracing.enable([recorder])
+    try:
+        yield recorder
+    finally:
+        tracer.enabled, tracer.exporters = enabled, exporters
+
+def rasterize(path: str, dpi: int, timer: StageTimer) -> list:
+    """Pages of one document, timed; [] once rasterizing proved impossible"""
+    if not path.lower().endswith('.pdf'):
+        return [Image.open(path).convert('RGB')]
+    if 'rasterize' in timer.skipped:
+        return []
+    start = time.perf_counter()
+    try:
+        pages = convert_pdf_to_images(path, dpi=dpi)
+    except RASTERIZE_ERRORS as e:
+        timer.skip('rasterize', f"{type(e).__name__}: {e}")
+        return []
+    timer.add('rasterize', time.perf_counter() - start, len(pages))
+    return pages
+
+def score_accuracy(truth: dict, extracted: dict) -> dict:
+    """Per-field and overall exact-match accuracy of extracted vs ground-truth fields"""
+    per_field = {field: {'correct': 0, 'wrong': 0, 'missing': 0} for field in LOAN_FIELD_PATTERNS}
+    exact_docs = 0
+    for name, expected in truth.items():
+        got = extracted.get(name, {})
+        all_correct = True
+        for field, value in expected.items():
+            if field not in got:
+                per_field[field]['missing'] += 1
+                all_correct = False
+            elif got[field] == value:
+                per_field[field]['correct'] += 1
+            else:
+                per_field[field]['wrong'] += 1
+                all_correct = False
+        exact_docs += all_correct
+
+    total = sum(sum(counts.values()) for counts in per_field.values())
+    correct = sum(counts['correct'] for counts in per_field.values())
+    for counts in per_field.values():
+        expected = sum(counts.values())
+        counts['accuracy'] = round(counts['correct'] / expected, 4) if expected else None
+    return {
+        'documents': len(truth),
+        'field_accuracy': round(correct / total, 4) if total else None,
+        'document_exact_match': round(exact_docs / len(truth), 4) if truth else None,
+        'fields': per_field,
+    }
+
+def load_predictor():
+    """LoanPredictor with artifacts loaded, or (None, reason) if they are unavailable"""
+    try:
+        from loan_prediction import LoanPredictor
+        predictor = LoanPredictor()
+        predictor.warm_up()
+        return predictor, None
+    except Exception as e:
+        return None, f"model unavailable: {type(e).__name__}: {e}"
+
+def run(data_dir: str, truth: dict, dpi: int, predict: bool = True) -> dict:
+    timer = StageTimer()
+    recorder = SpanRecorder()
+    pipeline = get_pipeline('fast')
+    texts, ocr_fields = {}, {}
+
+    for name in sorted(truth):
+        path = os.path.join(data_dir, name)
+        if 'ocr' not in timer.skipped and not (path.lower().endswith('.pdf')
+                                               and 'rasterize' in timer.skipped):
+            try:
+                with recording(recorder):
+                    texts[name], ocr_fields[name] = extract_document(path, dpi=dpi)
+                recorder.commit(timer)
+                continue
+            except RASTERIZE_ERRORS as e:
+                timer.skip('rasterize', f"{type(e).__name__}: {e}")
+            except Exception as e:
+                timer.skip('ocr', f"{type(e).__name__}: {e}")
+
+        # The pipeline cannot run here: time what can run on its own, and
+        # the text stages on the rendered form text
+        pages = rasterize(path, dpi, timer)
+        if not pages:
+            timer.skip('preprocess', "no pages (rasterize skipped)")
+            timer.skip('ocr', "no pages (rasterize skipped)")
+        for page in pages:
+            with timer.time('preprocess'):
+                pipeline.process(np.asarray(page), 'rgb', copy=True)
+        texts[name] = "\n".join(form_lines(truth[name]))
+
+    extracted = {}
+    for name, text in texts.items():
+        with timer.time('extract'):
+            fields = extract_loan_fields(text)
+        extracted[name] = ocr_fields.get(name, fields)
+    for fields in extracted.values():
+        with timer.time('validate'):
+            validate_extracted_data(fields)
+
+    predictor, reason = load_predictor() if predict else (None, 'disabled (--no-predict)')
+    if predictor is None:
+        timer.skip('predict', reason)
+        timer.skip('batch_predict', reason)
+    else:
+        records = [extracted[name] for name in sorted(extracted)]
+        for record in records:
+            with timer.time('predict'):
+                predictor.predict(record)
+        with timer.time('batch_predict', items=len(records)):
+            predictor.predict_batch(records)
+
+    accuracy = (score_accuracy(truth, extracted) if len(ocr_fields) == len(truth)
+                else {'skipped': 'no OCR results'})
+    return {'stages': timer.summary(), 'accuracy': accuracy}
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=project_root,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list:
+    """Regressions of result vs baseline (slower per item, or lower accuracy)"""
+    regressions = []
+    for stage, current in result['stages'].items():
+        before = baseline.get('stages', {}).get(stage, {})
+        if 'per_item_ms' not in current or 'per_item_ms' not in before:
+            continue
+        ratio = current['per_item_ms'] / max(before['per_item_ms'], 1e-9)
+        print(f"{stage:14s} {before['per_item_ms']:10.3f} -> {current['per_item_ms']:10.3f} ms/item"
+              f"  ({ratio:.2f}x)")
+        if ratio > 1 + tolerance:
+            regressions.append(f"{stage} is {ratio:.2f}x slower")
+    now = result['accuracy'].get('field_accuracy')
+    then = baseline.get('accuracy', {}).get('field_accuracy')
+    if now is not None and then is not None:
+        print(f"{'field accuracy':14s} {then:10.4f} -> {now:10.4f}")
+        if now < then:
+            regressions.append(f"field accuracy dropped {then:.4f} -> {now:.4f}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--data-dir', help="existing synthetic dataset (default: generate one)")
+    parser.add_argument('--docs', type=int, default=10)
+    parser.add_argument('--pages', type=int, default=2)
+    parser.add_argument('--dpi', type=int, default=PDF_DPI)
+    parser.add_argument('--noise', type=float, default=0.02)
+    parser.add_argument('--skew', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-predict', action='store_true')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help="earlier result file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="allowed slowdown per stage before it counts as a regression")
+    args = parser.parse_args()
+
+    settings = {k: getattr(args, k) for k in ('docs', 'pages', 'dpi', 'noise', 'skew', 'seed')}
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data_dir or tmp
+        truth = load_ground_truth(data_dir) if args.data_dir else None
+        if truth is None:
+            truth = write_dataset(data_dir, args.docs, args.pages, args.dpi, args.noise,
+                                  args.skew, args.seed)
+        result = run(data_dir, truth, args.dpi, predict=not args.no_predict)
+
+    result['meta'] = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'ocr_engine': ocr_engine.get_engine().name,
+        'settings': settings,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+
+    for stage, summary in result['stages'].items():
+        if 'skipped' in summary:
+            print(f"{stage:14s} skipped: {summary['skipped']}")
+        else:
+            print(f"{stage:14s} {summary['per_item_ms']:10.3f} ms/item  "
+                  f"p50 {summary['p50_ms']:.3f} ms  p95 {summary['p95_ms']:.3f} ms  "
+                  f"({summary['items']} items)")
+    if 'field_accuracy' in result['accuracy']:
+        print(f"field accuracy {result['accuracy']['field_accuracy']:.4f}, "
+              f"exact documents {result['accuracy']['document_exact_match']:.4f}")
+    print(f"results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""
+Synthetic loan application documents with known ground truth
+
+Renders "Label: value" form pages in the layout extract_loan_fields expects
+(one field per line, labels from LOAN_FIELD_LABELS), optionally followed by
+filler pages, with adjustable scan noise, skew and resolution. Documents are
+written as multi-page PDFs plus a ground_truth.json holding the fields
+extraction should return for each file.
+
+    python benchmarks/synthetic.py OUT_DIR [--docs 20] [--pages 3] [--noise 0.05] [--skew 1.5]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.config import LOAN_FIELD_PATTERNS, LOAN_FIELD_LABELS, NUMERIC_LOAN_FIELDS
+
+FONT_CANDIDATES = ['DejaVuSans.ttf', 'Arial.ttf', 'arial.ttf', 'LiberationSans-Regular.ttf',
+                   '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf']
+
+FILLER = ("The applicant declares that the information provided is true and "
+          "complete. Loan disbursal is subject to verification of documents "
+          "and the bank's internal credit policy.")
+
+NAMES = ['Ravi Kumar', 'Anita Sharma', 'John Mathew', 'Priya Nair', 'Arjun Mehta']
+ADDRESSES = ['12 MG Road Pune', '4 Lake View Chennai', '88 Park Street Kolkata',
+             '7 Residency Road Bangalore']
+
+def random_fields(rng: random.Random) -> Dict[str, str]:
+    """Ground-truth field values, formatted the way extraction returns them"""
+    return {
+        'applicant_name': rng.choice(NAMES),
+        'address': rng.choice(ADDRESSES),
+        'dob': f"{rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}-{rng.randint(1950, 2000)}",
+        'education': rng.choice(['Graduate', 'Not Graduate']),
+        'self_employed': rng.choice(['Yes', 'No']),
+        'no_of_dependents': str(rng.randint(0, 5)),
+        'income_annum': str(rng.randrange(200000, 9900000, 100000)),
+        'loan_amount': str(rng.randrange(300000, 39500000, 100000)),
+        'loan_term': str(rng.randrange(2, 21, 2)),
+        'cibil_score': str(rng.randint(300, 900)),
+        'residential_assets': str(rng.randrange(0, 29100000, 100000)),
+        'commercial_assets': str(rng.randrange(0, 19400000, 100000)),
+        'luxury_assets': str(rng.randrange(300000, 39200000, 100000)),
+        'bank_assets': str(rng.randrange(0, 14700000, 100000)),
+    }
+
+def form_lines(fields: Dict[str, str]) -> List[str]:
+    """Printed form lines for the fields, in LOAN_FIELD_PATTERNS order"""
+    lines = []
+    for field in LOAN_FIELD_PATTERNS:
+        if field not in fields:
+            continue
+        value = fields[field]
+        if field in NUMERIC_LOAN_FIELDS:
+            value = f"{int(value):,}"
+        elif field == 'loan_term':
+            value = f"{value} years"
+        label = LOAN_FIELD_LABELS.get(field, [field.replace('_', ' ').title()])[0]
+        lines.append(f"{label}: {value}")
+    return lines
+
+def load_font(size: int):
+    for candidate in FONT_CANDIDATES:
+        try:
+            return ImageFont.truetype(candidate, size)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+def render_page(lines: List[str], dpi: int = 200, font_pt: float = 12.0) -> Image.Image:
+    """Clean letter-size page with one text line per entry"""
+    width, height = int(8.5 * dpi), int(11 * dpi)
+    page = Image.new('L', (width, height), 255)
+    draw = ImageDraw.Draw(page)
+    font = load_font(max(8, round(font_pt * dpi / 72)))
+    x = y = dpi
+    line_height = round(font_pt * dpi / 72 * 1.8)
+    for line in lines:
+        if y + line_height > height - dpi:
+            break
+        draw.text((x, y), line, fill=0, font=font)
+        y += line_height
+    return page
+
+def wrap(text: str, width: int = 80) -> List[str]:
+    lines, current = [], ''
+    for word in text.split():
+        if current and len(current) + len(word) + 1 > width:
+            lines.append(current)
+            current = word
+        else:
+            current = f"{current} {word}".strip()
+    return lines + ([current] if current else [])
+
+def degrade(page: Image.Image, noise: float = 0.0, skew: float = 0.0,
+            seed: int = 0) -> Image.Image:
+    """Scan artefacts: rotation by `skew` degrees, then speckle/grain at `noise` (0..1)"""
+    if skew:
+        page = page.rotate(skew, resample=Image.BICUBIC, expand=False, fillcolor=255)
+    if noise > 0:
+        rng = np.random.default_rng(seed)
+        pixels = np.asarray(page, dtype=np.float32)
+        pixels += rng.normal(0, 255 * noise, pixels.shape)
+        speckle = rng.random(pixels.shape)
+        pixels[speckle < noise / 20] = 0
+        pixels[speckle > 1 - noise / 20] = 255
+        page = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+    return page
+
+def render_document(fields: Dict[str, str], pages: int = 1, dpi: int = 200,
+                    noise: float = 0.0, skew: float = 0.0, seed: int = 0) -> List[Image.Image]:
+    """Form page followed by pages-1 filler pages, as RGB images"""
+    texts = [form_lines(fields)]
+    for _ in range(pages - 1):
+        texts.append(wrap(" ".join([FILLER] * 12)))
+    return [degrade(render_page(lines, dpi), noise, skew, seed + n).convert('RGB')
+            for n, lines in enumerate(texts)]
+
+def save_pdf(images: List[Image.Image], path: str, dpi: int = 200):
+    images[0].save(path, 'PDF', save_all=True, append_images=images[1:], resolution=dpi)
+
+def write_dataset(out_dir: str, docs: int = 20, pages: int = 1, dpi: int = 200,
+                  noise: float = 0.0, skew: float = 0.0, seed: int = 0,
+                  fmt: str = 'pdf') -> Dict[str, Dict[str, str]]:
+    """Write docs documents plus ground_truth.json; returns {file name: fields}"""
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    truth = {}
+    for i in range(docs):
+        fields = random_fields(rng)
+        angle = rng.uniform(-skew, skew) if skew else 0.0
+        images = render_document(fields, pages, dpi, noise, angle, seed=seed * 1000 + i)
+        if fmt == 'pdf':
+            name = f"loan_{i:04d}.pdf"
+            save_pdf(images, os.path.join(out_dir, name), dpi)
+        else:
+            name = f"loan_{i:04d}.{fmt}"
+            images[0].save(os.path.join(out_dir, name))
+        truth[name] = fields
+    with open(os.path.join(out_dir, 'ground_truth.json'), 'w', encoding='utf-8') as f:
+        json.dump(truth, f, indent=2)
+    return truth
+
+def load_ground_truth(out_dir: str) -> Optional[Dict[str, Dict[str, str]]]:
+    path = os.path.join(out_dir, 'ground_truth.json')
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('out_dir')
+    parser.add_argument('--docs', type=int, default=20)
+    parser.add_argument('--pages', type=int, default=1)
+    parser.add_argument('--dpi', type=int, default=200)
+    parser.add_argument('--noise', type=float, default=0.0, help="grain/speckle level, 0..1")
+    parser.add_argument('--skew', type=float, default=0.0, help="max rotation in degrees")
+    parser.add_argument('--format', choices=['pdf', 'png', 'jpg'], default='pdf')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    truth = write_dataset(args.out_dir, args.docs, args.pages, args.dpi, args.noise,
+                          args.skew, args.seed, args.format)
+    print(f"wrote {len(truth)} documents to {args.out_dir}")
+
+if __name__ == '__main__':
+    main()
@@ -6,9 +6,155 @@ DATA_DIR = os.path.join(BASE_DIR, 'data')
 RAW_DOCS_DIR = os.path.join(DATA_DIR, 'raw_documents')
 PROCESSED_DIR = os.path.join(DATA_DIR, 'processed')
 
+# Trained model artifacts (app/model_store.py layout), and how often (s)
+# running processes check it for a newly activated version
+MODELS_DIR = os.environ.get('LOAN_MODELS_DIR') or os.path.join(BASE_DIR, 'models')
+MODEL_RELOAD_INTERVAL = 5.0
+
+# With engine='auto', batches above this many rows find their leaves with
+# scikit-learn's compiled traversal (model.apply), which overtakes the
+# NumPy walk of the compiled forest at a few hundred rows
+COMPILED_MAX_ROWS = 256
+
+# Prediction explanations (per-feature path contributions): factors
+# returned per prediction by default, and cached feature vectors
+EXPLAIN_TOP_K = 5
+EXPLAIN_CACHE_SIZE = 10000
+
 # OCR Configuration
 TESSERACT_CONFIG = r'--oem 3 --psm 6'
 
+# PDF rasterization: target DPI and pages rasterized per window
+PDF_DPI = 200
+PDF_RASTER_WINDOW = 1
+# DPI of the first-page preview shown in the UI
+PREVIEW_DPI = 40
+
+# Page images wider than this (pixels) are downscaled before thresholding;
+# 1700 px is a letter-size page at 200 DPI. None disables resizing.
+PREPROCESS_TARGET_WIDTH = 1700
+
+# Worker processes used to OCR PDF pages in parallel
+OCR_WORKERS = os.cpu_count() or 1
+
+# OCR engine: 'pool' (warm worker processes), 'api' (in-process tesserocr),
+# 'cli' (tesseract via stdin/stdout) or 'pytesseract' (temp file per call).
+# 'auto' is 'pool' when tesserocr is installed and 'cli' otherwise: without
+# it, pool workers would still start one tesseract process per image.
+OCR_ENGINE = 'auto'
+OCR_POOL_SIZE = OCR_WORKERS
+# Seconds before a hung OCR call is abandoned and its worker restarted
+OCR_TIMEOUT = 120
+
+# Background document jobs in the UI (app/jobs.py): worker processes
+# (each OCRs with OCR_WORKERS // JOB_WORKERS Tesseract workers), jobs one
+# session may have queued or running, finished jobs kept for display, and
+# how often (s) the UI polls a running job
+JOB_WORKERS = 2
+JOB_MAX_PER_USER = 2
+JOB_HISTORY = 100
+JOB_POLL_INTERVAL = 1.0
+
+# Bump when OCR/extraction output changes so cached results are discarded
+PIPELINE_VERSION = '2'
+
+# Per-stage tracing (src/tracing.py), off unless LOAN_TRACING=1. Optional
+# exporters: one JSON line per span, and a Prometheus text file of totals
+TRACING_ENABLED = os.environ.get('LOAN_TRACING', '0') == '1'
+TRACE_LOG_PATH = os.environ.get('LOAN_TRACE_LOG') or None
+METRICS_PATH = os.environ.get('LOAN_METRICS_FILE') or None
+
+# OCR result cache (memory LRU + JSON files on disk)
+CACHE_DIR = os.path.join(PROCESSED_DIR, 'ocr_cache')
+CACHE_MAX_ENTRIES = 256
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Loan application fields (regex patterns, tolerant to OCR errors)
+LOAN_FIELD_PATTERNS = {
+    'applicant_name': r'Applicant\s*Name\s*[:\-]?\s*(.+)',
+    'address': r'Address\s*[:\-]?\s*(.+)',
+    'dob': r'Date\s*of\s*Birth\s*[:\-]?\s*(\d{2}[-/]\d{2}[-/]\d{4})',
+    'education': r'Education\s*[:\-]?\s*(Graduate|Not Graduate|Undergraduate)',
+    'self_employed': r'Self\s*Employed\s*[:\-]?\s*(Yes|No)',
+    'no_of_dependents': r'(?:Number\s*of\s*)?Dependents\s*[:\-]?\s*(\d+)',
+    'income_annum': r'Annual\s*Income\s*[:\-]?\s*₹?\s*([\d,]+)',
+    'loan_amount': r'Loan\s*Amount\s*(?:Requested)?\s*[:\-]?\s*₹?\s*([\d,]+)',
+    'loan_term': r'Loan\s*Term\s*[:\-]?\s*(\d+)',
+    'cibil_score': r'CIBIL\s*Score\s*[:\-]?\s*(\d+)',
+    'residential_assets': r'Residential\s*Assets\s*[:\-]?\s*₹?\s*([\d,]+)',
+    'commercial_assets': r'Commercial\s*Assets\s*[:\-]?\s*₹?\s*([\d,]+)',
+    'luxury_assets': r'Luxury\s*Assets\s*[:\-]?\s*₹?\s*([\d,]+)',
+    'bank_assets': r'Bank\s*Assets\s*[:\-]?\s*₹?\s*([\d,]+)'
+}
+
+# Early-exit page scheduling (process_document(early_exit=True)): pages
+# OCRed first (1-based, negative counts from the end; the rest follow in
+# order), and the fields whose discovery ends OCR of further pages
+PAGE_PRIORITY = [1, 2]
+EARLY_EXIT_FIELDS = list(LOAN_FIELD_PATTERNS)
+
+# A page is blank (not OCRed) when fewer than this fraction of its pixels
+# are darker than BLANK_PAGE_DARK_LEVEL (0-255 grayscale)
+BLANK_PAGE_INK_RATIO = 0.002
+BLANK_PAGE_DARK_LEVEL = 128
+
+# Adaptive preprocessing (process_document(adaptive=True)): pages are OCRed
+# after binarization only, and lines whose mean word confidence (0-100) is
+# below ADAPTIVE_MIN_CONFIDENCE, or that hold the label of a missing field,
+# are read again from the enhanced (opening + CLAHE) image. Pages where more
+# than ADAPTIVE_FULL_PAGE_RATIO of the lines are low-confidence are read
+# again whole. Re-read lines are cropped with ADAPTIVE_LINE_PADDING pixels
+# of margin.
+ADAPTIVE_MIN_CONFIDENCE = 60
+ADAPTIVE_FULL_PAGE_RATIO = 0.5
+ADAPTIVE_LINE_PADDING = 4
+
+# Printed labels of the loan fields, for layout (word-box) extraction
+LOAN_FIELD_LABELS = {
+    'applicant_name': ['Applicant Name'],
+    'address': ['Address'],
+    'dob': ['Date of Birth'],
+    'education': ['Education'],
+    'self_employed': ['Self Employed'],
+    'no_of_dependents': ['Number of Dependents', 'Dependents'],
+    'income_annum': ['Annual Income'],
+    'loan_amount': ['Loan Amount Requested', 'Loan Amount'],
+    'loan_term': ['Loan Term'],
+    'cibil_score': ['CIBIL Score'],
+    'residential_assets': ['Residential Assets'],
+    'commercial_assets': ['Commercial Assets'],
+    'luxury_assets': ['Luxury Assets'],
+    'bank_assets': ['Bank Assets']
+}
+
+# Loan fields whose thousands separators are stripped after extraction
+NUMERIC_LOAN_FIELDS = ['income_annum', 'loan_amount', 'residential_assets',
+                       'commercial_assets', 'luxury_assets', 'bank_assets']
+
+# spaCy NER fallback (src/ner_fallback.py) for loan fields the regexes
+# miss: entity labels that can hold each field, and keywords of which one
+# must appear between the previous entity (or the start of the line) and
+# the entity; the closest keyword decides the field, and of several
+# entities for one field the one nearest its keyword wins. With 'join',
+# further entities of the field on the same line extend its value
+NER_FALLBACK_FIELDS = {
+    'applicant_name': {'labels': ['PERSON'], 'keywords': ['name', 'applicant', 'undersigned']},
+    'address': {'labels': ['FAC', 'GPE', 'LOC'], 'keywords': ['address', 'residing', 'resident', 'live'],
+                'join': True},
+    'income_annum': {'labels': ['MONEY', 'CARDINAL'], 'keywords': ['income', 'salary', 'earn']},
+    'loan_amount': {'labels': ['MONEY', 'CARDINAL'], 'keywords': ['loan', 'amount', 'borrow']},
+    'residential_assets': {'labels': ['MONEY', 'CARDINAL'], 'keywords': ['residential']},
+    'commercial_assets': {'labels': ['MONEY', 'CARDINAL'], 'keywords': ['commercial']},
+    'luxury_assets': {'labels': ['MONEY', 'CARDINAL'], 'keywords': ['luxury']},
+    'bank_assets': {'labels': ['MONEY', 'CARDINAL'], 'keywords': ['bank', 'savings']},
+}
+# Words that make a bare number right after them an identifier, not an
+# amount ("Loan ID 123", "Bank account 4242"): such CARDINAL entities are skipped
+NER_IDENTIFIER_WORDS = ['id', 'no', 'number', 'account', 'a/c', 'ref', 'reference']
+# Documents per nlp.pipe batch, and worker processes for large runs
+NER_BATCH_SIZE = 32
+NER_PROCESSES = 2
+
 # Field patterns for extraction (regex patterns)
 FIELD_PATTERNS = {
     'loan_id': r'Loan ID[:]?\s*([A-Z0-9]+)',
@@ -22,7 +168,18 @@ FIELD_PATTERNS = {
 # Validation rules
 VALIDATION_RULES = {
     'loan_id': {'min_length': 5, 'max_length': 20, 'pattern': r'^[A-Z0-9]+$'},
+    'applicant_name': {'min_length': 2, 'max_length': 100, 'pattern': r"^[A-Za-z][A-Za-z .'-]*$"},
+    'address': {'min_length': 2, 'max_length': 200},
+    'dob': {'pattern': r'^\d{2}[-/]\d{2}[-/]\d{4}$'},
+    'education': {'allowed_values': ['Graduate', 'Not Graduate', 'Undergraduate']},
+    'self_employed': {'allowed_values': ['Yes', 'No']},
+    'no_of_dependents': {'min_value': 0, 'max_value': 20},
     'income_annum': {'min_value': 10000, 'max_value': 1000000},
     'loan_amount': {'min_value': 1000, 'max_value': 500000},
+    'loan_term': {'min_value': 1, 'max_value': 30},
     'cibil_score': {'min_value': 300, 'max_value': 900},
+    'residential_assets': {'min_value': 0},
+    'commercial_assets': {'min_value': 0},
+    'luxury_assets': {'min_value': 0},
+    'bank_assets': {'min_value': 0},
 }
\ No newline at end of file
@@ -0,0 +1,219 @@
+import heapq
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+# Upper bound on literal prefixes derived from one pattern (alternations multiply)
+MAX_PREFIXES = 32
+
+# Non-ASCII characters that re.IGNORECASE matches against ASCII letters
+# but str.lower() does not map onto them
+_CASEFOLD_SPECIALS = frozenset('\u0130\u0131\u017f\u212a')
+
+# Runs of 2+ characters only: literal-prefixed patterns let re skip ahead fast
+_SPACE_RUNS = re.compile(r'  +')
+_NEWLINE_RUNS = re.compile(r'\n\n+')
+
+def normalize_text(text: str) -> str:
+    """Remove extra spaces and collapse blank lines
+
+    Same result as re.sub(r'[ \t]+', ' ') followed by re.sub(r'\n+', '\n').
+    """
+    if '\t' in text:
+        text = text.replace('\t', ' ')
+    text = _SPACE_RUNS.sub(' ', text)
+    return _NEWLINE_RUNS.sub('\n', text)
+
+def _sequence_prefixes(items) -> List[Tuple[str, bool]]:
+    """(literal prefix, still open) pairs for a parsed regex sequence"""
+    results = [('', True)]
+    for op, av in items:
+        if not any(is_open for _, is_open in results):
+            break
+        extended = []
+        for prefix, is_open in results:
+            if not is_open:
+                extended.append((prefix, False))
+                continue
+            for item_prefix, item_open in _item_prefixes(op, av):
+                extended.append((prefix + item_prefix, item_open))
+        if len(extended) > MAX_PREFIXES:
+            return [('', False)]
+        results = extended
+    return results
+
+def _item_prefixes(op, av) -> List[Tuple[str, bool]]:
+    if op is sre_parse.LITERAL:
+        return [(chr(av), True)]
+    if op is sre_parse.SUBPATTERN:
+        return _sequence_prefixes(av[-1])
+    if op is sre_parse.BRANCH:
+        return [p for branch in av[1] for p in _sequence_prefixes(branch)]
+    if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+        min_count, _, item = av
+        # Only the first repetition is followed; the prefix ends after it
+        inner = [(prefix, False) for prefix, _ in _sequence_prefixes(item)]
+        return inner + [('', True)] if min_count == 0 else inner
+    if op is sre_parse.AT:
+        return [('', True)]
+    return [('', False)]
+
+def literal_prefixes(pattern: str, flags: int = 0) -> Optional[List[str]]:
+    """Literal strings every match of `pattern` must start with
+
+    Returns None when some match could start with a non-literal (or a
+    single character), in which case the pattern cannot be anchored.
+    """
+    try:
+        prefixes = {prefix for prefix, _ in _sequence_prefixes(sre_parse.parse(pattern, flags))}
+    except Exception:
+        return None
+    if not prefixes or min(len(prefix) for prefix in prefixes) < 2:
+        return None
+    return sorted(prefixes)
+
+class FieldExtractor:
+    """
+    Extract labelled fields with precompiled patterns in a single scan
+
+    Each pattern's possible literal label prefixes ("Loan", "CIBIL", ...)
+    are collected into one anchor table when the extractor is built. The
+    text is then walked once, front to back, from anchor hit to anchor hit
+    (a k-way merge of str.find cursors over the case-folded text), and at
+    each hit only the patterns starting with that anchor are tried
+    (`pattern.match` at the hit position). Every field therefore resolves
+    to the same leftmost match `re.search` would find. An anchor stops being
+    searched once all of its fields are resolved, so the walk ends as soon
+    as every field has been found. Patterns without a usable
+    literal prefix fall back to a regular search; texts where case folding
+    is not offset-preserving use a combined anchor regex instead.
+    """
+
+    def __init__(self, patterns: Dict[str, str], flags: int = re.IGNORECASE,
+                 numeric_fields: Iterable[str] = (), normalize: bool = True):
+        self.fields = list(patterns)
+        self.flags = flags
+        self.numeric_fields = [f for f in numeric_fields if f in patterns]
+        self.normalize = normalize
+        self.compiled = {field: re.compile(pattern, flags)
+                         for field, pattern in patterns.items()}
+
+        self.ignorecase = bool(flags & re.IGNORECASE)
+        fold = str.lower if self.ignorecase else (lambda s: s)
+        anchored = {}
+        self.unanchored = []
+        for field, pattern in patterns.items():
+            prefixes = literal_prefixes(pattern, flags)
+            if prefixes is None:
+                self.unanchored.append(field)
+            else:
+                anchored[field] = {fold(prefix) for prefix in prefixes}
+
+        # Drop anchors that extend a shorter anchor: the shorter one already
+        # hits at the same position, so no two anchors start at one offset
+        all_anchors = sorted({a for prefixes in anchored.values() for a in prefixes}, key=len)
+        anchors = []
+        for anchor in all_anchors:
+            if not any(anchor.startswith(shorter) for shorter in anchors):
+                anchors.append(anchor)
+
+        self.anchors = anchors
+        self.fields_by_anchor = [[] for _ in anchors]
+        for field in self.fields:
+            if field not in anchored:
+                continue
+            for i, anchor in enumerate(anchors):
+                if any(prefix.startswith(anchor) for prefix in anchored[field]):
+                    self.fields_by_anchor[i].append(field)
+
+        self.ascii_anchors = all(anchor.isascii() for anchor in anchors)
+        self.anchor_regex = None
+        if anchors:
+            alternation = '|'.join(f'({re.escape(anchor)})' for anchor in anchors)
+            # Anchors that can overlap need a zero-width scan to see every hit
+            if self._anchors_overlap(anchors):
+                alternation = f'(?=(?:{alternation}))'
+            self.anchor_regex = re.compile(alternation, flags)
+
+    @staticmethod
+    def _anchors_overlap(anchors: List[str]) -> bool:
+        for a in anchors:
+            for b in anchors:
+                for size in range(1, min(len(a), len(b))):
+                    if a[-size:] == b[:size]:
+                        return True
+        return False
+
+    def _anchor_hits(self, text: str, retired: set):
+        """(position, anchor index) for every anchor occurrence, in text order
+
+        Anchors whose index is added to `retired` while iterating are not
+        searched any further.
+        """
+        if self.ignorecase:
+            haystack = text.lower()
+            usable = (self.ascii_anchors and len(haystack) == len(text)
+                      and _CASEFOLD_SPECIALS.isdisjoint(text))
+        else:
+            haystack, usable = text, True
+
+        if not usable:
+            for hit in self.anchor_regex.finditer(text):
+                if hit.lastindex - 1 not in retired:
+                    yield hit.start(), hit.lastindex - 1
+            return
+
+        cursors = []
+        for i, anchor in enumerate(self.anchors):
+            pos = haystack.find(anchor)
+            if pos >= 0:
+                cursors.append((pos, i))
+        heapq.heapify(cursors)
+        while cursors:
+            pos, i = cursors[0]
+            yield pos, i
+            pos = -1 if i in retired else haystack.find(self.anchors[i], pos + 1)
+            if pos >= 0:
+                heapq.heapreplace(cursors, (pos, i))
+            else:
+                heapq.heappop(cursors)
+
+    def extract(self, text: str) -> Dict[str, str]:
+        if self.normalize:
+            text = normalize_text(text)
+
+        found = {}
+        if self.anchors:
+            retired = set()
+            for pos, anchor in self._anchor_hits(text, retired):
+                pending = False
+                for field in self.fields_by_anchor[anchor]:
+                    if field in found:
+                        continue
+                    match = self.compiled[field].match(text, pos)
+                    if match:
+                        found[field] = match.group(1).strip()
+                    else:
+                        pending = True
+                if not pending:
+                    retired.add(anchor)
+                    if len(retired) == len(self.anchors):
+                        break
+
+        for field in self.unanchored:
+            match = self.compiled[field].search(text)
+            if match:
+                found[field] = match.group(1).strip()
+
+        extracted = {field: found[field] for field in self.fields if field in found}
+
+        # Clean numeric fields (remove commas)
+        for field in self.numeric_fields:
+            if field in extracted:
+                extracted[field] = extracted[field].replace(',', '')
+
+        return extracted
@@ -0,0 +1,271 @@
+import hashlib
+import json
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from . import ocr_engine, tracing
+from .config import (TESSERACT_CONFIG, LOAN_FIELD_PATTERNS, LOAN_FIELD_LABELS,
+                     NUMERIC_LOAN_FIELDS)
+
+_EDGE_PUNCTUATION = ':;-–—.,|'
+
+def _normalize_word(word: str) -> str:
+    return word.strip(_EDGE_PUNCTUATION).lower()
+
+def line_config(config: str = TESSERACT_CONFIG) -> str:
+    """Tesseract config for a single text line (value regions)"""
+    if re.search(r'--psm\s+\d+', config):
+        return re.sub(r'--psm\s+\d+', '--psm 7', config)
+    return f"{config} --psm 7"
+
+class WordBoxes:
+    """
+    Words from one Tesseract image_to_data pass, stored column-wise
+
+    Geometry and confidence live in parallel numpy arrays; `line` is a
+    single int64 id combining Tesseract's block/paragraph/line numbers.
+    """
+
+    def __init__(self, text: List[str], left, top, width, height, conf, line):
+        self.text = text
+        self.left = np.asarray(left, dtype=np.int32)
+        self.top = np.asarray(top, dtype=np.int32)
+        self.width = np.asarray(width, dtype=np.int32)
+        self.height = np.asarray(height, dtype=np.int32)
+        self.conf = np.asarray(conf, dtype=np.float32)
+        self.line = np.asarray(line, dtype=np.int64)
+
+    @classmethod
+    def from_tesseract(cls, data: Dict) -> 'WordBoxes':
+        """Build from pytesseract.image_to_data(..., output_type=Output.DICT)"""
+        keep = [i for i, word in enumerate(data['text'])
+                if word and word.strip() and float(data['conf'][i]) >= 0]
+        take = lambda key: [data[key][i] for i in keep]
+        line = [int(b) * 1_000_000 + int(p) * 1_000 + int(l)
+                for b, p, l in zip(take('block_num'), take('par_num'), take('line_num'))]
+        return cls([data['text'][i].strip() for i in keep], take('left'), take('top'),
+                   take('width'), take('height'), [float(c) for c in take('conf')], line)
+
+    def __len__(self):
+        return len(self.text)
+
+    @property
+    def right(self) -> np.ndarray:
+        return self.left + self.width
+
+    @property
+    def bottom(self) -> np.ndarray:
+        return self.top + self.height
+
+    def lines(self) -> List[np.ndarray]:
+        """Word indices per line, lines top to bottom, words left to right"""
+        if not len(self):
+            return []
+        order = np.lexsort((self.left, self.line))
+        ids = self.line[order]
+        groups = np.split(order, np.flatnonzero(np.diff(ids)) + 1)
+        return sorted(groups, key=lambda idx: int(self.top[idx].min()))
+
+    def to_text(self) -> str:
+        return "\n".join(" ".join(self.text[i] for i in idx) for idx in self.lines())
+
+    def bbox(self, indices) -> Tuple[int, int, int, int]:
+        indices = np.asarray(indices)
+        return (int(self.left[indices].min()), int(self.top[indices].min()),
+                int(self.right[indices].max()), int(self.bottom[indices].max()))
+
+    def subset(self, indices) -> 'WordBoxes':
+        indices = np.asarray(indices, dtype=np.int64)
+        return WordBoxes([self.text[i] for i in indices], self.left[indices], self.top[indices],
+                         self.width[indices], self.height[indices], self.conf[indices],
+                         self.line[indices])
+
+    def shifted(self, dx: int, dy: int, line: int) -> 'WordBoxes':
+        """Words of a crop at (dx, dy) in page coordinates, all on line id `line`"""
+        return WordBoxes(list(self.text), self.left + dx, self.top + dy, self.width,
+                         self.height, self.conf, np.full(len(self), line, dtype=np.int64))
+
+    @classmethod
+    def concat(cls, parts: List['WordBoxes']) -> 'WordBoxes':
+        return cls([word for part in parts for word in part.text],
+                   *(np.concatenate([getattr(part, key) for part in parts])
+                     for key in ('left', 'top', 'width', 'height', 'conf', 'line')))
+
+def ocr_words(image: np.ndarray, config: str = TESSERACT_CONFIG) -> WordBoxes:
+    """Run Tesseract once and keep every word with its box and confidence"""
+    with tracing.span('ocr', output='words') as span:
+        span.add('pages')
+        data = ocr_engine.get_engine().image_to_data(image, config)
+    return WordBoxes.from_tesseract(data)
+
+class LayoutExtractor:
+    """
+    Match field labels to values by geometry instead of flattened text
+
+    A label is a word sequence on one line (e.g. "Date of Birth"); its
+    value is the words to the right of it on the same line, up to the next
+    label on that line. That keeps side-by-side fields such as "Address"
+    and "Date of Birth" apart even when OCR reads them as one line. Values
+    are checked with the same regex patterns as text extraction.
+    """
+
+    def __init__(self, labels: Dict[str, Iterable[str]] = LOAN_FIELD_LABELS,
+                 patterns: Dict[str, str] = LOAN_FIELD_PATTERNS,
+                 numeric_fields: Iterable[str] = NUMERIC_LOAN_FIELDS):
+        self.fields = [field for field in patterns if field in labels]
+        self.patterns = {field: re.compile(patterns[field], re.IGNORECASE)
+                         for field in self.fields}
+        self.numeric_fields = set(numeric_fields)
+        # Longest labels first, so "Number of Dependents" wins over "Dependents"
+        self.labels = sorted(
+            ((field, label, [_normalize_word(w) for w in label.split()])
+             for field in self.fields for label in labels[field]),
+            key=lambda item: -len(item[2]))
+
+    def _find_labels(self, words: List[str]) -> List[Tuple[int, int, str, str]]:
+        """(start, end, field, label) occurrences on one line, left to right"""
+        claimed = [False] * len(words)
+        found = []
+        for field, label, tokens in self.labels:
+            size = len(tokens)
+            for start in range(len(words) - size + 1):
+                if words[start:start + size] == tokens and not any(claimed[start:start + size]):
+                    found.append((start, start + size, field, label))
+                    claimed[start:start + size] = [True] * size
+        return sorted(found)
+
+    def match_value(self, field: str, label: str, value: str) -> Optional[str]:
+        """Validate/clean a raw value with the field's text pattern"""
+        match = self.patterns[field].search(f"{label}: {value}")
+        if not match:
+            return None
+        value = match.group(1).strip()
+        if field in self.numeric_fields:
+            value = value.replace(',', '')
+        return value
+
+    def locate(self, boxes: WordBoxes) -> Dict[str, Dict]:
+        """
+        Field -> {'value', 'confidence', 'label_bbox', 'value_bbox', 'next_label_x'},
+        first hit in reading order; 'next_label_x' is the left edge of the
+        next label on the value's line, None if no label follows it
+        """
+        located = {}
+        for idx in boxes.lines():
+            words = [_normalize_word(boxes.text[i]) for i in idx]
+            occurrences = self._find_labels(words)
+            for n, (start, end, field, label) in enumerate(occurrences):
+                if field in located:
+                    continue
+                stop = occurrences[n + 1][0] if n + 1 < len(occurrences) else len(idx)
+                next_label_x = int(boxes.left[idx[stop]]) if stop < len(idx) else None
+                value_idx = [idx[k] for k in range(end, stop) if words[k]]
+                if not value_idx:
+                    continue
+                value = self.match_value(field, label, " ".join(boxes.text[i] for i in value_idx))
+                if value is None:
+                    continue
+                located[field] = {
+                    'value': value,
+                    'confidence': float(boxes.conf[value_idx].mean()),
+                    'label_bbox': boxes.bbox(idx[start:end]),
+                    'value_bbox': boxes.bbox(value_idx),
+                    'next_label_x': next_label_x,
+                }
+        return located
+
+    def label_lines(self, boxes: WordBoxes, fields: Iterable[str]) -> List[int]:
+        """Line ids of the lines that hold a label of one of `fields`"""
+        fields = set(fields)
+        found = []
+        for idx in boxes.lines():
+            words = [_normalize_word(boxes.text[i]) for i in idx]
+            if any(field in fields for _, _, field, _ in self._find_labels(words)):
+                found.append(int(boxes.line[idx[0]]))
+        return found
+
+    def extract(self, boxes: WordBoxes) -> Dict[str, str]:
+        located = self.locate(boxes)
+        return {field: located[field]['value'] for field in self.fields if field in located}
+
+class FormTemplate:
+    """
+    Known form layout: where each field's value sits on which page
+
+    Regions are (page, x0, y0, x1, y1) with coordinates relative to the
+    page size (0..1), so they hold across scan resolutions.
+    """
+
+    def __init__(self, name: str, regions: Dict[str, Tuple[int, float, float, float, float]],
+                 labels: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.regions = {field: tuple(region) for field, region in regions.items()}
+        # Label text per field, used to validate OCRed values with the field pattern
+        self.labels = labels or {}
+
+    @property
+    def pages(self) -> List[int]:
+        return sorted({region[0] for region in self.regions.values()})
+
+    @classmethod
+    def from_located(cls, name: str, located: Dict[str, Dict], image_shape: Tuple[int, int],
+                     page: int = 0, padding: float = 0.01) -> 'FormTemplate':
+        """Learn a template from LayoutExtractor.locate() output for one page"""
+        height, width = image_shape[:2]
+        regions = {}
+        for field, info in located.items():
+            x0, y0, x1, y1 = info['value_bbox']
+            # Values vary in length: extend the region up to the next label on
+            # the line, or to the right page margin when none follows
+            next_label_x = info.get('next_label_x')
+            right = max(x1, next_label_x) / width if next_label_x is not None else 1.0
+            regions[field] = (page, max(0.0, x0 / width - padding), max(0.0, y0 / height - padding),
+                              min(1.0, right), min(1.0, y1 / height + padding))
+        return cls(name, regions)
+
+    def fingerprint(self) -> str:
+        """Name plus a short hash of the regions, for cache keys"""
+        raw = json.dumps(self.to_dict(), sort_keys=True).encode('utf-8')
+        return f"{self.name}:{hashlib.sha1(raw).hexdigest()[:12]}"
+
+    def to_dict(self) -> Dict:
+        return {'name': self.name, 'regions': self.regions, 'labels': self.labels}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'FormTemplate':
+        return cls(data['name'], data['regions'], data.get('labels'))
+
+    def save(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> 'FormTemplate':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+def extract_with_template(image: np.ndarray, template: FormTemplate, page: int = 0,
+                          extractor: Optional[LayoutExtractor] = None,
+                          config: str = TESSERACT_CONFIG) -> Dict[str, str]:
+    """OCR only the template's value regions on this page (one line each)"""
+    extractor = extractor or LayoutExtractor()
+    height, width = image.shape[:2]
+    single_line = line_config(config)
+    extracted = {}
+    for field, (region_page, x0, y0, x1, y1) in template.regions.items():
+        if region_page != page or field not in extractor.patterns:
+            continue
+        crop = image[int(y0 * height):int(np.ceil(y1 * height)),
+                     int(x0 * width):int(np.ceil(x1 * width))]
+        if crop.size == 0:
+            continue
+        with tracing.span('ocr_region', field=field) as span:
+            span.add('regions')
+            text = ocr_engine.get_engine().image_to_string(crop, single_line).strip()
+        label = template.labels.get(field, LOAN_FIELD_LABELS.get(field, [field])[0])
+        value = extractor.match_value(field, label, text)
+        if value is not None:
+            extracted[field] = value
+    return extracted
@@ -0,0 +1,203 @@
+"""
+spaCy NER fallback for loan fields the regexes miss
+
+Only documents whose regex fields lack one of NER_FALLBACK_FIELDS are
+parsed. They go through nlp.pipe in batches of NER_BATCH_SIZE with every
+component except the entity recognizer disabled, across NER_PROCESSES
+worker processes when there is more than one batch. An entity becomes the
+field whose keyword appears closest before it on its line ("... earning
+₹8,00,000 a year" -> income_annum); when several entities map to one
+field, the one nearest its keyword wins, and bare numbers that follow an
+identifier word ("Loan ID 123") are skipped. Regex values always win; NER
+only fills gaps. Time and volume are kept in `stats`, apart from OCR.
+"""
+import math
+import re
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .config import (NER_FALLBACK_FIELDS, NER_IDENTIFIER_WORDS, NER_BATCH_SIZE, NER_PROCESSES,
+                     NUMERIC_LOAN_FIELDS)
+from . import resources, tracing
+
+# Same resource as ocr_processing.NLP: one pipeline per process
+NLP = resources.register(
+    'spacy:en_core_web_sm',
+    lambda: resources.timed_import('spacy').load("en_core_web_sm"))
+
+# Pipeline components entity recognition needs; the rest are disabled
+NER_PIPES = ('tok2vec', 'ner')
+
+# Indian and English amount words after a number ("5 lakh", "1.2 crore")
+_SCALES = {'lakh': 100000, 'lakhs': 100000, 'lac': 100000, 'lacs': 100000,
+           'crore': 10000000, 'crores': 10000000, 'cr': 10000000,
+           'million': 1000000, 'thousand': 1000}
+_AMOUNT = re.compile(r'(\d[\d,]*)(\.\d+)?(?:\s*(' + '|'.join(_SCALES) + r')\b)?', re.IGNORECASE)
+
+def _number(text: str) -> Optional[str]:
+    """
+    Whole-rupee digits of the first number in an amount entity, None if it
+    has none ("Rs. 50,000" -> "50000", "₹5,00,000" -> "500000", "5 lakh" -> "500000")
+    """
+    match = _AMOUNT.search(text)
+    if match is None:
+        return None
+    whole, fraction, scale = match.groups()
+    whole = whole.replace(',', '')
+    if scale is None:
+        return whole
+    return str(round(float(whole + (fraction or '')) * _SCALES[scale.lower()]))
+
+_LAST_WORD = re.compile(r'([\w/]+)\W*$')
+
+class NerFallback:
+    """
+    Fill missing loan fields from named entities, many documents at a time
+
+    `stats` accumulates documents seen and parsed, nlp.pipe batches,
+    characters, seconds spent in NER and fields filled per field name.
+    """
+
+    def __init__(self, fields: Dict[str, Dict] = NER_FALLBACK_FIELDS,
+                 batch_size: int = NER_BATCH_SIZE, n_process: int = NER_PROCESSES,
+                 numeric_fields: Iterable[str] = NUMERIC_LOAN_FIELDS,
+                 identifier_words: Iterable[str] = NER_IDENTIFIER_WORDS, nlp=None):
+        self.fields = {
+            field: {
+                'labels': set(spec['labels']),
+                'keywords': re.compile(r'\b(?:' + '|'.join(map(re.escape, spec['keywords'])) + r')',
+                                       re.IGNORECASE),
+                'join': spec.get('join', False),
+            }
+            for field, spec in fields.items()
+        }
+        self.batch_size = max(1, batch_size)
+        self.n_process = max(1, n_process)
+        self.numeric_fields = set(numeric_fields)
+        self.identifier_words = {word.lower() for word in identifier_words}
+        self._nlp = nlp
+        self.unavailable = None
+        self.stats = {'documents': 0, 'documents_ner': 0, 'batches': 0, 'chars': 0,
+                      'seconds': 0.0, 'fields_filled': {}}
+
+    @property
+    def nlp(self):
+        return self._nlp if self._nlp is not None else NLP.get()
+
+    def missing(self, fields: Dict[str, str]) -> List[str]:
+        """Fields NER could fill that the regexes did not find"""
+        return [field for field in self.fields if not fields.get(field)]
+
+    def _closest_field(self, label: str, context: str) -> Tuple[Optional[str], int]:
+        """
+        Field whose keyword occurs last in `context` and accepts this entity
+        label, with the number of characters between that keyword and the entity
+        """
+        best, best_position, distance = None, -1, 0
+        for field, spec in self.fields.items():
+            if label not in spec['labels']:
+                continue
+            for match in spec['keywords'].finditer(context):
+                if match.start() > best_position:
+                    best, best_position = field, match.start()
+                    distance = len(context) - match.end()
+        return best, distance
+
+    def _is_identifier(self, label: str, context: str) -> bool:
+        """A bare number right after an identifier word ("Loan ID 123")"""
+        if label != 'CARDINAL':
+            return False
+        match = _LAST_WORD.search(context)
+        return match is not None and match.group(1).lower() in self.identifier_words
+
+    def entity_fields(self, doc, wanted: Iterable[str]) -> Dict[str, str]:
+        """Values of the `wanted` fields found among one parsed document's entities"""
+        wanted = set(wanted)
+        text = doc.text
+        spans = {}
+        previous_end, last = 0, None
+        for ent in doc.ents:
+            line_start = text.rfind('\n', 0, ent.start_char) + 1
+            context = text[max(line_start, previous_end):ent.start_char]
+            previous_end = ent.end_char
+            if self._is_identifier(ent.label_, context):
+                last = None
+                continue
+            field, distance = self._closest_field(ent.label_, context)
+            if field is None and last is not None:
+                # No keyword since the previous entity: a 'join' field continues
+                last_field, last_line = last
+                spec = self.fields[last_field]
+                if spec['join'] and last_line == line_start and ent.label_ in spec['labels']:
+                    spans[last_field][1] = ent.end_char
+                    continue
+            last = None
+            if field is None or field not in wanted:
+                continue
+            # Of several entities for one field, keep the one nearest its keyword
+            if field in spans and spans[field][2] <= distance:
+                continue
+            if field in self.numeric_fields and _number(ent.text) is None:
+                continue
+            spans[field] = [ent.start_char, ent.end_char, distance]
+            last = (field, line_start)
+
+        found = {}
+        for field, (start, end, _) in spans.items():
+            value = text[start:end].strip()
+            found[field] = _number(value) if field in self.numeric_fields else value
+        return found
+
+    def _pipeline(self):
+        """The spaCy pipeline, or None (once warned) if it cannot be loaded"""
+        if self.unavailable is not None:
+            return None
+        try:
+            return self.nlp
+        except (ImportError, OSError) as e:
+            self.unavailable = f"{type(e).__name__}: {e}"
+            print(f"NER fallback disabled: {self.unavailable}", flush=True)
+            return None
+
+    def fill(self, texts: Sequence[str], records: Sequence[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Copies of `records` (fields per document) with gaps filled from each document's text"""
+        merged = [dict(fields) for fields in records]
+        self.stats['documents'] += len(merged)
+        todo = [i for i, fields in enumerate(merged) if texts[i] and self.missing(fields)]
+        nlp = self._pipeline() if todo else None
+        if nlp is None:
+            return merged
+
+        batches = math.ceil(len(todo) / self.batch_size)
+        chars = sum(len(texts[i]) for i in todo)
+        disable = [name for name in nlp.pipe_names if name not in NER_PIPES]
+        start = time.perf_counter()
+        with tracing.span('ner') as span:
+            span.add('documents', len(todo))
+            span.add('chars', chars)
+            docs = nlp.pipe((texts[i][:nlp.max_length] for i in todo), batch_size=self.batch_size,
+                            n_process=min(self.n_process, batches), disable=disable)
+            for i, doc in zip(todo, docs):
+                found = self.entity_fields(doc, self.missing(merged[i]))
+                for field in found:
+                    self.stats['fields_filled'][field] = self.stats['fields_filled'].get(field, 0) + 1
+                merged[i].update(found)
+        self.stats['documents_ner'] += len(todo)
+        self.stats['batches'] += batches
+        self.stats['chars'] += chars
+        self.stats['seconds'] += time.perf_counter() - start
+        return merged
+
+    def summary(self) -> Dict:
+        """`stats` plus NER throughput (documents/s) and mean latency per parsed document"""
+        seconds = self.stats['seconds']
+        parsed = self.stats['documents_ner']
+        return dict(self.stats,
+                    docs_per_second=round(parsed / seconds, 1) if seconds else None,
+                    ms_per_document=round(seconds / parsed * 1000, 2) if parsed else None)
+
+DEFAULT_FALLBACK = NerFallback()
+
+def fill_missing_fields(texts: Sequence[str], records: Sequence[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Fill regex gaps of many documents at once with the shared NerFallback"""
+    return DEFAULT_FALLBACK.fill(texts, records)
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+from . import config, ocr_engine
+from .preprocessing import PIPELINE_PRESETS
+
+def config_fingerprint(dpi: int = config.PDF_DPI, variant: str = 'text') -> Dict:
+    """Settings that change OCR/extraction output for the same document
+
+    `variant` names the extraction mode (e.g. 'text', 'layout', a template).
+    """
+    return dict(_ocr_settings(), dpi=dpi, variant=variant)
+
+def _ocr_settings() -> Dict:
+    """Process-wide settings that change OCR output: engine, preprocessing, Tesseract"""
+    return {
+        'tesseract_config': config.TESSERACT_CONFIG,
+        'pipeline_version': config.PIPELINE_VERSION,
+        'ocr_engine': ocr_engine.engine_kind(),
+        'preprocess_stages': {name: list(preset['stages'])
+                              for name, preset in sorted(PIPELINE_PRESETS.items())},
+        'preprocess_target_width': config.PREPROCESS_TARGET_WIDTH,
+    }
+
+def config_generation() -> str:
+    """Short hash of the settings that invalidate every cached entry"""
+    raw = json.dumps(_ocr_settings(), sort_keys=True)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:12]
+
+def make_cache_key(data: bytes, fingerprint: Dict) -> str:
+    """Content address: hash of the document bytes plus the config fingerprint"""
+    digest = hashlib.sha256(data)
+    digest.update(json.dumps(fingerprint, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+class ResultCache:
+    """
+    Two-level cache of OCR results keyed by document content and config
+
+    Entries ({'text', 'fields', 'config'}) are kept in an in-memory LRU and
+    as JSON files under `cache_dir`. The disk level is trimmed to `max_bytes`
+    by least-recent use. File names carry the config generation, so entries
+    written under a different OCR engine, preprocessing, Tesseract config
+    or pipeline version are dropped when the cache is opened or the config
+    changes.
+    """
+
+    def __init__(self, cache_dir: str = config.CACHE_DIR,
+                 max_entries: int = config.CACHE_MAX_ENTRIES,
+                 max_bytes: int = config.CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'memory_hits': 0, 'disk_hits': 0,
+                      'misses': 0, 'stores': 0, 'evictions': 0, 'invalidated': 0}
+        self._generation = None
+        os.makedirs(cache_dir, exist_ok=True)
+        self._purge_stale()
+
+    def key_for_file(self, file_path: str, dpi: int = config.PDF_DPI,
+                     variant: str = 'text') -> str:
+        with open(file_path, 'rb') as f:
+            return make_cache_key(f.read(), config_fingerprint(dpi, variant))
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.stats['hits'] += 1
+                self.stats['memory_hits'] += 1
+                return entry
+
+            path = self._path(key)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+                os.utime(path)
+            except (OSError, ValueError):
+                self.stats['misses'] += 1
+                return None
+
+            self._remember(key, entry)
+            self.stats['hits'] += 1
+            self.stats['disk_hits'] += 1
+            return entry
+
+    def put(self, key: str, text: str, fields: Dict, dpi: int = config.PDF_DPI,
+            variant: str = 'text') -> Dict:
+        entry = {'text': text, 'fields': fields, 'config': config_fingerprint(dpi, variant)}
+        with self._lock:
+            if config_generation() != self._generation:
+                self._purge_stale()
+            self._remember(key, entry)
+            path = self._path(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            self.stats['stores'] += 1
+            self._trim_disk()
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            for path, _, _ in self._disk_entries():
+                os.remove(path)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{config_generation()}-{key}.json")
+
+    @staticmethod
+    def _key_from_path(path: str) -> str:
+        return os.path.basename(path)[:-len('.json')].split('-', 1)[-1]
+
+    def _remember(self, key: str, entry: Dict):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def _disk_entries(self):
+        entries = []
+        for item in os.scandir(self.cache_dir):
+            if item.name.endswith('.json'):
+                stat = item.stat()
+                entries.append((item.path, stat.st_mtime, stat.st_size))
+        return entries
+
+    def _trim_disk(self):
+        entries = sorted(self._disk_entries(), key=lambda e: e[1])
+        total = sum(size for _, _, size in entries)
+        for path, _, size in entries:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            self._memory.pop(self._key_from_path(path), None)
+            total -= size
+            self.stats['evictions'] += 1
+
+    def _purge_stale(self):
+        self._generation = config_generation()
+        for path, _, _ in self._disk_entries():
+            if not os.path.basename(path).startswith(f"{self._generation}-"):
+                os.remove(path)
+                self._memory.pop(self._key_from_path(path), None)
+                self.stats['invalidated'] += 1
+
+_default_cache = None
+
+def get_default_cache() -> ResultCache:
+    """Process-wide cache under PROCESSED_DIR"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResultCache()
+    return _default_cache
@@ -0,0 +1,367 @@
+import multiprocessing
+import queue
+import shlex
+import subprocess
+import threading
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from . import config
+
+try:
+    import tesserocr
+except ImportError:  # optional: keeps traineddata loaded between calls
+    tesserocr = None
+
+TSV_INT_COLUMNS = ('level', 'page_num', 'block_num', 'par_num', 'line_num',
+                   'word_num', 'left', 'top', 'width', 'height')
+
+def parse_tesseract_config(tess_config: str) -> Dict:
+    """Split a Tesseract command-line config into engine settings"""
+    parsed = {'oem': None, 'psm': None, 'lang': None, 'variables': {}}
+    args = shlex.split(tess_config)
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        value = args[i + 1] if i + 1 < len(args) else None
+        if arg == '--oem':
+            parsed['oem'] = int(value)
+        elif arg == '--psm':
+            parsed['psm'] = int(value)
+        elif arg == '-l':
+            parsed['lang'] = value
+        elif arg == '--dpi':
+            parsed['variables']['user_defined_dpi'] = value
+        elif arg == '-c':
+            name, _, var_value = value.partition('=')
+            parsed['variables'][name] = var_value
+        else:
+            i += 1
+            continue
+        i += 2
+    return parsed
+
+def parse_tsv(tsv: str) -> Dict[str, List]:
+    """Tesseract TSV output -> the dict layout of pytesseract's Output.DICT"""
+    lines = tsv.rstrip('\n').split('\n')
+    columns = lines[0].split('\t')
+    data = {column: [] for column in columns}
+    for line in lines[1:]:
+        values = line.split('\t')
+        if len(values) < len(columns):
+            values += [''] * (len(columns) - len(values))
+        for column, value in zip(columns, values):
+            if column in TSV_INT_COLUMNS:
+                value = int(value)
+            elif column == 'conf':
+                value = float(value)
+            data[column].append(value)
+    return data
+
+def _encode_pnm(image: np.ndarray) -> bytes:
+    """Uncompressed in-memory image for Tesseract's stdin (arrays are RGB, like pytesseract)"""
+    if image.ndim == 3 and image.shape[2] == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+    elif image.ndim == 3 and image.shape[2] == 4:
+        image = cv2.cvtColor(image, cv2.COLOR_RGBA2BGR)
+    ok, encoded = cv2.imencode('.pnm', image)
+    if not ok:
+        raise ValueError("Could not encode image for Tesseract")
+    return encoded.tobytes()
+
+class PytesseractEngine:
+    """pytesseract calls: a temp file and a fresh tesseract process per image"""
+
+    name = 'pytesseract'
+
+    def image_to_string(self, image: np.ndarray, tess_config: Optional[str] = None) -> str:
+        import pytesseract
+        return pytesseract.image_to_string(image, config=tess_config or config.TESSERACT_CONFIG)
+
+    def image_to_data(self, image: np.ndarray, tess_config: Optional[str] = None) -> Dict:
+        import pytesseract
+        return pytesseract.image_to_data(image, config=tess_config or config.TESSERACT_CONFIG,
+                                         output_type=pytesseract.Output.DICT)
+
+class CliEngine:
+    """tesseract CLI fed through stdin/stdout: no temp files, one process per image"""
+
+    name = 'cli'
+
+    def __init__(self, cmd: str = 'tesseract', timeout: Optional[float] = None):
+        self.cmd = cmd
+        self.timeout = timeout
+
+    def _run(self, image: np.ndarray, tess_config: Optional[str], extra: List[str]) -> str:
+        args = [self.cmd, 'stdin', 'stdout'] + shlex.split(tess_config or config.TESSERACT_CONFIG) + extra
+        proc = subprocess.run(args, input=_encode_pnm(image), capture_output=True,
+                              timeout=self.timeout)
+        if proc.returncode != 0:
+            raise RuntimeError(f"tesseract failed: {proc.stderr.decode('utf-8', 'replace').strip()}")
+        return proc.stdout.decode('utf-8')
+
+    def image_to_string(self, image: np.ndarray, tess_config: Optional[str] = None) -> str:
+        return self._run(image, tess_config, [])
+
+    def image_to_data(self, image: np.ndarray, tess_config: Optional[str] = None) -> Dict:
+        return parse_tsv(self._run(image, tess_config, ['tsv']))
+
+class ApiEngine:
+    """In-process Tesseract (tesserocr): traineddata is loaded once and reused"""
+
+    name = 'api'
+
+    def __init__(self, tess_config: Optional[str] = None):
+        if tesserocr is None:
+            raise ImportError("tesserocr is not installed")
+        self.default_config = tess_config or config.TESSERACT_CONFIG
+        settings = parse_tesseract_config(self.default_config)
+        kwargs = {'lang': settings['lang'] or 'eng'}
+        if settings['oem'] is not None:
+            kwargs['oem'] = tesserocr.OEM(settings['oem'])
+        self.api = tesserocr.PyTessBaseAPI(**kwargs)
+        self.default_psm = settings['psm'] if settings['psm'] is not None else 3
+        self.default_variables = settings['variables']
+        for name, value in self.default_variables.items():
+            self.api.SetVariable(name, value)
+
+    def _set_image(self, image: np.ndarray, tess_config: Optional[str]):
+        from PIL import Image
+        settings = parse_tesseract_config(tess_config or self.default_config)
+        psm = settings['psm'] if settings['psm'] is not None else self.default_psm
+        self.api.SetPageSegMode(tesserocr.PSM(psm))
+        for name, value in settings['variables'].items():
+            self.api.SetVariable(name, value)
+        self.api.SetImage(Image.fromarray(image))
+
+    def image_to_string(self, image: np.ndarray, tess_config: Optional[str] = None) -> str:
+        self._set_image(image, tess_config)
+        return self.api.GetUTF8Text()
+
+    def image_to_data(self, image: np.ndarray, tess_config: Optional[str] = None) -> Dict:
+        self._set_image(image, tess_config)
+        self.api.Recognize()
+        header = "\t".join(['level', 'page_num', 'block_num', 'par_num', 'line_num', 'word_num',
+                            'left', 'top', 'width', 'height', 'conf', 'text'])
+        return parse_tsv(header + "\n" + self.api.GetTSVText(0))
+
+def create_local_engine(tess_config: Optional[str] = None):
+    """Best single-process engine available: tesserocr, else the stdin CLI"""
+    if tesserocr is not None:
+        return ApiEngine(tess_config)
+    return CliEngine(timeout=config.OCR_TIMEOUT)
+
+def _worker_main(conn, tess_config: str):
+    """Pool worker: build one engine up front, then serve requests until closed"""
+    try:
+        engine = create_local_engine(tess_config)
+    except Exception as e:
+        conn.send(('error', f"engine init failed: {e}"))
+        return
+    conn.send(('ready', engine.name))
+    while True:
+        try:
+            op, image, call_config = conn.recv()
+        except EOFError:
+            return
+        try:
+            if op == 'ping':
+                result = 'pong'
+            elif op == 'string':
+                result = engine.image_to_string(image, call_config)
+            else:
+                result = engine.image_to_data(image, call_config)
+            conn.send(('ok', result))
+        except Exception as e:
+            conn.send(('error', f"{type(e).__name__}: {e}"))
+
+class _Worker:
+    def __init__(self, ctx, tess_config: str, start_timeout: float):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, tess_config), daemon=True)
+        self.process.start()
+        child_conn.close()
+        if not self.conn.poll(start_timeout):
+            self.kill()
+            raise TimeoutError("OCR worker did not start")
+        status, detail = self.conn.recv()
+        if status != 'ready':
+            self.kill()
+            raise RuntimeError(detail)
+        self.engine_name = detail
+
+    def call(self, op: str, image, tess_config: Optional[str], timeout: float):
+        self.conn.send((op, image, tess_config))
+        if not self.conn.poll(timeout):
+            raise TimeoutError(f"OCR worker did not answer within {timeout}s")
+        status, result = self.conn.recv()
+        if status != 'ok':
+            raise RuntimeError(result)
+        return result
+
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(1)
+        self.conn.close()
+
+class EnginePool:
+    """
+    Long-lived OCR worker processes kept warm across documents
+
+    Each worker builds its engine once (tesserocr keeps the traineddata
+    loaded; without it the worker drives the stdin CLI) and receives
+    images as in-memory arrays over a pipe. Callers check out an idle
+    worker, so the pool is safe to use from many threads. A worker that
+    dies or exceeds `timeout` on a call is killed and replaced.
+    All settings come from TESSERACT_CONFIG unless a call overrides them.
+    """
+
+    name = 'pool'
+
+    def __init__(self, size: int = config.OCR_POOL_SIZE, timeout: float = config.OCR_TIMEOUT,
+                 tess_config: Optional[str] = None, start_timeout: float = 60.0):
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.tess_config = tess_config or config.TESSERACT_CONFIG
+        self.start_timeout = start_timeout
+        self.stats = {'calls': 0, 'restarts': 0, 'timeouts': 0}
+        self._ctx = multiprocessing.get_context()
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._refill_lock = threading.Lock()
+        self._workers = []
+        self._closed = False
+        for _ in range(self.size):
+            self._add_worker()
+
+    def _add_worker(self):
+        worker = _Worker(self._ctx, self.tess_config, self.start_timeout)
+        with self._lock:
+            self._workers.append(worker)
+        self._idle.put(worker)
+
+    def _replace(self, worker: _Worker):
+        worker.kill()
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+        self.stats['restarts'] += 1
+        self._refill()
+
+    def _refill(self, attempts: int = 3):
+        """Start workers until the pool is back at `size`; raise if one cannot be started"""
+        with self._refill_lock:
+            while not self._closed:
+                with self._lock:
+                    if len(self._workers) >= self.size:
+                        return
+                for attempt in range(attempts):
+                    try:
+                        self._add_worker()
+                        break
+                    except (TimeoutError, RuntimeError, OSError):
+                        if attempt == attempts - 1:
+                            raise
+
+    def _call(self, op: str, image, tess_config: Optional[str], timeout: Optional[float] = None):
+        if self._closed:
+            raise RuntimeError("EnginePool is closed")
+        # A failed restart left the pool short: try again before waiting on it
+        self._refill()
+        worker = self._idle.get()
+        if not worker.alive():
+            self._replace(worker)
+            worker = self._idle.get()
+        try:
+            result = worker.call(op, image, tess_config, timeout or self.timeout)
+        except TimeoutError:
+            self.stats['timeouts'] += 1
+            self._replace(worker)
+            raise
+        except RuntimeError:
+            # The worker answered with an error (e.g. Tesseract failed on this image)
+            self._idle.put(worker)
+            raise
+        except BaseException:
+            # Broken pipe or interrupted mid-call: the worker's state is unknown
+            self._replace(worker)
+            raise
+        self.stats['calls'] += 1
+        self._idle.put(worker)
+        return result
+
+    def image_to_string(self, image: np.ndarray, tess_config: Optional[str] = None) -> str:
+        return self._call('string', np.ascontiguousarray(image), tess_config)
+
+    def image_to_data(self, image: np.ndarray, tess_config: Optional[str] = None) -> Dict:
+        return self._call('data', np.ascontiguousarray(image), tess_config)
+
+    def health_check(self, timeout: float = 5.0) -> Dict:
+        """Ping every worker once, replacing any that are dead or unresponsive"""
+        healthy = 0
+        for _ in range(self.size):
+            try:
+                self._call('ping', None, None, timeout)
+                healthy += 1
+            except (TimeoutError, RuntimeError, EOFError, OSError):
+                pass
+        return {'size': self.size, 'healthy': healthy, **self.stats}
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.kill()
+
+ENGINE_TYPES = ('auto', 'pool', 'cli', 'api', 'pytesseract')
+
+_engine = None
+_engine_lock = threading.Lock()
+_engine_settings = {'kind': config.OCR_ENGINE, 'size': None}
+
+def configure(kind: Optional[str] = None, size: Optional[int] = None):
+    """Choose the process-wide engine ('auto', 'pool', 'cli', 'api', 'pytesseract') before first use"""
+    global _engine
+    if kind is not None and kind not in ENGINE_TYPES:
+        raise ValueError(f"Unknown OCR engine {kind!r}, expected one of {ENGINE_TYPES}")
+    with _engine_lock:
+        if _engine is not None and hasattr(_engine, 'close'):
+            _engine.close()
+        _engine = None
+        if kind is not None:
+            _engine_settings['kind'] = kind
+        _engine_settings['size'] = size
+
+def engine_kind() -> str:
+    """Configured engine type, with 'auto' resolved to 'pool' or 'cli'"""
+    kind = _engine_settings['kind']
+    if kind == 'auto':
+        return 'pool' if tesserocr is not None else 'cli'
+    return kind
+
+def get_engine():
+    """Process-wide OCR engine, created on first use"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                kind = engine_kind()
+                if kind == 'pool':
+                    _engine = EnginePool(size=_engine_settings['size'] or config.OCR_POOL_SIZE)
+                elif kind == 'cli':
+                    _engine = CliEngine(timeout=config.OCR_TIMEOUT)
+                elif kind == 'api':
+                    _engine = ApiEngine()
+                else:
+                    _engine = PytesseractEngine()
+    return _engine
+
+def uses_worker_pool() -> bool:
+    """True when OCR calls are already spread over the engine's own processes"""
+    return engine_kind() == 'pool'
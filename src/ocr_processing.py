@@ -1,109 +1,530 @@
-import pytesseract
-import re
-import spacy
 import cv2
 import numpy as np
-from typing import Dict, Union
-from pdf2image import convert_from_path
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+from .config import (OCR_WORKERS, PDF_DPI, PDF_RASTER_WINDOW, TESSERACT_CONFIG,
+                     LOAN_FIELD_PATTERNS, NUMERIC_LOAN_FIELDS, PAGE_PRIORITY, EARLY_EXIT_FIELDS,
+                     ADAPTIVE_MIN_CONFIDENCE, ADAPTIVE_FULL_PAGE_RATIO, ADAPTIVE_LINE_PADDING)
+from .field_extraction import FieldExtractor
+from .layout_extraction import (FormTemplate, LayoutExtractor, WordBoxes, extract_with_template,
+                                line_config, ocr_words)
+from .preprocessing import PdfPageSource, get_pipeline, is_blank_page
+from .ocr_cache import ResultCache
+from .ner_fallback import NLP, fill_missing_fields
+from . import ocr_engine, tracing
 
-# Initialize spaCy for advanced text processing
-nlp = spacy.load("en_core_web_sm")
+LOAN_FIELD_EXTRACTOR = FieldExtractor(LOAN_FIELD_PATTERNS, numeric_fields=NUMERIC_LOAN_FIELDS)
+LAYOUT_EXTRACTOR = LayoutExtractor()
+
+# Extraction modes understood by process_document
+EXTRACTION_MODES = ('text', 'layout')
+
+def get_nlp():
+    """Shared spaCy pipeline (loaded on the first call)"""
+    return NLP.get()
+
+def _load_image(image: Union[str, np.ndarray]) -> Tuple[np.ndarray, str]:
+    """Image array plus its channel order: files via OpenCV are BGR, arrays
+    (pdf2image/PIL pages) are RGB"""
+    if isinstance(image, str):
+        return cv2.imread(image), 'bgr'
+    return image, 'rgb'
+
+def binarize_image(img: np.ndarray, channel_order: str = 'rgb') -> np.ndarray:
+    """Grayscale + Otsu threshold, the preprocessing used before OCR
+
+    Runs the shared 'fast' PreprocessPipeline; the result is a reused
+    buffer, valid until the next call in this thread.
+    """
+    return get_pipeline('fast').process(img, channel_order)
 
 def extract_text_from_image(image: Union[str, np.ndarray]) -> str:
     """Extract text from image with preprocessing"""
-    # Preprocess image
-    if isinstance(image, str):
-        img = cv2.imread(image)
-    else:
-        img = image
-    
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)[1]
+    thresh = binarize_image(*_load_image(image))
     
     # Perform OCR
-    custom_config = r'--oem 3 --psm 6'
-    text = pytesseract.image_to_string(thresh, config=custom_config)
+    with tracing.span('ocr') as span:
+        span.add('pages')
+        text = ocr_engine.get_engine().image_to_string(thresh, TESSERACT_CONFIG)
     return text
 
-def extract_loan_fields(text: str) -> Dict[str, str]:
-    """Extract structured loan application data with robust regex"""
-    # Normalize text: remove extra spaces, unify spacing
-    text = re.sub(r'[ \t]+', ' ', text)
-    text = re.sub(r'\n+', '\n', text)
-
-    # Improved regex patterns (more flexible and tolerant to OCR errors)
-    patterns = {
-        'applicant_name': r'Applicant\s*Name\s*[:\-]?\s*(.+)',
-        'address': r'Address\s*[:\-]?\s*(.+)',
-        'dob': r'Date\s*of\s*Birth\s*[:\-]?\s*(\d{2}[-/]\d{2}[-/]\d{4})',
-        'education': r'Education\s*[:\-]?\s*(Graduate|Not Graduate|Undergraduate)',
-        'self_employed': r'Self\s*Employed\s*[:\-]?\s*(Yes|No)',
-        'no_of_dependents': r'(?:Number\s*of\s*)?Dependents\s*[:\-]?\s*(\d+)',
-        'income_annum': r'Annual\s*Income\s*[:\-]?\s*₹?\s*([\d,]+)',
-        'loan_amount': r'Loan\s*Amount\s*(?:Requested)?\s*[:\-]?\s*₹?\s*([\d,]+)',
-        'loan_term': r'Loan\s*Term\s*[:\-]?\s*(\d+)',
-        'cibil_score': r'CIBIL\s*Score\s*[:\-]?\s*(\d+)',
-        'residential_assets': r'Residential\s*Assets\s*[:\-]?\s*₹?\s*([\d,]+)',
-        'commercial_assets': r'Commercial\s*Assets\s*[:\-]?\s*₹?\s*([\d,]+)',
-        'luxury_assets': r'Luxury\s*Assets\s*[:\-]?\s*₹?\s*([\d,]+)',
-        'bank_assets': r'Bank\s*Assets\s*[:\-]?\s*₹?\s*([\d,]+)'
-    }
-
-    extracted = {}
-    for field, pattern in patterns.items():
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            extracted[field] = match.group(1).strip()
-
-    # Clean numeric fields (remove commas)
-    for field in ['income_annum', 'loan_amount', 'residential_assets',
-                  'commercial_assets', 'luxury_assets', 'bank_assets']:
-        if field in extracted:
-            extracted[field] = extracted[field].replace(',', '')
-
-    return extracted
-
-    """Extract structured loan application data"""
-    # Field patterns with improved regex
-    patterns = {
-        'applicant_name': r'Applicant Name\s*:\s*(.+?)\s*(?=\n|Address)',
-        'address': r'Address\s*:\s*(.+?)\s*(?=\n|Date of Birth)',
-        'dob': r'Date of Birth\s*:\s*(\d{2}-\d{2}-\d{4})',
-        'education': r'Education\s*:\s*(.+?)\s*(?=\n|Self Employed)',
-        'self_employed': r'Self Employed\s*:\s*(Yes|No)',
-        'no_of_dependents': r'Number of Dependents\s*:\s*(\d+)',
-        'income_annum': r'Annual Income\s*:\s*₹?([\d,]+)',
-        'loan_amount': r'Loan Amount Requested\s*:\s*₹?([\d,]+)',
-        'loan_term': r'Loan Term\s*:\s*(\d+)\s*years?',
-        'cibil_score': r'CIBIL Score\s*:\s*(\d+)',
-        'residential_assets': r'Residential Assets\s*:\s*₹?([\d,]+)',
-        'commercial_assets': r'Commercial Assets\s*:\s*₹?([\d,]+)',
-        'luxury_assets': r'Luxury Assets\s*:\s*₹?([\d,]+)',
-        'bank_assets': r'Bank Assets\s*:\s*₹?([\d,]+)'
-    }
-    
-    extracted = {}
-    for field, pattern in patterns.items():
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            extracted[field] = match.group(1).strip()
-    
-    # Clean numeric fields
-    for field in ['income_annum', 'loan_amount', 'residential_assets',
-                 'commercial_assets', 'luxury_assets', 'bank_assets']:
-        if field in extracted:
-            extracted[field] = extracted[field].replace(',', '')
-    
-    return extracted
+def extract_layout_from_image(image: Union[str, np.ndarray]) -> Tuple[str, Dict[str, str]]:
+    """OCR once with word boxes; returns (line text, fields matched by geometry)"""
+    boxes = ocr_words(binarize_image(*_load_image(image)))
+    with tracing.span('extract_layout'):
+        return boxes.to_text(), LAYOUT_EXTRACTOR.extract(boxes)
+
+def extract_text_fields_from_image(image: Union[str, np.ndarray]) -> Tuple[str, Dict[str, str]]:
+    """OCR text of one page and the fields found in it"""
+    text = extract_text_from_image(image)
+    return text, extract_loan_fields(text)
+
+def extract_loan_fields(text: str, extractor: Optional[FieldExtractor] = None) -> Dict[str, str]:
+    """Extract structured loan application data with robust regex
+
+    Uses the precompiled single-pass LOAN_FIELD_EXTRACTOR unless another
+    FieldExtractor (e.g. one built from config.FIELD_PATTERNS) is given.
+    """
+    with tracing.span('extract') as span:
+        span.add('chars', len(text))
+        return (extractor or LOAN_FIELD_EXTRACTOR).extract(text)
+
+def ocr_pages(pages: Iterable[np.ndarray], parallel: bool = False,
+              workers: Optional[int] = None,
+              ocr: Callable = extract_text_from_image,
+              on_page: Optional[Callable[[], None]] = None) -> List:
+    """OCR page images, optionally across a process pool, keeping page order
 
-def process_document(file_path: str) -> Dict[str, str]:
-    """Process PDF or image document"""
+    Pages are pulled lazily and at most `workers` pages are in flight at
+    once, so a streaming page source keeps its memory bound. `ocr` is the
+    per-page function (must be picklable for the process pool). With the
+    'pool' OCR engine, Tesseract already runs in warm worker processes, so
+    pages are dispatched from threads instead of a second process pool.
+    `on_page` is called after each page in order; if it raises, pages not
+    yet started are cancelled and the exception propagates.
+    """
+    workers = workers or OCR_WORKERS
+    if not parallel or workers < 2:
+        texts = []
+        for page in pages:
+            texts.append(ocr(page))
+            if on_page is not None:
+                on_page()
+        return texts
+
+    texts = []
+    pending = deque()
+    executor_class = ThreadPoolExecutor if ocr_engine.uses_worker_pool() else ProcessPoolExecutor
+    with executor_class(max_workers=workers) as executor:
+        try:
+            for page in pages:
+                if len(pending) >= workers:
+                    texts.append(pending.popleft().result())
+                    if on_page is not None:
+                        on_page()
+                pending.append(executor.submit(ocr, page))
+            while pending:
+                texts.append(pending.popleft().result())
+                if on_page is not None:
+                    on_page()
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+    return texts
+
+class _PageProgress:
+    """Counts finished pages and reports (done, total) to a progress callback"""
+
+    def __init__(self, callback: Optional[Callable[[int, int], None]] = None):
+        self.callback = callback
+        self.done = 0
+        self.total = 0
+
+    def add_pages(self, count: int):
+        self.total += count
+        self.report()
+
+    def __call__(self):
+        self.done += 1
+        self.report()
+
+    def report(self):
+        if self.callback is not None:
+            self.callback(self.done, self.total)
+
+def _page_to_array(page) -> np.ndarray:
+    """Copy a PIL page into a numpy array and release the PIL image"""
+    array = np.array(page)
+    page.close()
+    return array
+
+def ocr_document(file_path: str, parallel: bool = False,
+                 workers: Optional[int] = None, dpi: int = PDF_DPI,
+                 window: int = PDF_RASTER_WINDOW,
+                 stats: Optional[Dict] = None,
+                 progress: Optional[Callable[[int, int], None]] = None) -> str:
+    """OCR a PDF or image document into raw text
+
+    PDF pages are rasterized at `dpi`, `window` pages at a time, and released
+    after OCR. With parallel=True the pages of a multi-page PDF are OCRed
+    concurrently by up to `workers` processes (default OCR_WORKERS).
+    Rasterization stats are copied into `stats` when a dict is given.
+    `progress(pages_done, pages_total)` is called as pages finish.
+    """
+    progress = progress if isinstance(progress, _PageProgress) else _PageProgress(progress)
     if file_path.lower().endswith('.pdf'):
-        images = convert_from_path(file_path)
-        full_text = ""
-        for img in images:
-            full_text += extract_text_from_image(np.array(img)) + "\n"
-    else:
-        full_text = extract_text_from_image(file_path)
-    
-    return extract_loan_fields(full_text)
\ No newline at end of file
+        source = PdfPageSource(file_path, dpi=dpi, window=window)
+        progress.add_pages(len(source))
+        pages = (_page_to_array(page) for page in source)
+        texts = ocr_pages(pages, parallel and len(source) > 1, workers, on_page=progress)
+        if stats is not None:
+            stats.update(source.stats)
+        return "".join(text + "\n" for text in texts)
+
+    progress.add_pages(1)
+    text = extract_text_from_image(file_path)
+    progress()
+    return text
+
+def _merge_fields(per_page: Iterable[Dict[str, str]]) -> Dict[str, str]:
+    """Combine per-page fields; the first page a field appears on wins"""
+    merged = {}
+    for fields in per_page:
+        for field, value in fields.items():
+            merged.setdefault(field, value)
+    return merged
+
+def _extract_early_exit(file_path: str, mode: str, parallel: bool, workers: Optional[int],
+                        dpi: int, window: int, stats: Optional[Dict],
+                        page_priority: Optional[List[int]],
+                        required_fields: Optional[Iterable[str]],
+                        progress: _PageProgress) -> Tuple[str, Dict[str, str]]:
+    """
+    OCR a PDF page by page in priority order until the required fields are found
+
+    Blank pages are detected on the raster and never OCRed. With parallel,
+    pages go out in rounds of `workers` and the check runs after each
+    round. Pages after the exit point are not even rasterized. Page texts
+    are returned in document order.
+    """
+    ocr = extract_layout_from_image if mode == 'layout' else extract_text_fields_from_image
+    required = set(EARLY_EXIT_FIELDS if required_fields is None else required_fields)
+    source = PdfPageSource(file_path, dpi=dpi, window=window,
+                           priority=PAGE_PRIORITY if page_priority is None else page_priority)
+    round_size = (workers or OCR_WORKERS) if parallel else 1
+    texts, fields, blank, batch = {}, {}, [], []
+    progress.add_pages(len(source))
+
+    def run_batch():
+        results = ocr_pages([image for _, image in batch], parallel and len(batch) > 1,
+                            workers, ocr=ocr, on_page=progress)
+        for (number, _), (text, page_fields) in zip(batch, results):
+            texts[number] = text
+            for field, value in page_fields.items():
+                fields.setdefault(field, value)
+        batch.clear()
+
+    with tracing.span('early_exit', mode=mode) as span:
+        for number, page in zip(source.page_numbers, source):
+            image = _page_to_array(page)
+            if is_blank_page(image):
+                blank.append(number)
+                progress()
+                continue
+            batch.append((number, image))
+            if len(batch) >= round_size:
+                run_batch()
+                if required <= fields.keys():
+                    break
+        if batch:
+            run_batch()
+        unread = [n for n in source.page_numbers if n not in texts and n not in blank]
+        span.add('pages_ocr', len(texts))
+        span.add('pages_skipped', len(blank) + len(unread))
+
+    if stats is not None:
+        stats.update(source.stats)
+        stats.update({
+            'page_order': source.page_numbers,
+            'ocr_pages': sorted(texts),
+            'blank_pages': sorted(blank),
+            'unread_pages': sorted(unread),
+            'skipped_pages': sorted(blank + unread),
+            'missing_fields': sorted(required - fields.keys()),
+        })
+    return "".join(texts[n] + "\n" for n in sorted(texts)), fields
+
+def _fast_page(image: Union[str, np.ndarray]) -> Tuple[WordBoxes, bool]:
+    """Fast-tier word boxes of one page, and whether a page without words is blank"""
+    boxes = ocr_words(binarize_image(*_load_image(image)))
+    return boxes, not len(boxes) and is_blank_page(_load_image(image)[0])
+
+def plan_enhancement(boxes: WordBoxes, missing: Iterable[str] = (),
+                     min_confidence: float = ADAPTIVE_MIN_CONFIDENCE,
+                     full_page_ratio: float = ADAPTIVE_FULL_PAGE_RATIO) -> Tuple[str, List[np.ndarray]]:
+    """
+    Tier for one fast-OCRed page: ('fast', []), ('regions', word indices
+    per line to read again) or ('full', []) to read the whole page again
+
+    Lines are re-read when their mean word confidence is low or they hold
+    the label of a missing field. A missing field whose label was not read
+    on any line gets no region: enhancement cannot find what a clean scan
+    does not contain.
+    """
+    lines = boxes.lines()
+    if not lines:
+        return 'full', []
+    low = {int(boxes.line[idx[0]]) for idx in lines if boxes.conf[idx].mean() < min_confidence}
+    if len(low) > full_page_ratio * len(lines):
+        return 'full', []
+    chosen = low.union(LAYOUT_EXTRACTOR.label_lines(boxes, missing)) if missing else low
+    regions = [idx for idx in lines if int(boxes.line[idx[0]]) in chosen]
+    return ('regions', regions) if regions else ('fast', [])
+
+def _enhanced_page(job: Tuple[Union[str, np.ndarray], WordBoxes, Optional[List[np.ndarray]],
+                              List[str]]) -> WordBoxes:
+    """
+    Enhanced-tier reading of one page: (image, fast boxes, lines or None for
+    the whole page, missing fields)
+
+    Both pipelines resize the same way, so fast-tier boxes locate lines on
+    the enhanced image. A line (or the page) takes the enhanced reading if
+    its mean confidence is not lower than the fast one, or if the line now
+    yields a missing field.
+    """
+    image, boxes, lines, missing = job
+    enhanced = get_pipeline('enhanced').process(*_load_image(image))
+    if lines is None:
+        words = ocr_words(enhanced)
+        if len(words) and (not len(boxes) or words.conf.mean() >= boxes.conf.mean()):
+            return words
+        return boxes
+    height, width = enhanced.shape[:2]
+    config = line_config(TESSERACT_CONFIG)
+    keep = np.ones(len(boxes), dtype=bool)
+    parts = []
+    for idx in lines:
+        x0, y0, x1, y1 = boxes.bbox(idx)
+        x0, y0 = max(0, x0 - ADAPTIVE_LINE_PADDING), max(0, y0 - ADAPTIVE_LINE_PADDING)
+        x1, y1 = min(width, x1 + ADAPTIVE_LINE_PADDING), min(height, y1 + ADAPTIVE_LINE_PADDING)
+        words = ocr_words(enhanced[y0:y1, x0:x1], config)
+        if not len(words):
+            continue
+        if (words.conf.mean() < boxes.conf[idx].mean()
+                and not set(missing).intersection(extract_loan_fields(words.to_text()))):
+            continue
+        keep[idx] = False
+        parts.append(words.shifted(x0, y0, int(boxes.line[idx[0]])))
+    return WordBoxes.concat([boxes.subset(np.flatnonzero(keep))] + parts)
+
+def _extract_adaptive(file_path: str, mode: str, parallel: bool, workers: Optional[int],
+                      dpi: int, window: int, stats: Optional[Dict],
+                      required_fields: Optional[Iterable[str]],
+                      progress: _PageProgress) -> Tuple[str, Dict[str, str]]:
+    """
+    OCR every page with the fast pipeline, then read the pages or lines that
+    plan_enhancement picks again with the enhanced pipeline
+
+    Only pages that need it are rasterized a second time, so memory stays
+    bounded as in ocr_document. The document tier is 'fast' when no page
+    was enhanced, else 'enhanced'.
+    """
+    is_pdf = file_path.lower().endswith('.pdf')
+    required = set(EARLY_EXIT_FIELDS if required_fields is None else required_fields)
+
+    def document_fields(pages: List[WordBoxes]) -> Tuple[str, Dict[str, str]]:
+        full_text = "".join(boxes.to_text() + "\n" for boxes in pages)
+        if mode == 'layout':
+            return full_text, _merge_fields(LAYOUT_EXTRACTOR.extract(boxes) for boxes in pages)
+        return full_text, extract_loan_fields(full_text)
+
+    with tracing.span('adaptive', mode=mode) as span:
+        if is_pdf:
+            source = PdfPageSource(file_path, dpi=dpi, window=window)
+            numbers = source.page_numbers
+            progress.add_pages(len(source))
+            fast = ocr_pages((_page_to_array(page) for page in source),
+                             parallel and len(source) > 1, workers, ocr=_fast_page,
+                             on_page=progress)
+        else:
+            source, numbers = None, [1]
+            progress.add_pages(1)
+            fast = [_fast_page(file_path)]
+            progress()
+        pages = [boxes for boxes, _ in fast]
+        full_text, fields = document_fields(pages)
+        missing = required - fields.keys()
+
+        tiers, plans = {}, {}
+        for number, (boxes, blank) in zip(numbers, fast):
+            tier, lines = ('fast', []) if blank else plan_enhancement(boxes, missing)
+            tiers[number] = tier
+            if tier != 'fast':
+                plans[number] = None if tier == 'full' else lines
+
+        if plans:
+            # Enhanced pages count as extra work on top of the first pass
+            progress.add_pages(len(plans))
+            if is_pdf:
+                again = PdfPageSource(file_path, dpi=dpi, window=window, page_numbers=sorted(plans))
+                images = (_page_to_array(page) for page in again)
+            else:
+                again, images = None, [file_path]
+            position = {number: n for n, number in enumerate(numbers)}
+            jobs = ((image, pages[position[number]], plans[number], sorted(missing))
+                    for number, image in zip(sorted(plans), images))
+            enhanced = ocr_pages(jobs, parallel and len(plans) > 1, workers, ocr=_enhanced_page,
+                                 on_page=progress)
+            for number, boxes in zip(sorted(plans), enhanced):
+                pages[position[number]] = boxes
+            full_text, fields = document_fields(pages)
+        else:
+            again = None
+
+        tier = 'enhanced' if plans else 'fast'
+        regions = sum(len(lines) for lines in plans.values() if lines is not None)
+        span.set(tier=tier)
+        span.add('pages_enhanced', len(plans))
+        span.add('regions_enhanced', regions)
+
+    if stats is not None:
+        if source is not None:
+            stats.update(source.stats)
+        stats.update({
+            'preprocess_tier': tier,
+            'page_tiers': tiers,
+            'enhanced_pages': sorted(plans),
+            'enhanced_regions': regions,
+            'rerasterized_pages': len(again) if again is not None else 0,
+            'missing_fields': sorted(required - fields.keys()),
+        })
+    return full_text, fields
+
+def _extract_document(file_path: str, mode: str, template: Optional[FormTemplate],
+                      parallel: bool, workers: Optional[int], dpi: int, window: int,
+                      stats: Optional[Dict], early_exit: bool = False,
+                      page_priority: Optional[List[int]] = None,
+                      required_fields: Optional[Iterable[str]] = None,
+                      adaptive: bool = False,
+                      progress: Optional[Callable[[int, int], None]] = None) -> Tuple[str, Dict[str, str]]:
+    """(raw text, fields) for one document in the requested extraction mode"""
+    if mode not in EXTRACTION_MODES:
+        raise ValueError(f"Unknown extraction mode {mode!r}, expected one of {EXTRACTION_MODES}")
+    if adaptive and early_exit:
+        raise ValueError("adaptive and early_exit cannot be combined")
+    is_pdf = file_path.lower().endswith('.pdf')
+    progress = _PageProgress(progress)
+
+    if adaptive and template is None:
+        return _extract_adaptive(file_path, mode, parallel, workers, dpi, window, stats,
+                                 required_fields, progress)
+
+    if early_exit and is_pdf and template is None:
+        return _extract_early_exit(file_path, mode, parallel, workers, dpi, window, stats,
+                                   page_priority, required_fields, progress)
+
+    if template is not None:
+        # Known layout: OCR only the value regions on the pages that have them
+        if not is_pdf:
+            progress.add_pages(1)
+            image = binarize_image(*_load_image(file_path))
+            fields = extract_with_template(image, template, 0, LAYOUT_EXTRACTOR)
+            progress()
+            return "", fields
+        source = PdfPageSource(file_path, dpi=dpi, window=window,
+                               page_numbers=[page + 1 for page in template.pages])
+        progress.add_pages(len(source))
+        per_page = []
+        for index, page in zip([n - 1 for n in source.page_numbers], source):
+            per_page.append(extract_with_template(binarize_image(_page_to_array(page)), template,
+                                                  index, LAYOUT_EXTRACTOR))
+            progress()
+        if stats is not None:
+            stats.update(source.stats)
+        return "", _merge_fields(per_page)
+
+    if mode == 'layout':
+        if not is_pdf:
+            progress.add_pages(1)
+            result = extract_layout_from_image(file_path)
+            progress()
+            return result
+        source = PdfPageSource(file_path, dpi=dpi, window=window)
+        progress.add_pages(len(source))
+        pages = (_page_to_array(page) for page in source)
+        results = ocr_pages(pages, parallel and len(source) > 1, workers,
+                            ocr=extract_layout_from_image, on_page=progress)
+        if stats is not None:
+            stats.update(source.stats)
+        return ("".join(text + "\n" for text, _ in results),
+                _merge_fields(fields for _, fields in results))
+
+    full_text = ocr_document(file_path, parallel, workers, dpi, window, stats, progress)
+    return full_text, extract_loan_fields(full_text)
+
+def extract_document(file_path: str, parallel: bool = False,
+                     workers: Optional[int] = None, dpi: int = PDF_DPI,
+                     window: int = PDF_RASTER_WINDOW,
+                     stats: Optional[Dict] = None,
+                     cache: Optional[ResultCache] = None,
+                     mode: str = 'text',
+                     template: Optional[FormTemplate] = None,
+                     early_exit: bool = False,
+                     page_priority: Optional[List[int]] = None,
+                     required_fields: Optional[Iterable[str]] = None,
+                     adaptive: bool = False,
+                     progress: Optional[Callable[[int, int], None]] = None) -> Tuple[str, Dict[str, str]]:
+    """process_document, returning (raw text, fields) without the NER fallback
+
+    The text is what the fields were extracted from ('' with a FormTemplate).
+    """
+    with tracing.span('process_document', mode=mode) as span:
+        if cache is None:
+            return _extract_document(file_path, mode, template, parallel, workers,
+                                     dpi, window, stats, early_exit, page_priority,
+                                     required_fields, adaptive, progress)
+
+        variant = f"template:{template.fingerprint()}" if template is not None else mode
+        if early_exit and template is None:
+            priority = PAGE_PRIORITY if page_priority is None else page_priority
+            required = EARLY_EXIT_FIELDS if required_fields is None else required_fields
+            variant += f":early:{list(priority)}:{sorted(required)}"
+        if adaptive and template is None:
+            required = EARLY_EXIT_FIELDS if required_fields is None else required_fields
+            variant += f":adaptive:{ADAPTIVE_MIN_CONFIDENCE}:{sorted(required)}"
+        key = cache.key_for_file(file_path, dpi, variant)
+        entry = cache.get(key)
+        span.set(cache='hit' if entry is not None else 'miss')
+        if entry is None:
+            full_text, fields = _extract_document(file_path, mode, template, parallel,
+                                                  workers, dpi, window, stats, early_exit,
+                                                  page_priority, required_fields, adaptive,
+                                                  progress)
+            entry = cache.put(key, full_text, fields, dpi, variant)
+        return entry['text'], dict(entry['fields'])
+
+def process_document(file_path: str, parallel: bool = False,
+                     workers: Optional[int] = None, dpi: int = PDF_DPI,
+                     window: int = PDF_RASTER_WINDOW,
+                     stats: Optional[Dict] = None,
+                     cache: Optional[ResultCache] = None,
+                     mode: str = 'text',
+                     template: Optional[FormTemplate] = None,
+                     early_exit: bool = False,
+                     page_priority: Optional[List[int]] = None,
+                     required_fields: Optional[Iterable[str]] = None,
+                     adaptive: bool = False,
+                     progress: Optional[Callable[[int, int], None]] = None,
+                     ner_fallback: bool = False) -> Dict[str, str]:
+    """Process PDF or image document
+
+    mode='text' runs regexes over the OCR text; mode='layout' runs Tesseract
+    once per page with word boxes and matches labels to values by position.
+    A FormTemplate skips full-page OCR and reads only its value regions.
+    With early_exit, PDF pages are OCRed in page_priority order (default
+    PAGE_PRIORITY), blank pages are skipped, and OCR stops once every
+    required field (default EARLY_EXIT_FIELDS) is found; the skipped pages
+    are listed in `stats`. With adaptive, pages are OCRed after binarization
+    only and just the low-confidence lines, the lines labelling a missing
+    required field, or mostly unreadable pages are OCRed again from the
+    enhanced image; `stats['preprocess_tier']` says whether that happened
+    ('fast' or 'enhanced'). See ocr_document for the OCR options. When a
+    ResultCache is given, documents already processed with the same bytes
+    and config are served from it without OCR. `progress(pages_done,
+    pages_total)` is called as pages finish (the total grows if adaptive
+    enhances pages); an exception raised from it stops the document.
+    With ner_fallback, fields the regexes missed are looked for among the
+    named entities of the text (src/ner_fallback.py); the fields it filled
+    are listed in `stats['ner_fields']`.
+    """
+    full_text, fields = extract_document(file_path, parallel, workers, dpi, window, stats, cache,
+                                         mode, template, early_exit, page_priority,
+                                         required_fields, adaptive, progress)
+    if ner_fallback:
+        filled = fill_missing_fields([full_text], [fields])[0]
+        if stats is not None:
+            stats['ner_fields'] = sorted(filled.keys() - fields.keys())
+        fields = filled
+    return fields
@@ -1,9 +1,135 @@
 import cv2
 import numpy as np
 import os
+import threading
+import time
 from PIL import Image
-from pdf2image import convert_from_path
-from .config import RAW_DOCS_DIR, PROCESSED_DIR
+from pdf2image import convert_from_path, pdfinfo_from_path
+from .config import (RAW_DOCS_DIR, PROCESSED_DIR, PDF_DPI, PDF_RASTER_WINDOW,
+                     PREPROCESS_TARGET_WIDTH, PREVIEW_DPI, BLANK_PAGE_INK_RATIO,
+                     BLANK_PAGE_DARK_LEVEL)
+from . import tracing
+from .tracing import peak_rss_bytes
+
+# Binarization only: what OCR runs on every page
+FAST_STAGES = ('grayscale', 'resize', 'otsu')
+# Full enhancement: adds morphological opening and CLAHE
+ENHANCED_STAGES = ('grayscale', 'resize', 'otsu', 'open', 'clahe')
+
+_GRAY_CODES = {
+    ('rgb', 3): cv2.COLOR_RGB2GRAY,
+    ('bgr', 3): cv2.COLOR_BGR2GRAY,
+    ('rgb', 4): cv2.COLOR_RGBA2GRAY,
+    ('bgr', 4): cv2.COLOR_BGRA2GRAY,
+}
+
+class PreprocessPipeline:
+    """
+    Configurable image preprocessing shared by OCR and preprocess_image
+
+    Stages run in order on uint8 images: grayscale (honouring the input's
+    channel order), resize (downscale to `target_width` before thresholding),
+    otsu, open (morphological opening) and clahe. Working images live in
+    buffers owned by the pipeline and are reused across calls with the same
+    page size; pointwise stages run in place. The array returned by
+    process() is therefore overwritten by the next call unless copy=True.
+    A pipeline is not thread-safe; use get_pipeline() for a per-thread one.
+
+    With profile=True, per-stage call counts, time and newly allocated
+    buffer bytes are accumulated in `stage_stats`.
+    """
+
+    def __init__(self, stages=FAST_STAGES, target_width=PREPROCESS_TARGET_WIDTH,
+                 open_kernel=1, clahe_clip=2.0, clahe_tile=(8, 8), profile=False):
+        self.stages = tuple(stages)
+        self.target_width = target_width
+        self.kernel = np.ones((open_kernel, open_kernel), np.uint8)
+        self.clahe = cv2.createCLAHE(clipLimit=clahe_clip, tileGridSize=clahe_tile)
+        self.profile = profile
+        self.stage_stats = {}
+        self._buffers = {}
+        self._stage = None
+
+    def _buffer(self, name, shape):
+        buf = self._buffers.get(name)
+        if buf is None or buf.shape != shape:
+            buf = np.empty(shape, dtype=np.uint8)
+            self._buffers[name] = buf
+            if self.profile:
+                self._stats()['allocated_bytes'] += buf.nbytes
+        return buf
+
+    def _stats(self):
+        return self.stage_stats.setdefault(
+            self._stage, {'calls': 0, 'seconds': 0.0, 'allocated_bytes': 0})
+
+    def process(self, image, channel_order='rgb', copy=False):
+        """Run the stages on an RGB/BGR(A) or grayscale uint8 array"""
+        with tracing.span('preprocess') as span:
+            span.add('pages')
+            span.add('bytes', image.nbytes)
+            img = image
+            for stage in self.stages:
+                self._stage = stage
+                start = time.perf_counter() if self.profile else None
+                img = getattr(self, f'_{stage}')(img, channel_order)
+                if self.profile:
+                    stats = self._stats()
+                    stats['calls'] += 1
+                    stats['seconds'] += time.perf_counter() - start
+            return img.copy() if copy or img is image else img
+
+    def _grayscale(self, img, channel_order):
+        if img.ndim == 2:
+            return img
+        if img.shape[2] == 1:
+            return img[:, :, 0]
+        gray = self._buffer('gray', img.shape[:2])
+        return cv2.cvtColor(img, _GRAY_CODES[(channel_order, img.shape[2])], dst=gray)
+
+    def _resize(self, img, channel_order):
+        height, width = img.shape[:2]
+        if not self.target_width or width <= self.target_width:
+            return img
+        size = (self.target_width, max(1, round(height * self.target_width / width)))
+        small = self._buffer('resized', (size[1], size[0]) + img.shape[2:])
+        return cv2.resize(img, size, dst=small, interpolation=cv2.INTER_AREA)
+
+    def _otsu(self, img, channel_order):
+        # Pointwise: threshold in place unless img is the caller's array
+        dst = img if self._owns(img) else self._buffer('binary', img.shape)
+        return cv2.threshold(img, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU, dst=dst)[1]
+
+    def _open(self, img, channel_order):
+        if self.kernel.shape == (1, 1):
+            return img  # opening with a 1x1 kernel is the identity
+        out = self._buffer('open', img.shape)
+        return cv2.morphologyEx(img, cv2.MORPH_OPEN, self.kernel, dst=out)
+
+    def _clahe(self, img, channel_order):
+        dst = img if self._owns(img) else self._buffer('clahe', img.shape)
+        return self.clahe.apply(img, dst=dst)
+
+    def _owns(self, img):
+        return any(img is buf for buf in self._buffers.values())
+
+PIPELINE_PRESETS = {
+    'fast': {'stages': FAST_STAGES},
+    'enhanced': {'stages': ENHANCED_STAGES},
+}
+
+_local = threading.local()
+
+def get_pipeline(name='fast'):
+    """
+    Per-thread pipeline for a preset ('fast' or 'enhanced')
+    """
+    pipelines = getattr(_local, 'pipelines', None)
+    if pipelines is None:
+        pipelines = _local.pipelines = {}
+    if name not in pipelines:
+        pipelines[name] = PreprocessPipeline(**PIPELINE_PRESETS[name])
+    return pipelines[name]
 
 def preprocess_image(image_path):
     """
@@ -15,33 +141,118 @@ def preprocess_image(image_path):
             img = cv2.imread(image_path)
             if img is None:
                 raise ValueError(f"Could not read image at {image_path}")
+            channel_order = 'bgr'
         else:  # Assume it's a PIL Image
-            img = np.array(image_path)
-            # Convert RGB to BGR for OpenCV
-            img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
-        
-        # Convert to grayscale
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            img = np.asarray(image_path)
+            channel_order = 'rgb'
         
-        # Rest of your processing...
-        thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)[1]
-        kernel = np.ones((1, 1), np.uint8)
-        cleaned = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel)
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        enhanced = clahe.apply(cleaned)
-        
-        return enhanced
+        return get_pipeline('enhanced').process(img, channel_order, copy=True)
     except Exception as e:
         print(f"Error preprocessing image: {str(e)}")
         raise
 
-def convert_pdf_to_images(pdf_path):
+def convert_pdf_to_images(pdf_path, dpi=PDF_DPI):
     """
     Convert PDF to images
     """
-    images = convert_from_path(pdf_path)
+    with tracing.span('rasterize', dpi=dpi) as span:
+        images = convert_from_path(pdf_path, dpi=dpi)
+        span.add('pages', len(images))
     return images
 
+def is_blank_page(image, ink_ratio=BLANK_PAGE_INK_RATIO, dark_level=BLANK_PAGE_DARK_LEVEL):
+    """
+    True if almost no pixels are dark: checked on every 4th pixel of every
+    4th row, so it costs a small fraction of thresholding the page
+    """
+    sample = np.asarray(image)[::4, ::4]
+    if sample.ndim == 3:
+        # Darkest channel: colored ink counts as ink
+        sample = sample.min(axis=2)
+    return np.count_nonzero(sample < dark_level) < ink_ratio * sample.size
+
+def pdf_thumbnail(pdf_path, dpi=PREVIEW_DPI):
+    """
+    First page only, rasterized at a low DPI for previews
+    """
+    with tracing.span('rasterize', dpi=dpi, preview=True) as span:
+        image = convert_from_path(pdf_path, dpi=dpi, first_page=1, last_page=1)[0]
+        span.add('pages')
+    return image
+
+def page_order(page_count, priority=None):
+    """1-based page numbers: `priority` pages first (negative = from the end), then the rest"""
+    order = []
+    for number in priority or []:
+        number = number if number > 0 else page_count + 1 + number
+        if 1 <= number <= page_count and number not in order:
+            order.append(number)
+    chosen = set(order)
+    return order + [n for n in range(1, page_count + 1) if n not in chosen]
+
+class PdfPageSource:
+    """
+    Rasterize a PDF lazily, `window` pages at a time
+
+    Iterating yields PIL images in page order. Only the current window is
+    held by the source; each page is handed over and forgotten, so memory
+    stays bounded by the window size plus whatever the caller keeps.
+    Pass `page_numbers` (1-based) to rasterize only those pages, in that
+    order, or `priority` to put some pages first and the rest after them
+    in document order (negative numbers count from the end). Rasterization
+    statistics are collected in `stats`.
+    """
+
+    def __init__(self, pdf_path, dpi=PDF_DPI, window=PDF_RASTER_WINDOW, page_numbers=None,
+                 priority=None):
+        self.pdf_path = pdf_path
+        self.dpi = dpi
+        self.window = max(1, window)
+        self.page_count = pdfinfo_from_path(pdf_path)['Pages']
+        self.page_numbers = [n for n in (page_numbers or []) if 1 <= n <= self.page_count]
+        if page_numbers is None:
+            self.page_numbers = page_order(self.page_count, priority)
+        self.stats = {
+            'pages': 0,
+            'dpi': dpi,
+            'window': self.window,
+            'peak_page_bytes': 0,
+            'peak_window_bytes': 0,
+            'peak_rss_bytes': peak_rss_bytes(),
+        }
+
+    def __len__(self):
+        return len(self.page_numbers)
+
+    def _windows(self):
+        """Runs of consecutive page numbers, at most `window` long"""
+        run = []
+        for number in self.page_numbers:
+            if run and (number != run[-1] + 1 or len(run) == self.window):
+                yield run[0], run[-1]
+                run = []
+            run.append(number)
+        if run:
+            yield run[0], run[-1]
+
+    def __iter__(self):
+        for first, last in self._windows():
+            with tracing.span('rasterize', dpi=self.dpi) as span:
+                pages = convert_from_path(self.pdf_path, dpi=self.dpi,
+                                          first_page=first, last_page=last)
+                span.add('bytes', self._record_window(pages))
+                span.add('pages', len(pages))
+            while pages:
+                yield pages.pop(0)
+
+    def _record_window(self, pages):
+        sizes = [page.width * page.height * len(page.getbands()) for page in pages]
+        self.stats['pages'] += len(pages)
+        self.stats['peak_page_bytes'] = max([self.stats['peak_page_bytes']] + sizes)
+        self.stats['peak_window_bytes'] = max(self.stats['peak_window_bytes'], sum(sizes))
+        self.stats['peak_rss_bytes'] = peak_rss_bytes()
+        return sum(sizes)
+
 def save_processed_image(image, filename):
     """
     Save processed image
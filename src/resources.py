@@ -0,0 +1,109 @@
+import importlib
+import re
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+class LazyResource:
+    """
+    A heavy object (model, NLP pipeline, ...) built on first use
+
+    The loader runs at most once per process, under a lock, and the time it
+    took is kept for the startup report.
+    """
+
+    def __init__(self, name: str, loader: Callable):
+        self.name = name
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._value = None
+        self.loaded = False
+        self.load_seconds = None
+
+    def get(self):
+        if not self.loaded:
+            with self._lock:
+                if not self.loaded:
+                    start = time.perf_counter()
+                    self._value = self._loader()
+                    self.load_seconds = time.perf_counter() - start
+                    self.loaded = True
+        return self._value
+
+_registry: Dict[str, LazyResource] = {}
+_registry_lock = threading.Lock()
+_import_seconds: Dict[str, float] = {}
+
+def register(name: str, loader: Callable) -> LazyResource:
+    """Register a lazily loaded resource; re-registering a name returns the existing one"""
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = LazyResource(name, loader)
+        return _registry[name]
+
+def unregister(name: str):
+    """Forget a resource (e.g. a replaced model); holders of the object keep it"""
+    with _registry_lock:
+        _registry.pop(name, None)
+
+def get_resource(name: str):
+    return _registry[name].get()
+
+def timed_import(module_name: str):
+    """Import a module, recording how long the first import took"""
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    _import_seconds.setdefault(module_name, time.perf_counter() - start)
+    return module
+
+def warm_up(names: Optional[Iterable[str]] = None) -> List[Dict]:
+    """Load the named resources (default: all registered) ahead of first use"""
+    for name in list(names or _registry):
+        _registry[name].get()
+    return startup_report()
+
+def measure_import_times(modules: Iterable[str]) -> Dict[str, float]:
+    """Cold import cost per module, measured in a fresh interpreter with -X importtime"""
+    modules = list(modules)
+    code = "; ".join(f"import {name}" for name in modules)
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                          capture_output=True, text=True)
+    times = {}
+    for line in proc.stderr.splitlines():
+        match = re.match(r'import time:\s*\d+\s*\|\s*(\d+)\s*\|\s*(\S+)\s*$', line)
+        if match and match.group(2) in modules:
+            times[match.group(2)] = int(match.group(1)) / 1e6
+    return times
+
+def startup_report(import_modules: Optional[Iterable[str]] = None) -> List[Dict]:
+    """Per-component import and load cost
+
+    Imports recorded by timed_import are always listed; pass `import_modules`
+    to also measure cold imports of other modules in a subprocess.
+    """
+    report = [{'component': name, 'kind': 'import', 'seconds': seconds, 'loaded': True}
+              for name, seconds in _import_seconds.items()]
+    if import_modules:
+        report += [{'component': name, 'kind': 'import', 'seconds': seconds, 'loaded': True}
+                   for name, seconds in measure_import_times(import_modules).items()]
+    report += [{'component': res.name, 'kind': 'resource',
+                'seconds': res.load_seconds, 'loaded': res.loaded}
+               for res in _registry.values()]
+    return report
+
+def format_startup_report(report: List[Dict]) -> str:
+    lines = [f"{'component':<48} {'kind':<9} {'seconds':>8}"]
+    for row in report:
+        seconds = f"{row['seconds']:.3f}" if row['seconds'] is not None else "-"
+        lines.append(f"{row['component']:<48} {row['kind']:<9} {seconds:>8}")
+    return "\n".join(lines)
+
+if __name__ == '__main__':
+    from . import ocr_processing  # noqa: F401  registers the spaCy pipeline
+    warm_up()
+    print(format_startup_report(startup_report(
+        ['numpy', 'pandas', 'cv2', 'pytesseract', 'pdf2image', 'sklearn', 'joblib', 'spacy'])))
@@ -0,0 +1,354 @@
+"""
+Per-stage tracing for the document pipeline
+
+    with tracing.span('ocr', engine='pool') as sp:
+        ...
+        sp.add('pages')
+        sp.add('bytes', image.nbytes)
+
+    @tracing.traced('validate')
+    def validate_extracted_data(data): ...
+
+Finished spans feed one latency histogram plus counters (pages, bytes, ...)
+per stage name, and are handed to the registered exporters (JSON log
+lines, Prometheus text file). When tracing is disabled, span() returns a
+shared no-op object and traced functions are called directly, so the
+instrumentation costs one attribute check per call.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Dict, List, Optional
+
+from .config import TRACING_ENABLED, TRACE_LOG_PATH, METRICS_PATH
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Histogram bucket upper bounds, milliseconds
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+def peak_rss_bytes():
+    """
+    Peak resident set size of the current process, or None if unavailable
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+class Histogram:
+    """Fixed-bucket latency histogram (milliseconds)"""
+
+    def __init__(self, bounds=LATENCY_BUCKETS_MS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value_ms: float):
+        self.counts[bisect_left(self.bounds, value_ms)] += 1
+        self.count += 1
+        self.sum += value_ms
+        self.max = max(self.max, value_ms)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate by linear interpolation inside the bucket holding the q-th value"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.max
+                estimate = lower + (upper - lower) * (rank - seen) / bucket_count
+                return min(estimate, self.max)
+            seen += bucket_count
+        return self.max
+
+class StageMetrics:
+    """Aggregates for one stage name"""
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.errors = 0
+        self.counters: Dict[str, float] = {}
+        self.peak_rss_bytes = None
+
+    def to_dict(self) -> Dict:
+        latency = self.latency
+        return {
+            'count': latency.count,
+            'errors': self.errors,
+            'total_ms': round(latency.sum, 3),
+            'mean_ms': round(latency.sum / latency.count, 3) if latency.count else None,
+            'p50_ms': _round(latency.quantile(0.5)),
+            'p95_ms': _round(latency.quantile(0.95)),
+            'max_ms': round(latency.max, 3),
+            'counters': dict(self.counters),
+            'peak_rss_bytes': self.peak_rss_bytes,
+            'buckets': list(zip(latency.bounds + (float('inf'),), latency.counts)),
+        }
+
+def _round(value):
+    return None if value is None else round(value, 3)
+
+class Span:
+    """One timed stage execution; use as a context manager"""
+
+    __slots__ = ('tracer', 'name', 'attrs', 'counters', 'parent', 'start', 'duration_ms')
+
+    def __init__(self, tracer: 'Tracer', name: str, attrs: Dict):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.counters = {}
+        self.parent = None
+        self.duration_ms = None
+
+    def add(self, counter: str, amount: float = 1):
+        """Accumulate a stage counter such as pages or bytes"""
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = self.tracer._stack()
+        self.parent = stack[-1].name if stack else None
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration_ms = (time.perf_counter() - self.start) * 1000
+        stack = self.tracer._stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        self.tracer._finish(self, error=exc_type.__name__ if exc_type else None)
+        return False
+
+class _NoopSpan:
+    """Returned by span() while tracing is disabled"""
+
+    __slots__ = ()
+
+    def add(self, counter, amount=1):
+        pass
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+NOOP_SPAN = _NoopSpan()
+
+class Tracer:
+    """Collects spans into per-stage metrics and forwards them to exporters"""
+
+    def __init__(self, enabled: bool = False, exporters: Optional[List] = None):
+        self.enabled = enabled
+        self.exporters = list(exporters or [])
+        self.stages: Dict[str, StageMetrics] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def span(self, name: str, **attrs):
+        """Context manager timing one stage; keyword attributes go to exported events"""
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, attrs)
+
+    def traced(self, name: Optional[str] = None):
+        """Decorator: run the function inside a span (default name: its qualname)"""
+        def decorator(func):
+            stage = name or func.__qualname__
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self.span(stage):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _finish(self, span: Span, error: Optional[str] = None):
+        rss = peak_rss_bytes()
+        with self._lock:
+            stage = self.stages.get(span.name)
+            if stage is None:
+                stage = self.stages[span.name] = StageMetrics()
+            stage.latency.observe(span.duration_ms)
+            if error:
+                stage.errors += 1
+            for counter, amount in span.counters.items():
+                stage.counters[counter] = stage.counters.get(counter, 0) + amount
+            stage.peak_rss_bytes = rss
+        if self.exporters:
+            event = {
+                'ts': round(time.time(), 6),
+                'span': span.name,
+                'parent': span.parent,
+                'duration_ms': round(span.duration_ms, 3),
+                'pid': os.getpid(),
+                **span.counters,
+                **span.attrs,
+                'peak_rss_bytes': rss,
+            }
+            if error:
+                event['error'] = error
+            for exporter in self.exporters:
+                exporter.export(event, self)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {name: stage.to_dict() for name, stage in sorted(self.stages.items())}
+
+    def reset(self):
+        with self._lock:
+            self.stages.clear()
+
+    def merge(self, snapshot: Dict[str, Dict]):
+        """Add another process's snapshot() (e.g. a job worker's) to these stages"""
+        with self._lock:
+            for name, metrics in snapshot.items():
+                stage = self.stages.get(name)
+                if stage is None:
+                    stage = self.stages[name] = StageMetrics()
+                latency = stage.latency
+                for i, (_, count) in enumerate(metrics['buckets']):
+                    latency.counts[i] += count
+                latency.count += metrics['count']
+                latency.sum += metrics['total_ms']
+                latency.max = max(latency.max, metrics['max_ms'])
+                stage.errors += metrics['errors']
+                for counter, amount in metrics['counters'].items():
+                    stage.counters[counter] = stage.counters.get(counter, 0) + amount
+                if metrics['peak_rss_bytes'] is not None:
+                    stage.peak_rss_bytes = max(stage.peak_rss_bytes or 0, metrics['peak_rss_bytes'])
+
+    def flush(self):
+        for exporter in self.exporters:
+            exporter.flush(self)
+
+class JsonLinesExporter:
+    """Append one JSON object per finished span to a file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        # Line buffered: each event reaches the file as one append
+        self._file = open(path, 'a', encoding='utf-8', buffering=1)
+
+    def export(self, event: Dict, tracer: Tracer):
+        line = json.dumps(event, default=str) + '\n'
+        with self._lock:
+            self._file.write(line)
+
+    def flush(self, tracer: Tracer):
+        with self._lock:
+            self._file.flush()
+
+def format_prometheus(snapshot: Dict[str, Dict], prefix: str = 'loan_pipeline') -> str:
+    """Prometheus text exposition of a Tracer.snapshot()"""
+    lines = [f"# TYPE {prefix}_stage_latency_ms histogram"]
+    for stage, metrics in snapshot.items():
+        cumulative = 0
+        for bound, count in metrics['buckets']:
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else f"{bound:g}"
+            lines.append(f'{prefix}_stage_latency_ms_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+        lines.append(f'{prefix}_stage_latency_ms_sum{{stage="{stage}"}} {metrics["total_ms"]}')
+        lines.append(f'{prefix}_stage_latency_ms_count{{stage="{stage}"}} {metrics["count"]}')
+    lines.append(f"# TYPE {prefix}_stage_errors_total counter")
+    for stage, metrics in snapshot.items():
+        lines.append(f'{prefix}_stage_errors_total{{stage="{stage}"}} {metrics["errors"]}')
+    lines.append(f"# TYPE {prefix}_stage_items_total counter")
+    for stage, metrics in snapshot.items():
+        for counter, value in sorted(metrics['counters'].items()):
+            lines.append(f'{prefix}_stage_items_total{{stage="{stage}",counter="{counter}"}} {value}')
+    rss = [m['peak_rss_bytes'] for m in snapshot.values() if m['peak_rss_bytes'] is not None]
+    if rss:
+        lines.append(f"# TYPE {prefix}_peak_rss_bytes gauge")
+        lines.append(f"{prefix}_peak_rss_bytes {max(rss)}")
+    return "\n".join(lines) + "\n"
+
+class PrometheusFileExporter:
+    """Rewrite a Prometheus text file (node_exporter textfile style) at most every `interval` s"""
+
+    def __init__(self, path: str, interval: float = 5.0):
+        self.path = path
+        self.interval = interval
+        self._last_write = 0.0
+        self._lock = threading.Lock()
+
+    def export(self, event: Dict, tracer: Tracer):
+        if time.monotonic() - self._last_write >= self.interval:
+            self.flush(tracer)
+
+    def flush(self, tracer: Tracer):
+        with self._lock:
+            self._last_write = time.monotonic()
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(format_prometheus(tracer.snapshot()))
+            os.replace(tmp_path, self.path)
+
+def _default_exporters() -> List:
+    exporters = []
+    if TRACE_LOG_PATH:
+        exporters.append(JsonLinesExporter(TRACE_LOG_PATH))
+    if METRICS_PATH:
+        exporters.append(PrometheusFileExporter(METRICS_PATH))
+    return exporters
+
+# Process-wide tracer used by the pipeline
+tracer = Tracer(enabled=TRACING_ENABLED, exporters=_default_exporters())
+
+def span(name: str, **attrs):
+    return tracer.span(name, **attrs)
+
+def traced(name: Optional[str] = None):
+    return tracer.traced(name)
+
+def enable(exporters: Optional[List] = None):
+    """Turn tracing on, optionally replacing the exporters"""
+    if exporters is not None:
+        tracer.exporters = list(exporters)
+    tracer.enabled = True
+
+def disable():
+    tracer.flush()
+    tracer.enabled = False
+
+def is_enabled() -> bool:
+    return tracer.enabled
+
+def snapshot() -> Dict[str, Dict]:
+    return tracer.snapshot()
+
+def reset():
+    tracer.reset()
+
+def merge(snapshot: Dict[str, Dict]):
+    tracer.merge(snapshot)
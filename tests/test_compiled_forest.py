@@ -0,0 +1,57 @@
+"""CompiledForest against the RandomForestClassifier it was exported from"""
+import sys
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+sys.path.append(str(Path(__file__).parent.parent / 'app'))
+
+from compiled_forest import PARTITION_MIN_ROWS, CompiledForest, export_forest
+from model_store import ModelStore
+from test_loan_prediction import write_artifacts
+
+@pytest.fixture(scope='module')
+def forest():
+    rng = np.random.default_rng(0)
+    X = rng.normal(0, 1000, size=(500, 6))
+    y = (X[:, 0] + rng.normal(0, 300, len(X)) > 0).astype(int)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=15, max_depth=8, random_state=0)
+    model.fit(scaler.transform(X), y)
+    return model, scaler
+
+@pytest.mark.parametrize('rows', [1, 100, PARTITION_MIN_ROWS])
+def test_exported_forest_matches_sklearn(tmp_path, forest, rows):
+    model, scaler = forest
+    compiled = CompiledForest.load(export_forest(model, scaler, str(tmp_path / 'forest')))
+    X = np.random.default_rng(rows).normal(0, 1000, size=(rows, 6))
+
+    expected = model.predict_proba(scaler.transform(X))
+    assert np.allclose(compiled.predict_proba(X), expected)
+    assert np.array_equal(compiled.predict(X), model.predict(scaler.transform(X)))
+    leaves = compiled.leaves_from_apply(model.apply(scaler.transform(X)))
+    assert np.allclose(compiled.proba_from_leaves(leaves), expected)
+
+def test_published_bundle_matches_sklearn(tmp_path):
+    source = tmp_path / 'source'
+    write_artifacts(source)
+    store = ModelStore(tmp_path / 'models')
+    store.publish(source, version='v1', compile_forest=True)
+    bundle = store.current()
+    compiled = bundle.compiled
+    assert isinstance(compiled.value.base, np.memmap)
+
+    model, scaler = joblib.load(source / 'loan_approval_model.pkl'), joblib.load(source / 'scaler.pkl')
+    columns = list(scaler.feature_names_in_)
+    rng = np.random.default_rng(1)
+    X = pd.DataFrame(rng.integers(0, 10_000_000, size=(200, len(columns))).astype(float),
+                     columns=columns)
+    X['cibil_score'] = rng.integers(300, 900, len(X))
+
+    expected = model.predict_proba(scaler.transform(X))
+    assert np.allclose(compiled.predict_proba(X.to_numpy()), expected)
@@ -0,0 +1,25 @@
+import pytest
+
+from src.data_validation import validate_batch, validate_extracted_data
+
+RECORDS = [
+    {'applicant_name': 'Ravi Kumar', 'dob': '01-02-1990', 'education': 'Graduate',
+     'self_employed': 'No', 'income_annum': '800,000', 'cibil_score': '750'},
+    {'applicant_name': 'R', 'dob': '1/2/1990', 'education': 'GRADUATE',
+     'income_annum': '12O0', 'cibil_score': 999, 'loan_term': None},
+    {'income_annum': '5', 'no_of_dependents': '-3', 'address': 'X' * 300, 'unknown': 'kept'},
+    {},
+]
+
+@pytest.mark.parametrize('record', RECORDS)
+def test_single_record_matches_the_batch_path(record):
+    batch = validate_batch(RECORDS).to_list()
+    assert validate_extracted_data(record) == batch[RECORDS.index(record)]
+
+def test_messages():
+    assert validate_extracted_data(RECORDS[0]) is None
+    errors = validate_extracted_data(RECORDS[1])
+    assert errors['income_annum'] == "Invalid numeric format"
+    assert errors['dob'] == "Invalid format"
+    assert errors['education'].startswith("Not one of")
+    assert validate_extracted_data(RECORDS[2])['income_annum'] == "Value too small (min 10000)"
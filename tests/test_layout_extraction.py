@@ -0,0 +1,21 @@
+from src.layout_extraction import FormTemplate, LayoutExtractor, WordBoxes
+
+def line_of_words(words, top=100, line=1):
+    """One OCR line from (text, left, width) triples"""
+    text, left, width = zip(*words)
+    return WordBoxes(list(text), left, [top] * len(words), width, [20] * len(words),
+                     [95.0] * len(words), [line] * len(words))
+
+def test_template_regions_stop_at_the_next_label_on_the_line():
+    boxes = line_of_words([('Annual', 50, 60), ('Income:', 115, 70), ('800000', 200, 80),
+                           ('Loan', 500, 40), ('Amount:', 545, 75), ('500000', 640, 80)])
+    located = LayoutExtractor().locate(boxes)
+    assert located['income_annum']['value'] == '800000'
+    assert located['loan_amount']['value'] == '500000'
+
+    template = FormTemplate.from_located('side-by-side', located, (1000, 1000))
+    _, income_x0, _, income_x1, _ = template.regions['income_annum']
+    _, loan_x0, _, loan_x1, _ = template.regions['loan_amount']
+    assert income_x0 < 0.2 and income_x1 == 0.5
+    assert loan_x1 == 1.0
+    assert income_x1 <= loan_x0 + 0.01
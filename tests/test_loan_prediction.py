@@ -0,0 +1,137 @@
+"""LoanPredictor on a freshly opened model version (small stand-in artifacts)"""
+import sys
+import threading
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+sys.path.append(str(Path(__file__).parent.parent / 'app'))
+
+from src.config import COMPILED_MAX_ROWS
+
+from loan_prediction import LoanPredictor
+from model_store import ModelStore
+
+CATEGORIES = {
+    'education': ['Graduate', 'Not Graduate'],
+    'self_employed': ['No', 'Yes'],
+    'address': ['america', 'australia', 'dubai', 'india', 'japan'],
+}
+
+RECORD = {'education': 'Graduate', 'self_employed': 'No', 'no_of_dependents': '2',
+          'income_annum': '800000', 'loan_amount': '200000', 'loan_term': '10',
+          'cibil_score': '750', 'address': 'india'}
+
+def write_artifacts(out_dir: Path):
+    rng = np.random.default_rng(0)
+    n = 300
+    df = pd.DataFrame({
+        'no_of_dependents': rng.integers(0, 6, n),
+        'education': rng.choice(CATEGORIES['education'], n),
+        'self_employed': rng.choice(CATEGORIES['self_employed'], n),
+        'income_annum': rng.integers(200000, 9900000, n),
+        'loan_amount': rng.integers(300000, 39500000, n),
+        'loan_term': rng.integers(2, 20, n),
+        'cibil_score': rng.integers(300, 900, n),
+        'residential_assets_value': rng.integers(0, 29100000, n),
+        'commercial_assets_value': rng.integers(0, 19400000, n),
+        'luxury_assets_value': rng.integers(300000, 39200000, n),
+        'bank_asset_value': rng.integers(0, 14700000, n),
+        'address': rng.choice(CATEGORIES['address'], n),
+    })
+    encoders = {'loan_status': LabelEncoder()}
+    y = encoders['loan_status'].fit_transform(
+        np.where(df['cibil_score'] > 550, 'Approved', 'Rejected'))
+    for field in CATEGORIES:
+        encoders[field] = LabelEncoder()
+        df[field] = encoders[field].fit_transform(df[field])
+    scaler = StandardScaler().fit(df)
+    model = RandomForestClassifier(n_estimators=10, random_state=0).fit(scaler.transform(df), y)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    joblib.dump(model, out_dir / 'loan_approval_model.pkl')
+    joblib.dump(scaler, out_dir / 'scaler.pkl')
+    joblib.dump(encoders, out_dir / 'label_encoders.pkl')
+
+def predict_with_timeout(predictor: LoanPredictor, record: dict, timeout: float = 30.0) -> dict:
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(predictor.predict(record)), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "predict() did not return (deadlock?)"
+    return result
+
+@pytest.mark.parametrize('compiled', [False, True])
+def test_first_predict_on_fresh_bundle(tmp_path, compiled):
+    source = tmp_path / 'source'
+    write_artifacts(source)
+    store = ModelStore(tmp_path / 'models')
+    store.publish(source, version='v1', compile_forest=compiled)
+
+    # No warm_up(): the first prediction builds every cached table itself
+    result = predict_with_timeout(LoanPredictor(store=store), RECORD)
+
+    assert 'error' not in result, result.get('error')
+    assert result['status'] in ('Approved', 'Rejected')
+    assert result['contributions']
+    education = [c for c in result['contributions'] if c['feature'] == 'education']
+    assert not education or education[0]['value'] == 'Graduate'
+
+def test_large_batches_match_the_compiled_engine(tmp_path):
+    source = tmp_path / 'source'
+    write_artifacts(source)
+    store = ModelStore(tmp_path / 'models')
+    store.publish(source, version='v1', compile_forest=True)
+    rng = np.random.default_rng(1)
+    records = [dict(RECORD, cibil_score=str(score), loan_amount=str(amount))
+               for score, amount in zip(rng.integers(300, 900, COMPILED_MAX_ROWS + 50),
+                                        rng.integers(300000, 39500000, COMPILED_MAX_ROWS + 50))]
+
+    # Above COMPILED_MAX_ROWS, 'auto' takes its leaves from scikit-learn
+    auto = LoanPredictor(store=store).predict_batch(records, top_k=None)
+    compiled = LoanPredictor(engine='compiled', store=store).predict_batch(records, top_k=None)
+
+    assert [r['approval_probability'] for r in auto] == [r['approval_probability'] for r in compiled]
+    assert [r['contributions'] for r in auto] == [r['contributions'] for r in compiled]
+
+def test_low_cibil_score_is_a_risk_factor(tmp_path):
+    source = tmp_path / 'source'
+    write_artifacts(source)
+    store = ModelStore(tmp_path / 'models')
+    store.publish(source, version='v1', compile_forest=True)
+
+    result = LoanPredictor(store=store).predict(dict(RECORD, cibil_score='408'), top_k=None)
+
+    assert result['status'] == 'Rejected'
+    assert result['approval_probability'] < 0.5
+    cibil = [c for c in result['contributions'] if c['feature'] == 'cibil_score'][0]
+    assert cibil['contribution'] < 0
+    assert any(risk.startswith('cibil_score') for risk in result['risk_factors'])
+
+@pytest.mark.parametrize('engine', ['sklearn', 'compiled'])
+def test_predict_batch_matches_predict_row_for_row(tmp_path, engine):
+    source = tmp_path / 'source'
+    write_artifacts(source)
+    store = ModelStore(tmp_path / 'models')
+    store.publish(source, version='v1', compile_forest=True)
+    records = [
+        RECORD,
+        dict(RECORD, cibil_score='408', income_annum='₹8,00,000'),
+        {},                                                   # every field missing
+        {'cibil_score': 820, 'loan_amount': 150000.0},        # numbers, not strings
+        dict(RECORD, education='PhD', address='mars'),        # unknown categories
+        dict(RECORD, income_annum='N/A'),                     # error row
+        dict(RECORD, loan_term=None),                         # error row
+    ]
+
+    single = [LoanPredictor(engine=engine, store=store).predict(record, top_k=None)
+              for record in records]
+    batch = LoanPredictor(engine=engine, store=store).predict_batch(records, top_k=None)
+
+    assert len(batch) == len(records)
+    assert [r['status'] for r in single][-2:] == ['Error', 'Error']
+    assert batch == single
@@ -0,0 +1,60 @@
+import pytest
+
+from src.ner_fallback import NerFallback, _number
+
+spacy = pytest.importorskip('spacy')
+
+@pytest.fixture(scope='module')
+def fallback():
+    """Rule-based stand-in for en_core_web_sm: numbers, rupee amounts and a few places"""
+    nlp = spacy.blank('en')
+    ruler = nlp.add_pipe('entity_ruler', name='ner')
+    ruler.add_patterns([
+        {'label': 'MONEY', 'pattern': [{'TEXT': '₹'}, {'TEXT': {'REGEX': r'^\d[\d,]*$'}}]},
+        {'label': 'MONEY', 'pattern': [{'LOWER': 'rs'}, {'TEXT': '.', 'OP': '?'},
+                                       {'TEXT': {'REGEX': r'^\d[\d,]*$'}}]},
+        {'label': 'MONEY', 'pattern': [{'TEXT': {'REGEX': r'^\d[\d,.]*$'}},
+                                       {'LOWER': {'IN': ['lakh', 'crore']}}]},
+        {'label': 'CARDINAL', 'pattern': [{'TEXT': {'REGEX': r'^\d[\d,]*$'}}]},
+        {'label': 'GPE', 'pattern': [{'TEXT': {'IN': ['Pune', 'Maharashtra']}}]},
+    ])
+    return NerFallback(nlp=nlp, n_process=1)
+
+def fill(fallback, text):
+    return fallback.fill([text], [{}])[0]
+
+def test_loan_id_is_not_the_loan_amount(fallback):
+    fields = fill(fallback, "Loan ID 123 requested amount 500000")
+    assert fields['loan_amount'] == '500000'
+
+def test_account_number_is_not_bank_assets(fallback):
+    assert 'bank_assets' not in fill(fallback, "Bank account 4242")
+    assert fill(fallback, "Bank account 4242 with savings of ₹75,000")['bank_assets'] == '75000'
+
+def test_entity_nearest_its_keyword_wins(fallback):
+    fields = fill(fallback, "Loan for 3 children, amount ₹5,00,000")
+    assert fields['loan_amount'] == '500000'
+
+def test_regex_values_are_kept(fallback):
+    fields = fallback.fill(["My annual income is ₹8,00,000"], [{'income_annum': '900000'}])[0]
+    assert fields['income_annum'] == '900000'
+
+def test_address_joins_entities_on_its_line(fallback):
+    assert fill(fallback, "Residing at Pune, Maharashtra")['address'] == 'Pune, Maharashtra'
+
+@pytest.mark.parametrize('text, digits', [
+    ('Rs. 50,000', '50000'),
+    ('Rs 1,20,000.50', '120000'),
+    ('₹5,00,000', '500000'),
+    ('5 lakh', '500000'),
+    ('2.5 crore', '25000000'),
+    ('INR 3.75 Lakhs', '375000'),
+    ('Rs.', None),
+])
+def test_number(text, digits):
+    assert _number(text) == digits
+
+def test_rupee_formats_fill_amount_fields(fallback):
+    fields = fill(fallback, "My salary is Rs. 50,000 a month and I wish to borrow 5 lakh")
+    assert fields['income_annum'] == '50000'
+    assert fields['loan_amount'] == '500000'
@@ -0,0 +1,27 @@
+import pytest
+
+from src import config, ocr_engine
+from src.ocr_cache import ResultCache
+
+@pytest.fixture
+def document(tmp_path):
+    path = tmp_path / 'doc.pdf'
+    path.write_bytes(b'%PDF-1.4 loan application')
+    return str(path)
+
+@pytest.mark.parametrize('change', [
+    lambda monkeypatch: monkeypatch.setitem(ocr_engine._engine_settings, 'kind', 'pytesseract'),
+    lambda monkeypatch: monkeypatch.setattr(config, 'PREPROCESS_TARGET_WIDTH', 1200),
+    lambda monkeypatch: monkeypatch.setattr(config, 'TESSERACT_CONFIG', '--oem 1 --psm 4'),
+], ids=['engine', 'target_width', 'tesseract_config'])
+def test_ocr_settings_invalidate_cached_results(tmp_path, document, monkeypatch, change):
+    monkeypatch.setitem(ocr_engine._engine_settings, 'kind', 'cli')
+    cache = ResultCache(str(tmp_path / 'cache'))
+    cache.put(cache.key_for_file(document), 'Loan Amount: 500000', {'loan_amount': '500000'})
+    assert cache.get(cache.key_for_file(document)) is not None
+
+    change(monkeypatch)
+
+    assert cache.get(cache.key_for_file(document)) is None
+    # A cache opened under the new settings drops the old files
+    assert ResultCache(str(tmp_path / 'cache')).stats['invalidated'] == 1
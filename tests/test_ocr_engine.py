@@ -0,0 +1,34 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from src import ocr_engine
+
+pytestmark = pytest.mark.skipif(multiprocessing.get_start_method() != 'fork',
+                                reason="workers must inherit the patched engine")
+
+class FailingEngine:
+    name = 'failing'
+
+    def image_to_string(self, image, tess_config=None):
+        raise ValueError("cannot read image")
+
+def test_worker_returns_to_pool_after_ocr_error(monkeypatch):
+    monkeypatch.setattr(ocr_engine, 'create_local_engine', lambda tess_config=None: FailingEngine())
+    pool = ocr_engine.EnginePool(size=1, timeout=10)
+    try:
+        for _ in range(3):
+            with pytest.raises(RuntimeError, match="cannot read image"):
+                pool.image_to_string(np.zeros((4, 4), dtype=np.uint8))
+        health = pool.health_check()
+        assert health['healthy'] == 1
+        assert health['restarts'] == 0
+    finally:
+        pool.close()
+
+def test_auto_engine_without_tesserocr_uses_cli(monkeypatch):
+    monkeypatch.setattr(ocr_engine, 'tesserocr', None)
+    monkeypatch.setitem(ocr_engine._engine_settings, 'kind', 'auto')
+    assert ocr_engine.engine_kind() == 'cli'
+    assert not ocr_engine.uses_worker_pool()
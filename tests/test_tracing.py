@@ -0,0 +1,23 @@
+from src.tracing import Tracer
+
+def record(tracer: Tracer, name: str, pages: int):
+    with tracer.span(name) as span:
+        span.add('pages', pages)
+
+def test_merge_adds_another_tracers_snapshot():
+    worker, parent = Tracer(enabled=True), Tracer(enabled=True)
+    record(worker, 'ocr', 2)
+    record(worker, 'ocr', 3)
+    record(parent, 'ocr', 1)
+    record(parent, 'predict', 0)
+
+    parent.merge(worker.snapshot())
+    merged = parent.snapshot()
+
+    assert merged['ocr']['count'] == 3
+    assert merged['ocr']['counters']['pages'] == 6
+    assert sum(count for _, count in merged['ocr']['buckets']) == 3
+    assert merged['predict']['count'] == 1
+
+    parent.merge(Tracer(enabled=True).snapshot())
+    assert parent.snapshot() == merged